@@ -0,0 +1,5 @@
+@echo off
+REM Single entry point for the course tools (see scripts\course.py)
+REM e.g. course.bat outline --update-readme
+REM      course.bat renumber 5 --force + outline --update-readme
+python "%~dp0scripts\course.py" %*
@@ -1,14 +1,9 @@
 @echo off
 SETLOCAL
 
-REM --- Scrip} ELSE (
-    ECHO [Step 2 of 2] Updating README.md with the new course outline...
-)
-python scripts\generate_course_outline.py --update-readme
-IF ERRORLEVEL 1 (
-    ECHO [FATAL] README update script failed.
-    GOTO :EOF
-)omatically renumber lessons and update the README ---
+REM --- Script to automatically renumber lessons and update the README ---
+REM All steps run in-process through scripts\course_workflow.py, which scans
+REM the course once and shares the result between steps.
 
 ECHO.
 ECHO ================================================
@@ -24,33 +19,16 @@ IF "%1"=="" (
     ECHO e.g., run_update.bat 3  (to insert after lesson 3)
     ECHO e.g., run_update.bat 5  (to insert after lesson 5)
     ECHO.
-    GOTO UPDATE_README
-)
-
-SET INSERTION_POINT=%1
-
-ECHO [Step 1 of 2] Renumbering lessons starting after %INSERTION_POINT%...
-python scripts\renumber_lessons.py %INSERTION_POINT% --force
-IF ERRORLEVEL 1 (
-    ECHO [FATAL] Renumbering script failed. Aborting.
-    GOTO :EOF
-)
-ECHO Renumbering complete.
-ECHO.
-
-:UPDATE_README
-IF "%1"=="" (
-    ECHO [Documentation Update] Updating README.md with current course outline...
+    python scripts\course_workflow.py update
 ) ELSE (
-    ECHO [Step 2 of 2] Updating README.md with the new course outline...
+    ECHO [INFO] Renumbering lessons starting at %1, then updating README.md...
+    ECHO.
+    python scripts\course_workflow.py update --insert %1
 )
-python generate_course_outline.py --update-readme
 IF ERRORLEVEL 1 (
-    ECHO [FATAL] README update script failed.
+    ECHO [FATAL] Course update workflow failed.
     GOTO :EOF
 )
-ECHO README.md updated successfully.
-ECHO.
 
 ECHO ================================================
 IF "%1"=="" (
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Structured, Rotating Automation Log
+
+Cross-platform replacement for the append-only automation_log.txt written by
+safe_execute.bat. Records are written as JSON lines to a size-rotated segment;
+full segments are gzip-compressed and the oldest are pruned. Every command run
+is registered in a small SQLite index so queries by command, exit code and
+duration never read the log segments themselves.
+
+Several tools may write to the same log at once. Rotation renames the active
+segment (it is compressed at the next rotation, once no writer can still hold
+it open) and writers reopen the active segment when its inode changes.
+Rotations, and each run's start record with its index row, are serialized by
+the index's write lock, so a run is never indexed in a segment it is not in.
+
+FEATURES:
+- JSON-lines records, one per output line / log message
+- Size-based rotation with gzip-compressed segments and retention limit
+- SQLite run index (run id, command, tool, exit code, duration, location)
+- Tools stream log records directly instead of accumulating them in memory
+
+Usage:
+    python automation_log.py run -- python scripts/renumber_lessons.py 5 --force
+    python automation_log.py query --command renumber_lessons --exit-code 1
+    python automation_log.py query --min-duration 2.5 --limit 20
+    python automation_log.py show <run_id>
+
+Examples:
+    python scripts/automation_log.py run -- python scripts/generate_course_outline.py
+    python scripts/automation_log.py query --command generate_course_outline
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+
+DEFAULT_LOG_DIR = "automation_logs"
+LOG_DIR_ENV_VAR = "COURSE_LOG_DIR"
+RUN_ID_ENV_VAR = "COURSE_RUN_ID"
+ACTIVE_SEGMENT = "automation.jsonl"
+INDEX_FILE = "index.sqlite"
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_BACKUP_COUNT = 20
+
+
+def default_log_dir():
+    """Return the log directory configured by the environment, or the default."""
+    return os.environ.get(LOG_DIR_ENV_VAR, DEFAULT_LOG_DIR)
+
+
+def tool_name_from_command(command):
+    """
+    Derive a short tool name from a command line.
+
+    Args:
+        command (list): Command and arguments (e.g., ['python', 'scripts/renumber_lessons.py', '5'])
+
+    Returns:
+        str: The script stem (e.g., 'renumber_lessons') or the executable name
+    """
+    for part in command:
+        if part.endswith('.py') or part.endswith('.bat') or part.endswith('.ps1'):
+            return Path(part.replace('\\', '/')).stem
+    return Path(command[0]).stem if command else ""
+
+
+class AutomationLog:
+    def __init__(self, log_dir=None, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        """
+        Open (creating if needed) a rotating automation log.
+
+        Args:
+            log_dir (str, optional): Directory for log segments and the index
+            max_bytes (int): Rotate the active segment once it exceeds this size
+            backup_count (int): Number of compressed segments to keep
+        """
+        self.log_dir = Path(log_dir or default_log_dir())
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.active_path = self.log_dir / ACTIVE_SEGMENT
+        self._stream = None
+        self._index = sqlite3.connect(str(self.log_dir / INDEX_FILE), timeout=30)
+        self._index.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                tool TEXT,
+                command TEXT,
+                started TEXT,
+                exit_code INTEGER,
+                duration_s REAL,
+                segment TEXT,
+                offset INTEGER
+            )""")
+        self._index.execute("CREATE INDEX IF NOT EXISTS runs_tool ON runs (tool)")
+        self._index.execute("CREATE INDEX IF NOT EXISTS runs_exit_code ON runs (exit_code)")
+        self._index.execute("CREATE INDEX IF NOT EXISTS runs_duration ON runs (duration_s)")
+        self._index.commit()
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the index's write lock (shared by every writer of this log directory)."""
+        if self._index.in_transaction:
+            yield
+            return
+        self._index.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._index.rollback()
+            raise
+        self._index.commit()
+
+    def _open_active(self):
+        """Open the active segment, reopening it if another writer rotated it away."""
+        if self._stream is not None:
+            try:
+                current = os.stat(self.active_path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and os.path.samestat(current, os.fstat(self._stream.fileno())):
+                return
+            self._stream.close()
+        self._stream = open(self.active_path, 'ab')
+
+    def close(self):
+        """Close the active segment and the index."""
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record):
+        """
+        Append one record to the active segment, rotating first if it is full.
+
+        Args:
+            record (dict): JSON-serializable record
+
+        Returns:
+            tuple: (segment_name, byte_offset) where the record was written
+        """
+        self._open_active()
+        if self._stream.tell() >= self.max_bytes:
+            self.rotate(min_bytes=self.max_bytes)
+            self._open_active()
+
+        offset = self._stream.tell()
+        line = json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n"
+        self._stream.write(line.encode('utf-8'))
+        self._stream.flush()
+        return ACTIVE_SEGMENT, offset
+
+    def rotate(self, min_bytes=1):
+        """
+        Rename the active segment to a rotated one and re-point its index rows, then
+        compress earlier rotated segments and prune old ones.
+
+        Args:
+            min_bytes (int): Only rotate if the active segment is at least this large
+                             (another writer may have rotated it while this one waited)
+        """
+        with self._exclusive():
+            try:
+                size = self.active_path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            if size < min_bytes:
+                return
+
+            segment_name = f"automation.{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+            try:
+                os.replace(self.active_path, self.log_dir / segment_name)
+            except PermissionError:
+                return  # Windows: another process has the segment open; rotate on a later write
+            # Rows of the active segment all point into the renamed file: start records are
+            # written and indexed under the same lock
+            self._index.execute("UPDATE runs SET segment = ? WHERE segment = ?", (segment_name, ACTIVE_SEGMENT))
+
+            # A writer that has not yet noticed the rotation may still append to the newest
+            # rotated segment, so only the earlier ones are compressed
+            for name in self.segments():
+                if name not in (segment_name, ACTIVE_SEGMENT) and not name.endswith('.gz'):
+                    self._compress(name)
+            self.prune()
+
+    def _compress(self, name):
+        """gzip a rotated segment in place and re-point its index rows."""
+        compressed = self.log_dir / (name + ".gz.tmp")
+        with open(self.log_dir / name, 'rb') as src, gzip.open(compressed, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(compressed, self.log_dir / (name + ".gz"))
+        self._index.execute("UPDATE runs SET segment = ? WHERE segment = ?", (name + ".gz", name))
+        (self.log_dir / name).unlink()
+
+    def segments(self):
+        """Return segment names from oldest to newest, ending with the active segment."""
+        rotated = sorted(list(p.name for p in self.log_dir.glob("automation.*.jsonl.gz")) +
+                         list(p.name for p in self.log_dir.glob("automation.*.jsonl")))
+        if self.active_path.exists():
+            rotated.append(ACTIVE_SEGMENT)
+        return rotated
+
+    def prune(self):
+        """Delete rotated segments (and their index rows) beyond the retention limit."""
+        with self._exclusive():
+            rotated = [name for name in self.segments() if name != ACTIVE_SEGMENT]
+            for name in rotated[:max(0, len(rotated) - self.backup_count)]:
+                (self.log_dir / name).unlink(missing_ok=True)
+                self._index.execute("DELETE FROM runs WHERE segment = ?", (name,))
+
+    def register_run(self, run_id, command, location, tool=None):
+        """
+        Add a run to the index when it starts.
+
+        Args:
+            run_id (str): Unique run identifier
+            command (str): Command line being run
+            location (tuple): (segment, offset) of the run's first record
+            tool (str, optional): Tool name (default: derived from the command)
+        """
+        segment, offset = location
+        with self._exclusive():
+            self._index.execute(
+                "INSERT OR REPLACE INTO runs (run_id, tool, command, started, segment, offset) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, tool or tool_name_from_command(command.split()), command,
+                 datetime.now().isoformat(timespec='seconds'), segment, offset))
+
+    def start_run(self, run_id, command, record, tool=None):
+        """
+        Write a run's start record and index it under one lock, so no rotation can
+        move the record between the two.
+
+        Args:
+            run_id (str): Unique run identifier
+            command (str): Command line being run
+            record (dict): The start record
+            tool (str, optional): Tool name (default: derived from the command)
+        """
+        with self._exclusive():
+            self.register_run(run_id, command, self.write(record), tool)
+
+    def complete_run(self, run_id, exit_code, duration_s):
+        """Record the exit code and duration of a finished run."""
+        self._index.execute("UPDATE runs SET exit_code = ?, duration_s = ? WHERE run_id = ?",
+                            (exit_code, round(duration_s, 6), run_id))
+        self._index.commit()
+
+    def query(self, command=None, exit_code=None, min_duration=None, max_duration=None, limit=50):
+        """
+        Query the run index.
+
+        Args:
+            command (str, optional): Tool name, or a substring of the command line
+            exit_code (int, optional): Exact exit code
+            min_duration (float, optional): Minimum duration in seconds
+            max_duration (float, optional): Maximum duration in seconds
+            limit (int): Maximum number of runs to return (newest first)
+
+        Returns:
+            list: Run dictionaries
+        """
+        clauses = []
+        params = []
+        if command:
+            clauses.append("(tool = ? OR command LIKE ?)")
+            params.extend([command, f"%{command}%"])
+        if exit_code is not None:
+            clauses.append("exit_code = ?")
+            params.append(exit_code)
+        if min_duration is not None:
+            clauses.append("duration_s >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            clauses.append("duration_s <= ?")
+            params.append(max_duration)
+
+        sql = "SELECT run_id, tool, command, started, exit_code, duration_s, segment, offset FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY started DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+
+        columns = ['run_id', 'tool', 'command', 'started', 'exit_code', 'duration_s', 'segment', 'offset']
+        return [dict(zip(columns, row)) for row in self._index.execute(sql, params)]
+
+    def _open_segment(self, name):
+        path = self.log_dir / name
+        if name.endswith('.gz'):
+            return gzip.open(path, 'rb')
+        return open(path, 'rb')
+
+    def read_run(self, run_id):
+        """
+        Return all records of one run, starting at its indexed location.
+
+        Args:
+            run_id (str): Run identifier
+
+        Returns:
+            list: Records in write order (empty if the run is unknown or pruned)
+        """
+        row = self._index.execute("SELECT segment, offset FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return []
+        if self._stream is not None:
+            self._stream.flush()
+
+        segment, offset = row
+        segments = self.segments()
+        if segment not in segments:
+            return []
+
+        records = []
+        for position, name in enumerate(segments[segments.index(segment):]):
+            with self._open_segment(name) as f:
+                if position == 0:
+                    f.seek(offset)
+                for raw in f:
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        continue
+                    if record.get('run_id') != run_id:
+                        continue
+                    records.append(record)
+                    if record.get('kind') == 'end':
+                        return records
+        return records
+
+
+class ToolLogStream:
+    def __init__(self, tool, log_dir=None):
+        """
+        Stream a tool's log messages into the automation log.
+
+        When the tool runs under the automation log runner its console output is
+        already captured, so messages are not written a second time.
+
+        Args:
+            tool (str): Tool name (e.g., 'renumber_lessons')
+            log_dir (str, optional): Automation log directory
+        """
+        self.tool = tool
+        self.log_dir = log_dir
+        self.run_id = uuid.uuid4().hex[:12]
+        self.enabled = RUN_ID_ENV_VAR not in os.environ
+        self.start_time = time.perf_counter()
+        self._log = None
+
+    def _open(self):
+        if self._log is None:
+            self._log = AutomationLog(self.log_dir)
+            command = " ".join([self.tool] + sys.argv[1:])
+            self._log.start_run(self.run_id, command, {'kind': 'start', 'run_id': self.run_id, 'tool': self.tool,
+                                                       'command': command, 'time': datetime.now().isoformat()},
+                                tool=self.tool)
+        return self._log
+
+    def emit(self, level, message):
+        """Write one log message record."""
+        if not self.enabled:
+            return
+        try:
+            self._open().write({'kind': 'log', 'run_id': self.run_id, 'tool': self.tool,
+                                'level': level, 'message': message,
+                                'time': datetime.now().isoformat()})
+        except (OSError, sqlite3.Error) as e:
+            self.enabled = False
+            print(f"WARNING: Automation log disabled: {e}")
+
+    def finish(self, success):
+        """Write the end record and complete the indexed run."""
+        if not self.enabled or self._log is None:
+            return
+        exit_code = 0 if success else 1
+        duration = time.perf_counter() - self.start_time
+        try:
+            self._log.write({'kind': 'end', 'run_id': self.run_id, 'tool': self.tool,
+                             'exit_code': exit_code, 'duration_s': round(duration, 6),
+                             'time': datetime.now().isoformat()})
+            self._log.complete_run(self.run_id, exit_code, duration)
+        except (OSError, sqlite3.Error) as e:
+            print(f"WARNING: Could not complete automation log run: {e}")
+        finally:
+            self._log.close()
+            self._log = None
+
+
+def run_command(command, log_dir=None, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+    """
+    Run a command, echoing its output and streaming it into the automation log.
+
+    Args:
+        command (list): Command and arguments
+        log_dir (str, optional): Automation log directory
+        max_bytes (int): Segment rotation size
+        backup_count (int): Number of compressed segments to keep
+
+    Returns:
+        tuple: (run_id, exit_code, duration_s)
+    """
+    run_id = uuid.uuid4().hex[:12]
+    command_line = subprocess.list2cmdline(command)
+    env = dict(os.environ, **{RUN_ID_ENV_VAR: run_id, 'PYTHONUNBUFFERED': '1'})
+
+    with AutomationLog(log_dir, max_bytes, backup_count) as log:
+        log.start_run(run_id, command_line, {'kind': 'start', 'run_id': run_id, 'command': command_line,
+                                             'time': datetime.now().isoformat()})
+
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       env=env, text=True, encoding='utf-8', errors='replace')
+        except OSError as e:
+            print(f"[ERROR] Could not start command: {e}")
+            exit_code = 127
+        else:
+            for line in process.stdout:
+                sys.stdout.write(line)
+                log.write({'kind': 'output', 'run_id': run_id, 'line': line.rstrip('\n')})
+            exit_code = process.wait()
+        duration = time.perf_counter() - start
+
+        log.write({'kind': 'end', 'run_id': run_id, 'exit_code': exit_code,
+                   'duration_s': round(duration, 6), 'time': datetime.now().isoformat()})
+        log.complete_run(run_id, exit_code, duration)
+
+    return run_id, exit_code, duration
+
+
+def main():
+    """Main entry point with subcommands: run, query, show."""
+    parser = argparse.ArgumentParser(
+        description="Run commands with structured, rotating logs and query past runs",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python automation_log.py run -- python scripts/renumber_lessons.py 5 --force
+  python automation_log.py query --command renumber_lessons --exit-code 1
+  python automation_log.py show 3f2a9c1b7d4e
+        """
+    )
+    parser.add_argument('--log-dir', type=str, default=None,
+                        help=f'Log directory (default: ${LOG_DIR_ENV_VAR} or {DEFAULT_LOG_DIR})')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run a command and log its output')
+    run_parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                            help=f'Rotate segments larger than this (default: {DEFAULT_MAX_BYTES})')
+    run_parser.add_argument('--backup-count', type=int, default=DEFAULT_BACKUP_COUNT,
+                            help=f'Compressed segments to keep (default: {DEFAULT_BACKUP_COUNT})')
+    run_parser.add_argument('command', nargs=argparse.REMAINDER, help='Command to run (after --)')
+
+    query_parser = subparsers.add_parser('query', help='Query logged runs through the index')
+    query_parser.add_argument('--command', type=str, help='Tool name or command-line substring')
+    query_parser.add_argument('--exit-code', type=int, help='Exact exit code')
+    query_parser.add_argument('--min-duration', type=float, help='Minimum duration in seconds')
+    query_parser.add_argument('--max-duration', type=float, help='Maximum duration in seconds')
+    query_parser.add_argument('--limit', type=int, default=50, help='Maximum runs to list (default: 50)')
+    query_parser.add_argument('--json', action='store_true', help='Print runs as JSON lines')
+
+    show_parser = subparsers.add_parser('show', help='Print the records of one run')
+    show_parser.add_argument('run_id', help='Run identifier from query output')
+
+    args = parser.parse_args()
+
+    if args.action == 'run':
+        command = args.command[1:] if args.command[:1] == ['--'] else args.command
+        if not command:
+            print("ERROR: No command provided")
+            return 2
+        run_id, exit_code, duration = run_command(command, args.log_dir, args.max_bytes, args.backup_count)
+        print(f"\n[automation log] run {run_id}: exit code {exit_code} in {duration:.3f}s")
+        return exit_code
+
+    with AutomationLog(args.log_dir) as log:
+        if args.action == 'query':
+            runs = log.query(args.command, args.exit_code, args.min_duration, args.max_duration, args.limit)
+            for run in runs:
+                if args.json:
+                    print(json.dumps(run, sort_keys=True))
+                    continue
+                duration = f"{run['duration_s']:.3f}s" if run['duration_s'] is not None else "running"
+                exit_code = run['exit_code'] if run['exit_code'] is not None else "-"
+                print(f"{run['run_id']}  {run['started']}  exit={exit_code:<4} {duration:>10}  {run['command']}")
+            if not runs and not args.json:
+                print("No matching runs found")
+            return 0
+
+        records = log.read_run(args.run_id)
+        if not records:
+            print(f"ERROR: Run '{args.run_id}' not found (unknown or pruned)")
+            return 1
+        for record in records:
+            if record.get('kind') == 'output':
+                print(record.get('line', ''))
+            elif record.get('kind') == 'log':
+                print(f"[{record.get('time', '')[11:19]}] {record.get('level')}: {record.get('message')}")
+            else:
+                print(json.dumps(record, sort_keys=True))
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
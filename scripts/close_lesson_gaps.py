@@ -9,43 +9,90 @@ SAFETY FEATURES:
 - Creates backup copies of all files before renumbering
 - Dry-run mode to preview changes
 - Comprehensive validation and error handling
-- Rollback capability if errors occur
+- Rollback capability if errors occur (snapshot restore of lessons and images)
 - Handles both lesson files and corresponding images
+- Rewrites each renamed lesson's "# Lesson N" heading to its new number
+- Locks the unit, so concurrent operations on it wait or fail fast
+
+--all closes the gaps of every unit in one pass: one scan of the course root
+and the image index, every plan validated before anything moves (and planned
+again once the unit locks are held, aborting if it changed), one backup
+directory and one snapshot, and a journal (gap_journal.json in the backup
+directory) recording the renames and which units are done. Units are renamed
+concurrently when their files are disjoint; if any unit fails, all of them
+are restored from the snapshot.
+
+The journal is an audit record only: nothing reads it back, and a later run
+does not resume from it. If a run was interrupted (its journal still says
+"running"), restore the snapshot it names with
+    python rollback_lessons.py <snapshot> --yes
 
 Usage:
     python close_lesson_gaps.py <unit_number> [--dry-run] [--backup-dir=DIR]
+    python close_lesson_gaps.py --all [--dry-run] [--workers N]
     
 Examples:
     python close_lesson_gaps.py 1 --dry-run          # Preview Unit 1 gap closing
     python close_lesson_gaps.py 1                    # Execute Unit 1 gap closing
     python close_lesson_gaps.py 2 --backup-dir=backup_gaps  # Custom backup directory
+    python close_lesson_gaps.py --all --dry-run      # Preview gap closing for every unit
 """
 
 import os
 import re
 import sys
+import json
 import shutil
 import argparse
+import tempfile
+import threading
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from automation_log import ToolLogStream
+from snapshots import SnapshotStore
+from lesson_headings import sync_heading
+from course_locks import CourseLock, LockError, unit_scope, add_lock_arguments
+from course_model import IMAGE_FILENAME_PATTERN
+from image_index import ImageIndex
+
+
+LESSON_FILE_PATTERN = re.compile(r'^(\d{2})-.*-.*\.md$')
+JOURNAL_NAME = "gap_journal.json"
 
 
 class GapClosingTool:
-    def __init__(self, unit_number, dry_run=False, backup_dir=None):
+    # Serializes console and automation log output when units run in worker threads (--all)
+    _log_lock = threading.Lock()
+
+    def __init__(self, unit_number, dry_run=False, backup_dir=None, metrics=None, lock_timeout=None,
+                 images=None, lesson_files=None, log_stream=None):
         self.unit_number = unit_number.zfill(2)  # Ensure 2-digit format
         self.dry_run = dry_run
         self.backup_dir = backup_dir or f"backup_gaps_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}"
         self.current_dir = Path.cwd()
         self.backup_path = self.current_dir / self.backup_dir
-        self.operations_log = []
+        self.operations_count = 0
         self.errors = []
+        self.metrics = metrics or Instrumentation("close_lesson_gaps")
+        self.log_stream = log_stream or ToolLogStream("close_lesson_gaps")
+        self.snapshot_id = None
+        self.lock_timeout = lock_timeout
+        self.lock = None
+        self.images = images or ImageIndex(self.current_dir)
+        # Lesson files from a course-wide scan (--all), so the root is not globbed per unit
+        self.lesson_files = lesson_files
         
     def log(self, message, level="INFO"):
         """Log a message with timestamp and level."""
         timestamp = datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {level}: {message}"
-        self.operations_log.append(log_entry)
-        print(log_entry)
+        self.operations_count += 1
+        with self._log_lock:
+            self.log_stream.emit(level, message)
+            print(log_entry)
         
     def error(self, message):
         """Log an error message."""
@@ -54,8 +101,11 @@ class GapClosingTool:
         
     def find_unit_lessons(self):
         """Find all lesson files for the specified unit."""
-        pattern = f"{self.unit_number}-*-*.md"
-        lesson_files = list(self.current_dir.glob(pattern))
+        if self.lesson_files is not None:
+            lesson_files = list(self.lesson_files)
+        else:
+            lesson_files = list(self.current_dir.glob(f"{self.unit_number}-*-*.md"))
+            self.metrics.count("files_scanned", len(lesson_files))
         
         # Sort by lesson number
         lesson_files.sort(key=lambda x: self.extract_lesson_number(x.name))
@@ -68,19 +118,23 @@ class GapClosingTool:
         if not images_dir.exists():
             return []
             
-        pattern = f"{self.unit_number}_*_*.png"
-        image_files = list(images_dir.glob(pattern))
-        image_files.sort()
+        # The image index answers without listing the (large) images folder
+        image_files = [images_dir / self.images.entries[name]['path']
+                       for name in self.images.unit_images(self.unit_number)
+                       if IMAGE_FILENAME_PATTERN.match(name)]
+        self.metrics.count("images_scanned", len(image_files))
         
         return image_files
     
     def extract_lesson_number(self, filename):
         """Extract lesson number from filename."""
+        self.metrics.count("regex_evaluations")
         match = re.match(rf'{self.unit_number}-(\d+)-.*\.md', filename)
         return int(match.group(1)) if match else 0
     
     def extract_image_lesson_number(self, filename):
         """Extract lesson number from image filename."""
+        self.metrics.count("regex_evaluations")
         match = re.match(rf'{self.unit_number}_(\d+)_.*\.png', filename)
         return int(match.group(1)) if match else 0
     
@@ -91,30 +145,39 @@ class GapClosingTool:
             return True
             
         try:
-            self.backup_path.mkdir(exist_ok=True)
-            
-            # Backup lesson files
-            lesson_files = self.find_unit_lessons()
-            for file_path in lesson_files:
-                shutil.copy2(file_path, self.backup_path)
-                self.log(f"Backed up: {file_path.name}")
-            
-            # Backup image files
-            image_files = self.find_unit_images()
-            if image_files:
-                images_backup = self.backup_path / "images"
-                images_backup.mkdir(exist_ok=True)
-                for file_path in image_files:
-                    shutil.copy2(file_path, images_backup)
-                    self.log(f"Backed up: images/{file_path.name}")
-            
+            self.backup_files()
             self.log(f"Backup created at: {self.backup_path}")
+            
+            self.snapshot_id = SnapshotStore(self.current_dir).create(
+                label=f"close_lesson_gaps {self.unit_number}")
+            self.log(f"Created snapshot: {self.snapshot_id}")
             return True
             
         except Exception as e:
             self.error(f"Failed to create backup: {e}")
             return False
     
+    def backup_files(self):
+        """Copy the unit's lessons and images into the backup directory."""
+        self.backup_path.mkdir(exist_ok=True)
+        
+        # Backup lesson files
+        lesson_files = self.find_unit_lessons()
+        for file_path in lesson_files:
+            shutil.copy2(file_path, self.backup_path)
+            self.metrics.count("bytes_copied", file_path.stat().st_size)
+            self.log(f"Backed up: {file_path.name}")
+        
+        # Backup image files
+        image_files = self.find_unit_images()
+        if image_files:
+            images_backup = self.backup_path / "images"
+            images_backup.mkdir(exist_ok=True)
+            for file_path in image_files:
+                shutil.copy2(file_path, images_backup)
+                self.metrics.count("bytes_copied", file_path.stat().st_size)
+                self.log(f"Backed up: images/{file_path.name}")
+    
     def generate_renaming_plan(self):
         """Generate the renaming plan for lessons and images."""
         lesson_files = self.find_unit_lessons()
@@ -170,13 +233,45 @@ class GapClosingTool:
                 )
                 image_plan.append({
                     'old_path': image_file,
-                    'new_path': image_file.parent / new_filename,
+                    'new_path': self.images.location(new_filename),
                     'old_num': current_lesson_num,
                     'new_num': new_lesson_num
                 })
         
         return lesson_plan, image_plan
     
+    def validate_plan(self, lesson_plan, image_plan):
+        """
+        Check that no rename would overwrite a file that stays where it is.
+
+        Targets that are themselves renamed away are fine: execute_renaming() orders
+        the renames so each target is free when its turn comes.
+        """
+        for plan, existing in ((lesson_plan, [f.name for f in self.find_unit_lessons()]),
+                               (image_plan, [f.name for f in self.find_unit_images()])):
+            moving = {item['old_path'].name.casefold() for item in plan}
+            staying = {name.casefold() for name in existing} - moving
+            targets = set()
+            for item in plan:
+                target = item['new_path'].name.casefold()
+                if target in staying or target in targets:
+                    self.error(f"Conflict: {item['old_path'].name} → {item['new_path'].name} "
+                               f"would overwrite an existing file")
+                targets.add(target)
+        return not self.errors
+
+    @staticmethod
+    def rename_order(plan):
+        """
+        Order renames so none overwrites a file that is still waiting to be renamed:
+        files moving to a higher number go first, highest first, then the rest, lowest first.
+        """
+        up = sorted((item for item in plan if item['new_num'] > item['old_num']),
+                    key=lambda item: item['old_num'], reverse=True)
+        down = sorted((item for item in plan if item['new_num'] <= item['old_num']),
+                      key=lambda item: item['old_num'])
+        return up + down
+
     def preview_changes(self):
         """Preview what changes would be made."""
         lesson_plan, image_plan = self.generate_renaming_plan()
@@ -206,6 +301,15 @@ class GapClosingTool:
         self.log(f"\nTOTAL CHANGES: {len(lesson_plan)} lessons + {len(image_plan)} images")
         return True
     
+    def sync_lesson_heading(self, path, lesson_number):
+        """Rewrite the lesson's "# Lesson N" heading to match its new number."""
+        old_number, changed = sync_heading(path, lesson_number, dry_run=self.dry_run)
+        if old_number is None:
+            self.log(f"Warning: No '# Lesson N' heading found in {path.name}", "WARNING")
+        elif changed:
+            self.metrics.count("headings_updated")
+            self.log(f"Updated heading in {path.name}: Lesson {old_number} → Lesson {lesson_number}")
+    
     def execute_renaming(self):
         """Execute the renaming operations."""
         lesson_plan, image_plan = self.generate_renaming_plan()
@@ -216,15 +320,20 @@ class GapClosingTool:
         
         try:
             # Rename lesson files
-            for item in lesson_plan:
+            for item in self.rename_order(lesson_plan):
                 if not self.dry_run:
                     item['old_path'].rename(item['new_path'])
+                    self.metrics.count("renames")
                 self.log(f"Renamed: {item['old_path'].name} → {item['new_path'].name}")
+                self.sync_lesson_heading(item['old_path'] if self.dry_run else item['new_path'], item['new_num'])
             
             # Rename image files
-            for item in image_plan:
+            for item in self.rename_order(image_plan):
                 if not self.dry_run:
+                    item['new_path'].parent.mkdir(exist_ok=True)
                     item['old_path'].rename(item['new_path'])
+                    self.images.rename(item['old_path'].name, item['new_path'].name)
+                    self.metrics.count("renames")
                 self.log(f"Renamed: images/{item['old_path'].name} → images/{item['new_path'].name}")
             
             self.log(f"Successfully processed {len(lesson_plan)} lessons and {len(image_plan)} images")
@@ -234,17 +343,48 @@ class GapClosingTool:
             self.error(f"Failed during renaming: {e}")
             return False
     
+    def lock_unit(self):
+        """Lock the unit against concurrent course operations."""
+        try:
+            self.lock = CourseLock([unit_scope(self.unit_number)], "close_lesson_gaps",
+                                   self.current_dir, self.lock_timeout).acquire()
+        except LockError as e:
+            self.error(f"Cannot close gaps while another operation is running: {e}")
+            return False
+        return True
+    
+    def release_lock(self):
+        """Release the unit lock, if held."""
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+    
     def run(self):
-        """Execute the gap closing process."""
+        """Execute the gap closing process, timed and recorded by the instrumentation layer."""
+        with self.metrics.session():
+            try:
+                success = self._run_steps()
+                self.images.save()
+            finally:
+                self.release_lock()
+            self.metrics.set_status("success" if success else "failed")
+        self.log_stream.finish(success)
+        return success
+    
+    def _run_steps(self):
+        """Run the gap closing steps."""
         self.log("=" * 60)
         self.log(f"LESSON GAP CLOSING TOOL - UNIT {self.unit_number}")
         self.log("=" * 60)
         
         if self.dry_run:
             self.log("DRY RUN MODE - No files will be modified")
+        elif not self.lock_unit():
+            return False
         
         # Find unit lessons
-        lesson_files = self.find_unit_lessons()
+        with self.metrics.phase("scan"):
+            lesson_files = self.find_unit_lessons()
         if not lesson_files:
             self.error(f"No lesson files found for Unit {self.unit_number}")
             return False
@@ -252,20 +392,30 @@ class GapClosingTool:
         self.log(f"Found {len(lesson_files)} lesson files for Unit {self.unit_number}")
         
         # Preview changes
-        has_changes = self.preview_changes()
+        with self.metrics.phase("plan"):
+            has_changes = self.preview_changes()
         if not has_changes:
             return True
         
+        with self.metrics.phase("plan"):
+            plan_ok = self.validate_plan(*self.generate_renaming_plan())
+        if not plan_ok:
+            self.error("Renaming plan validation failed. Aborting.")
+            return False
+        
         if self.dry_run:
             self.log("\nDRY RUN COMPLETE - Run without --dry-run to execute changes")
             return True
         
         # Create backup
-        if not self.create_backup():
+        with self.metrics.phase("backup"):
+            backup_ok = self.create_backup()
+        if not backup_ok:
             return False
         
         # Execute renaming
-        success = self.execute_renaming()
+        with self.metrics.phase("rename"):
+            success = self.execute_renaming()
         
         if success:
             self.log("=" * 60)
@@ -274,13 +424,274 @@ class GapClosingTool:
             self.log("=" * 60)
         else:
             self.log("=" * 60)
-            self.log("GAP CLOSING FAILED - Check backup for recovery")
-            self.log(f"Backup location: {self.backup_path}")
+            self.log("GAP CLOSING FAILED - Restoring snapshot")
+            try:
+                with self.metrics.phase("rollback"):
+                    SnapshotStore(self.current_dir).restore(self.snapshot_id, log=self.log,
+                                                            units=[int(self.unit_number)])
+                self.log(f"Rollback completed from snapshot {self.snapshot_id}")
+            except OSError as e:
+                self.error(f"Snapshot restore failed: {e}")
+                self.log(f"Backup location: {self.backup_path}")
             self.log("=" * 60)
         
         return success
 
 
+class CourseGapClosingTool:
+    def __init__(self, dry_run=False, backup_dir=None, metrics=None, lock_timeout=None, workers=4):
+        """
+        Close the gaps of every unit in one pass.
+
+        Each unit is planned and renamed by its own GapClosingTool, fed from one
+        scan of the course root and one image index. Validation, locking, backup,
+        snapshot and rollback happen once for the whole batch.
+
+        Args:
+            dry_run (bool): Preview only
+            backup_dir (str, optional): Backup directory name
+            metrics (Instrumentation, optional): Shared by all units
+            lock_timeout (float, optional): Seconds to wait for the unit locks
+            workers (int): Units renamed concurrently
+        """
+        self.dry_run = dry_run
+        self.backup_dir = backup_dir or f"backup_gaps_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}"
+        self.current_dir = Path.cwd()
+        self.backup_path = self.current_dir / self.backup_dir
+        self.journal_path = self.backup_path / JOURNAL_NAME
+        self.errors = []
+        self.metrics = metrics or Instrumentation("close_lesson_gaps")
+        self.log_stream = ToolLogStream("close_lesson_gaps")
+        self.snapshot_id = None
+        self.lock_timeout = lock_timeout
+        self.lock = None
+        self.workers = max(1, workers)
+        self.images = ImageIndex(self.current_dir)
+        self.tools = {}
+        self.plans = {}
+        self.journal = None
+        self._journal_lock = threading.Lock()
+        
+    def log(self, message, level="INFO"):
+        """Log a message with timestamp and level."""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        with GapClosingTool._log_lock:
+            self.log_stream.emit(level, message)
+            print(f"[{timestamp}] {level}: {message}")
+        
+    def error(self, message):
+        """Log an error message."""
+        self.log(message, "ERROR")
+        self.errors.append(message)
+    
+    def scan(self):
+        """List the course root once and create a GapClosingTool per unit."""
+        lessons = {}
+        with os.scandir(self.current_dir) as entries:
+            for entry in entries:
+                match = LESSON_FILE_PATTERN.match(entry.name)
+                if match and 1 <= int(match.group(1)) <= 12 and entry.is_file():
+                    lessons.setdefault(match.group(1), []).append(self.current_dir / entry.name)
+        self.metrics.count("files_scanned", sum(len(files) for files in lessons.values()))
+        for unit, files in sorted(lessons.items()):
+            tool = GapClosingTool(unit, self.dry_run, self.backup_dir, metrics=self.metrics, images=self.images,
+                                  lesson_files=files, log_stream=self.log_stream)
+            tool.backup_path = self.backup_path
+            self.tools[unit] = tool
+    
+    def plan(self, verbose=True):
+        """Plan and validate every unit. Returns False if any plan is invalid."""
+        for unit, tool in self.tools.items():
+            lesson_plan, image_plan = tool.generate_renaming_plan()
+            if not (lesson_plan or image_plan):
+                continue
+            self.plans[unit] = (lesson_plan, image_plan)
+            if verbose:
+                self.log(f"Unit {unit}: {len(lesson_plan)} lessons + {len(image_plan)} images to rename")
+                for item in lesson_plan + image_plan:
+                    self.log(f"  {item['old_num']:02d} → {item['new_num']:02d}: {item['old_path'].name} "
+                             f"→ {item['new_path'].name}")
+            if not tool.validate_plan(lesson_plan, image_plan):
+                self.errors.extend(tool.errors)
+        return not self.errors
+    
+    def plan_signature(self):
+        """Return the planned renames as {unit: [(old path, new path)]}, for comparing plans."""
+        return {unit: [(item['old_path'], item['new_path']) for item in lesson_plan + image_plan]
+                for unit, (lesson_plan, image_plan) in self.plans.items()}
+    
+    def replan(self):
+        """
+        Scan and plan again (under the unit locks). Returns False if the plan is no
+        longer the one that was previewed: lessons or images moved in the meantime.
+        """
+        planned = self.plan_signature()
+        self.images.refresh()
+        self.tools, self.plans = {}, {}
+        self.scan()
+        return self.plan(verbose=False) and self.plan_signature() == planned
+    
+    def batches(self):
+        """
+        Split the planned units into a concurrent batch and a sequential remainder.
+        Units only share files if their names collide case-insensitively; those run one at a time.
+        """
+        touched = {}
+        for unit, (lesson_plan, image_plan) in self.plans.items():
+            touched[unit] = {str(item[key]).casefold() for item in lesson_plan + image_plan
+                             for key in ('old_path', 'new_path')}
+        concurrent, sequential = [], []
+        for unit in self.plans:
+            overlaps = any(touched[unit] & touched[other] for other in self.plans if other != unit)
+            (sequential if overlaps else concurrent).append(unit)
+        return concurrent, sequential
+    
+    def write_journal(self, **updates):
+        """Update the batch journal and replace it atomically."""
+        with self._journal_lock:
+            self.journal.update(updates)
+            self.journal['updated'] = datetime.now().isoformat(timespec='seconds')
+            fd, temp_path = tempfile.mkstemp(dir=self.backup_path, prefix=JOURNAL_NAME, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.journal, f, indent=1)
+            os.replace(temp_path, self.journal_path)
+    
+    def rename_unit(self, unit):
+        """Rename one unit's files (runs in a worker thread). Returns success."""
+        success = self.tools[unit].execute_renaming()
+        if success:
+            self.write_journal(done=sorted(self.journal['done'] + [unit]))
+        return success
+    
+    def lock_units(self):
+        """Lock the units being renamed against concurrent course operations."""
+        try:
+            self.lock = CourseLock([unit_scope(unit) for unit in self.plans], "close_lesson_gaps",
+                                   self.current_dir, self.lock_timeout).acquire()
+        except LockError as e:
+            self.error(f"Cannot close gaps while another operation is running: {e}")
+            return False
+        return True
+    
+    def release_lock(self):
+        """Release the unit locks, if held."""
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+    
+    def create_backup(self):
+        """Back up all planned units into one directory, take one snapshot and start the journal."""
+        try:
+            for unit in self.plans:
+                self.tools[unit].backup_files()
+            self.log(f"Backup created at: {self.backup_path}")
+            self.snapshot_id = SnapshotStore(self.current_dir).create(
+                label=f"close_lesson_gaps --all ({', '.join(self.plans)})")
+            self.log(f"Created snapshot: {self.snapshot_id}")
+            self.journal = {
+                'snapshot': self.snapshot_id,
+                'started': datetime.now().isoformat(timespec='seconds'),
+                'status': 'running',
+                'units': {unit: [[item['old_path'].name, item['new_path'].name]
+                                 for item in lesson_plan + image_plan]
+                          for unit, (lesson_plan, image_plan) in self.plans.items()},
+                'done': [],
+            }
+            self.write_journal()
+            return True
+        except Exception as e:
+            self.error(f"Failed to create backup: {e}")
+            return False
+    
+    def execute(self):
+        """Rename the planned units: disjoint ones concurrently, the rest one at a time."""
+        concurrent, sequential = self.batches()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self.rename_unit, concurrent))
+        if all(results):
+            results += [self.rename_unit(unit) for unit in sequential]
+        for tool in self.tools.values():
+            self.errors.extend(tool.errors)
+        return all(results)
+    
+    def run(self):
+        """Close the gaps of all units, timed and recorded by the instrumentation layer."""
+        with self.metrics.session():
+            try:
+                success = self._run_steps()
+                self.images.save()
+            finally:
+                self.release_lock()
+            self.metrics.set_status("success" if success else "failed")
+        self.log_stream.finish(success)
+        return success
+    
+    def _run_steps(self):
+        """Run the course-wide gap closing steps."""
+        self.log("=" * 60)
+        self.log("LESSON GAP CLOSING TOOL - ALL UNITS")
+        self.log("=" * 60)
+        if self.dry_run:
+            self.log("DRY RUN MODE - No files will be modified")
+        
+        with self.metrics.phase("scan"):
+            self.scan()
+        if not self.tools:
+            self.error("No lesson files found")
+            return False
+        self.log(f"Found {len(self.tools)} units: {', '.join(self.tools)}")
+        
+        with self.metrics.phase("plan"):
+            plan_ok = self.plan()
+        if not plan_ok:
+            self.error("Renaming plan validation failed. Aborting.")
+            return False
+        if not self.plans:
+            self.log("No gaps found in any unit - no changes needed")
+            return True
+        
+        self.log(f"\nTOTAL: {len(self.plans)} units to renumber")
+        if self.dry_run:
+            self.log("\nDRY RUN COMPLETE - Run without --dry-run to execute changes")
+            return True
+        
+        if not self.lock_units():
+            return False
+        # The units may have changed while waiting for their locks
+        with self.metrics.phase("plan"):
+            plan_current = self.replan()
+        if not plan_current:
+            self.error("Lessons or images changed while waiting for the unit locks. Run again.")
+            return False
+        with self.metrics.phase("backup"):
+            backup_ok = self.create_backup()
+        if not backup_ok:
+            return False
+        
+        with self.metrics.phase("rename"):
+            success = self.execute()
+        
+        self.log("=" * 60)
+        if success:
+            self.write_journal(status='complete')
+            self.log(f"GAP CLOSING COMPLETED SUCCESSFULLY FOR {len(self.plans)} UNITS!")
+            self.log(f"Backup and journal available at: {self.backup_path}")
+        else:
+            self.log("GAP CLOSING FAILED - Restoring snapshot")
+            try:
+                with self.metrics.phase("rollback"):
+                    SnapshotStore(self.current_dir).restore(self.snapshot_id, log=self.log,
+                                                            units=[int(unit) for unit in self.plans])
+                self.write_journal(status='rolled_back')
+                self.log(f"Rollback completed from snapshot {self.snapshot_id}")
+            except OSError as e:
+                self.write_journal(status='failed')
+                self.error(f"Snapshot restore failed: {e}")
+                self.log(f"Backup and journal location: {self.backup_path}")
+        self.log("=" * 60)
+        return success
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Close gaps in lesson numbering by renaming files sequentially',
@@ -290,15 +701,28 @@ Examples:
   python close_lesson_gaps.py 1 --dry-run          # Preview Unit 1 gap closing
   python close_lesson_gaps.py 1                    # Execute Unit 1 gap closing  
   python close_lesson_gaps.py 2 --backup-dir=gaps  # Custom backup directory
+  python close_lesson_gaps.py --all                # Close the gaps of every unit in one pass
         """
     )
     
-    parser.add_argument('unit_number', type=str, help='Unit number to process (1-12)')
+    parser.add_argument('unit_number', type=str, nargs='?', help='Unit number to process (1-12)')
+    parser.add_argument('--all', action='store_true', help='Close the gaps of every unit in one batch')
+    parser.add_argument('--workers', type=int, default=4, help='With --all: units renamed concurrently (default: 4)')
     parser.add_argument('--dry-run', action='store_true', help='Preview changes without modifying files')
     parser.add_argument('--backup-dir', type=str, help='Custom backup directory name')
+    add_instrumentation_arguments(parser)
+    add_lock_arguments(parser)
     
     args = parser.parse_args()
     
+    if args.all == (args.unit_number is not None):
+        parser.error("give either a unit number or --all")
+    if args.all:
+        tool = CourseGapClosingTool(args.dry_run, args.backup_dir,
+                                    metrics=Instrumentation.from_args("close_lesson_gaps", args),
+                                    lock_timeout=args.lock_timeout, workers=args.workers)
+        return 0 if tool.run() else 1
+    
     # Validate unit number
     try:
         unit_num = int(args.unit_number)
@@ -309,7 +733,9 @@ Examples:
         return 1
     
     # Run the tool
-    tool = GapClosingTool(args.unit_number, args.dry_run, args.backup_dir)
+    tool = GapClosingTool(args.unit_number, args.dry_run, args.backup_dir,
+                          metrics=Instrumentation.from_args("close_lesson_gaps", args),
+                          lock_timeout=args.lock_timeout)
     success = tool.run()
     
     return 0 if success else 1
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Course Command Line
+
+One entry point for the course tools. Each subcommand is the tool's own
+command line (same arguments, same help), but only the module of the
+subcommand that runs is imported, so 'course outline' does not pay for the
+image or packaging code.
+
+Several commands can be chained with '+' and run in one interpreter, sharing
+already-imported modules, instead of starting Python once per step:
+
+    python scripts/course.py renumber 5 --force + outline --update-readme
+
+The chain stops at the first command that fails.
+
+Usage:
+    python scripts/course.py                          # List subcommands
+    python scripts/course.py outline --update-readme
+    python scripts/course.py close-gaps 2 --dry-run
+    python scripts/course.py bench                    # Measure cold-start time
+"""
+
+import os
+import sys
+import time
+import importlib.util
+import subprocess
+import statistics
+from pathlib import Path
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+CHAIN_SEPARATOR = '+'
+
+# subcommand: (script in scripts/, description)
+COMMANDS = {
+    'outline': ('generate_course_outline.py', "Generate the course outline and update README.md"),
+    'renumber': ('renumber_lessons.py', "Renumber lessons to make room for a new lesson"),
+    'new-lesson': ('new_lesson.py', "Create a specification-compliant lesson at a position in a unit"),
+    'close-gaps': ('close_lesson_gaps.py', "Close numbering gaps in a unit (or --all units)"),
+    'rollback': ('rollback_lessons.py', "Restore a snapshot or backup"),
+    'compliance': ('lesson_compliance.py', "Bring lessons in line with the design specification"),
+    'sort-images': ('sort-images-flat.py', "Sort captured images into images/ (flat layout)"),
+    'sort-images-legacy': ('sort_images.py', "Sort captured images by UULL group (legacy layout)"),
+    'migrate': ('migrate-to-flat.py', "Migrate images to the flat layout"),
+    'workflow': ('course_workflow.py', "Run a maintenance workflow in one process"),
+    'headings': ('lesson_headings.py', "Check lesson heading numbers"),
+    'images': ('image_headers.py', "Audit image sizes and dimensions"),
+    'optimize-images': ('optimize_images.py', "Optimize images for the web"),
+    'deploy-images': ('deploy_images.py', "Stage changed web images for deployment"),
+    'package': ('package_course.py', "Build the SCORM package"),
+    'quiz-bank': ('quiz_bank.py', "Extract quizzes into the question bank"),
+    'links': ('link_checker.py', "Check external links"),
+    'locks': ('course_locks.py', "Show or break course locks"),
+    'log': ('automation_log.py', "Query the automation log"),
+}
+
+
+def load_command(name):
+    """Import the module of a subcommand (once per process)."""
+    script = COMMANDS[name][0]
+    module_name = Path(script).stem.replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPTS_DIR / script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_command(name, arguments):
+    """
+    Run a subcommand's main() with its own argument list.
+
+    Returns:
+        int: Exit code of the subcommand
+    """
+    saved_argv = sys.argv
+    sys.argv = [f"course {name}"] + list(arguments)
+    try:
+        result = load_command(name).main()
+    except SystemExit as e:
+        result = e.code
+    finally:
+        sys.argv = saved_argv
+    if result is None or result is True:
+        return 0
+    if isinstance(result, int):
+        return result
+    if result is not False:
+        print(result, file=sys.stderr)
+    return 1
+
+
+def split_chain(arguments):
+    """Split 'a x + b y' into [['a', 'x'], ['b', 'y']]."""
+    chain, current = [], []
+    for argument in arguments:
+        if argument == CHAIN_SEPARATOR:
+            chain.append(current)
+            current = []
+        else:
+            current.append(argument)
+    chain.append(current)
+    return [segment for segment in chain if segment]
+
+
+def print_usage():
+    print("Usage: python scripts/course.py <command> [arguments] [+ <command> [arguments] ...]")
+    print("\nCommands:")
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, description) in COMMANDS.items():
+        print(f"  {name:<{width}}  {description}")
+    print(f"  {'bench':<{width}}  Measure cold-start time of the commands")
+    print("\nRun 'python scripts/course.py <command> --help' for the options of a command.")
+
+
+def _time_process(command, runs):
+    """Median wall-clock seconds of running a command `runs` times."""
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def bench(arguments):
+    """
+    Measure cold-start time: the bare interpreter, each command started as its own
+    script and through this CLI (with --help, so nothing is changed), and all of
+    them chained in one process. Results are recorded in the metrics file.
+    """
+    import argparse
+    from instrumentation import Instrumentation, add_instrumentation_arguments
+
+    parser = argparse.ArgumentParser(prog="course bench", description=bench.__doc__)
+    parser.add_argument('commands', nargs='*', help='Commands to measure (default: all)')
+    parser.add_argument('--runs', type=int, default=5, help='Runs per measurement (default: 5)')
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args(arguments)
+    names = args.commands or list(COMMANDS)
+    unknown = [name for name in names if name not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown commands: {', '.join(unknown)}")
+
+    metrics = Instrumentation.from_args("course_bench", args)
+    python = [sys.executable]
+    cli = python + [str(Path(__file__).resolve())]
+    with metrics.session():
+        baseline = _time_process(python + ['-c', 'pass'], args.runs)
+        metrics.count("interpreter_us", int(baseline * 1e6))
+        print(f"Interpreter start: {baseline * 1000:.1f} ms (median of {args.runs})")
+        print(f"\n{'command':<20} {'script':>10} {'course':>10}")
+        standalone_total = 0.0
+        for name in names:
+            with metrics.phase("measure"):
+                standalone = _time_process(python + [str(SCRIPTS_DIR / COMMANDS[name][0]), '--help'], args.runs)
+                through_cli = _time_process(cli + [name, '--help'], args.runs)
+            standalone_total += standalone
+            metrics.count(f"{name}_script_us", int(standalone * 1e6))
+            metrics.count(f"{name}_course_us", int(through_cli * 1e6))
+            print(f"{name:<20} {standalone * 1000:>8.1f}ms {through_cli * 1000:>8.1f}ms")
+
+        chain = []
+        for name in names:
+            chain += [name, '--help', CHAIN_SEPARATOR]
+        chained = _time_process(cli + chain[:-1], args.runs)
+        metrics.count("chain_course_us", int(chained * 1e6))
+        metrics.count("chain_scripts_us", int(standalone_total * 1e6))
+        print(f"\n{len(names)} commands as separate scripts: {standalone_total * 1000:.1f} ms, "
+              f"chained in one process: {chained * 1000:.1f} ms")
+    return 0
+
+
+def main():
+    arguments = sys.argv[1:]
+    if not arguments or arguments[0] in ('-h', '--help', 'help'):
+        print_usage()
+        return 0
+    if arguments[0] == 'bench':
+        return bench(arguments[1:])
+
+    chain = split_chain(arguments)
+    unknown = [segment[0] for segment in chain if segment[0] not in COMMANDS]
+    if unknown:
+        print(f"❌ Unknown command: {', '.join(unknown)}\n")
+        print_usage()
+        return 2
+    for segment in chain:
+        code = run_command(segment[0], segment[1:])
+        if code != 0:
+            if len(chain) > 1:
+                print(f"❌ '{' '.join(segment)}' failed (exit code {code}); stopping the chain", file=sys.stderr)
+            return code
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Advisory Lock Manager for Course Operations
+
+Prevents two tools (two people on the shared course folder, or a watch job and
+a batch file) from modifying the same part of the course at the same time.
+
+Locks are lease files in .course_locks/, one per scope:
+- unit-UU.lock  - lessons UU-*.md and images UU_*.png of one unit
+- course.lock   - the whole course (image sorting, migration, full restores)
+
+Operations on different units run in parallel; an operation on a unit that is
+already locked waits (--lock-timeout) or fails fast. The course lock conflicts
+with every unit lock.
+
+Lock files are plain files created exclusively, so they work on any file
+system (including synced folders) without fcntl. Each lock records its owner,
+host and pid, and a heartbeat thread refreshes its mtime while it is held. A
+lock is stale, and is broken by the next caller, when its lease has not been
+renewed for the lease period or its process no longer runs on this host.
+
+Usage (inside a tool):
+    with CourseLock([unit_scope(2)], owner="close_lesson_gaps", timeout=30):
+        ...
+
+Command line:
+    python course_locks.py status
+    python course_locks.py break unit-02
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+
+
+LOCK_DIR = ".course_locks"
+COURSE_SCOPE = "course"
+LOCK_TIMEOUT_ENV_VAR = "COURSE_LOCK_TIMEOUT"
+DEFAULT_LEASE_SECONDS = 60
+POLL_INTERVAL = 0.2
+
+HOSTNAME = socket.gethostname()
+
+# Scopes and lock tokens held by the current thread, so nested operations (a
+# tool run inside an operation that already holds the lock) do not block themselves
+_held = threading.local()
+
+
+def _held_scopes():
+    if not hasattr(_held, 'scopes'):
+        _held.scopes = {}
+        _held.tokens = set()
+    return _held.scopes
+
+
+class LockError(Exception):
+    """Raised when a lock cannot be acquired."""
+
+
+def unit_scope(unit_number):
+    """Return the lock scope for a unit number (int or 'UU' string)."""
+    return f"unit-{int(unit_number):02d}"
+
+
+def scopes_for(paths):
+    """Return the unit scopes covering lesson, image or captured-image paths (UU-..., UU_..., 'UU LL ...')."""
+    scopes = set()
+    for path in paths:
+        match = re.match(r'^(\d{2})[-_ ]', Path(path).name)
+        if match:
+            scopes.add(unit_scope(match.group(1)))
+    return sorted(scopes)
+
+
+def default_lock_timeout():
+    """Return the lock timeout configured by the environment (default: fail fast)."""
+    try:
+        return float(os.environ.get(LOCK_TIMEOUT_ENV_VAR, 0))
+    except ValueError:
+        return 0.0
+
+
+def add_lock_arguments(parser):
+    """Add the shared --lock-timeout option to an argparse parser."""
+    parser.add_argument('--lock-timeout', type=float, default=None, metavar='SECONDS',
+                        help=f'Wait up to SECONDS for other operations on the same units to finish '
+                             f'(default: ${LOCK_TIMEOUT_ENV_VAR} or 0 = fail immediately)')
+    return parser
+
+
+def _pid_alive(pid):
+    """True if a process with this pid is running on this host."""
+    if pid <= 0:
+        return False
+    if os.name == 'nt':
+        import ctypes
+        SYNCHRONIZE, WAIT_TIMEOUT = 0x00100000, 0x00000102
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if not handle:
+            return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) == WAIT_TIMEOUT
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_lock(path):
+    """
+    Read a lock file.
+
+    Returns:
+        dict or None: Lock info plus 'age_s' (seconds since the last heartbeat);
+                      None if the lock does not exist
+    """
+    try:
+        age = time.time() - os.stat(path).st_mtime
+        with open(path, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # Being written right now, or damaged
+        info = {}
+        try:
+            age = time.time() - os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+    info['age_s'] = age
+    return info
+
+
+def is_stale(info):
+    """True if a lock's lease expired or its owner process is gone."""
+    if info['age_s'] > info.get('lease_s', DEFAULT_LEASE_SECONDS):
+        return True
+    return info.get('host') == HOSTNAME and 'pid' in info and not _pid_alive(info['pid'])
+
+
+def _is_own(info):
+    _held_scopes()
+    return info.get('token') in _held.tokens
+
+
+class CourseLock:
+    def __init__(self, scopes, owner, course_path=None, timeout=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Initialize a lock over one or more scopes.
+
+        Args:
+            scopes (iterable): Scopes to lock (unit_scope(n) values and/or COURSE_SCOPE)
+            owner (str): Name of the operation holding the lock (shown to other users)
+            course_path (str, optional): Course root (default: current directory)
+            timeout (float, optional): Seconds to wait for conflicting locks (default: environment or 0)
+            lease_seconds (float): A lock not renewed for this long is considered stale
+        """
+        self.scopes = sorted(set(scopes))
+        self.owner = owner
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.lock_dir = self.course_path / LOCK_DIR
+        self.timeout = default_lock_timeout() if timeout is None else timeout
+        self.lease_seconds = lease_seconds
+        self.token = uuid.uuid4().hex
+        self._owned = []
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _path(self, scope):
+        return self.lock_dir / f"{scope}.lock"
+
+    def _create(self, scope):
+        """Create the lock file for a scope; False if another holder has it."""
+        path = self._path(scope)
+        info = {
+            'scope': scope,
+            'owner': self.owner,
+            'host': HOSTNAME,
+            'pid': os.getpid(),
+            'token': self.token,
+            'acquired': datetime.now().isoformat(timespec='seconds'),
+            'lease_s': self.lease_seconds,
+        }
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        return True
+
+    def _break_if_stale(self, scope):
+        """Remove a stale lock file. Returns True if the lock was broken."""
+        path = self._path(scope)
+        info = read_lock(path)
+        if info is None or not is_stale(info):
+            return False
+        broken = path.with_name(f"{path.name}.{self.token}.stale")
+        try:
+            os.rename(path, broken)
+        except OSError:
+            return False
+        # Someone may have broken and re-created the lock between our read and rename
+        current = read_lock(broken)
+        if current is not None and current.get('token') != info.get('token'):
+            try:
+                os.rename(broken, path)
+            except OSError:
+                pass
+            return False
+        broken.unlink(missing_ok=True)
+        return True
+
+    def _conflicts(self):
+        """Return lock infos of other holders that conflict through the course/unit hierarchy."""
+        conflicts = []
+        if COURSE_SCOPE in self.scopes:
+            candidates = list(self.lock_dir.glob("unit-*.lock"))
+        else:
+            candidates = [self._path(COURSE_SCOPE)]
+        for path in candidates:
+            info = read_lock(path)
+            if info is None or info.get('token') == self.token or _is_own(info):
+                continue
+            if is_stale(info):
+                self._break_if_stale(path.stem)
+                continue
+            info.setdefault('scope', path.stem)
+            conflicts.append(info)
+        return conflicts
+
+    def _try_acquire(self):
+        """One attempt at taking every scope. Returns the blocking lock info, or None on success."""
+        held = _held_scopes()
+        for scope in self.scopes:
+            if scope in held or (scope != COURSE_SCOPE and COURSE_SCOPE in held):
+                continue
+            if not self._create(scope):
+                if self._break_if_stale(scope) and self._create(scope):
+                    self._owned.append(scope)
+                    continue
+                blocker = read_lock(self._path(scope)) or {}
+                blocker.setdefault('scope', scope)
+                return blocker
+            self._owned.append(scope)
+
+        if self._owned:
+            conflicts = self._conflicts()
+            if conflicts:
+                return conflicts[0]
+        return None
+
+    def _release_files(self):
+        for scope in self._owned:
+            path = self._path(scope)
+            info = read_lock(path)
+            if info is not None and info.get('token') == self.token:
+                path.unlink(missing_ok=True)
+        self._owned = []
+
+    def acquire(self):
+        """
+        Acquire all scopes, waiting up to the timeout.
+
+        Raises:
+            LockError: If another operation holds a conflicting lock
+        """
+        if not self.scopes:
+            return self
+        try:
+            self.lock_dir.mkdir(exist_ok=True)
+        except OSError as e:
+            raise LockError(f"Cannot create lock directory {self.lock_dir}: {e}")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            blocker = self._try_acquire()
+            if blocker is None:
+                break
+            self._release_files()
+            if time.monotonic() >= deadline:
+                raise LockError(
+                    f"{blocker.get('scope')} is locked by '{blocker.get('owner', 'unknown')}' "
+                    f"(pid {blocker.get('pid', '?')} on {blocker.get('host', '?')}, "
+                    f"since {blocker.get('acquired', '?')})")
+            # Jitter, so two operations backing off from each other do not retry in lockstep
+            time.sleep(POLL_INTERVAL * (0.5 + random.random()))
+
+        held = _held_scopes()
+        for scope in self.scopes:
+            held[scope] = held.get(scope, 0) + 1
+        _held.tokens.add(self.token)
+
+        if self._owned:
+            self._stop.clear()
+            self._heartbeat = threading.Thread(target=self._renew, daemon=True)
+            self._heartbeat.start()
+        return self
+
+    def _renew(self):
+        while not self._stop.wait(self.lease_seconds / 4):
+            for scope in list(self._owned):
+                try:
+                    os.utime(self._path(scope))
+                except OSError:
+                    pass
+
+    def release(self):
+        """Release all scopes held by this lock."""
+        if self._heartbeat is not None:
+            self._stop.set()
+            self._heartbeat.join()
+            self._heartbeat = None
+        self._release_files()
+        held = _held_scopes()
+        for scope in self.scopes:
+            if held.get(scope, 0) > 1:
+                held[scope] -= 1
+            else:
+                held.pop(scope, None)
+        _held.tokens.discard(self.token)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def list_locks(course_path=None):
+    """Return info for every lock file in the course, sorted by scope."""
+    lock_dir = (Path(course_path) if course_path else Path.cwd()) / LOCK_DIR
+    locks = []
+    if lock_dir.exists():
+        for path in sorted(lock_dir.glob("*.lock")):
+            info = read_lock(path)
+            if info is not None:
+                info.setdefault('scope', path.stem)
+                info['stale'] = is_stale(info)
+                locks.append(info)
+    return locks
+
+
+def main():
+    """Show or break course locks."""
+    parser = argparse.ArgumentParser(description="Show or break course operation locks")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    subparsers.add_parser('status', help='List held locks')
+    break_parser = subparsers.add_parser('break', help='Force-remove a lock whose owner is known to be gone')
+    break_parser.add_argument('scope', help="Lock scope, e.g. 'unit-02' or 'course'")
+    args = parser.parse_args()
+
+    if args.action == 'status':
+        locks = list_locks()
+        if not locks:
+            print("(No locks held)")
+        for info in locks:
+            state = "STALE" if info['stale'] else "held"
+            print(f"  {info['scope']:<10} {state:<6} {info.get('owner', '?')} "
+                  f"(pid {info.get('pid', '?')} on {info.get('host', '?')}, "
+                  f"since {info.get('acquired', '?')}, heartbeat {info['age_s']:.0f}s ago)")
+        return 0
+
+    path = Path.cwd() / LOCK_DIR / f"{args.scope}.lock"
+    if not path.exists():
+        print(f"No lock held for {args.scope}")
+        return 0
+    path.unlink()
+    print(f"✓ Removed lock {args.scope}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Shared Course Model
+
+Scans the flat course layout once (UU-LL-lesson-title.md files at the root and
+images/*.png) and exposes the result to every tool that runs in the same
+process, so chained workflow steps do not each rescan the course directory.
+
+Per-course settings (course title and unit titles) are read from course.json
+at the course root; courses without one use the titles of the water
+management course this template was built for.
+
+Usage:
+    model = CourseModel(course_path)
+    model.scan()
+    for lesson in model.lessons:
+        print(lesson['unit_number'], lesson['lesson_number'], lesson['filename'])
+    model.config['unit_titles'][2]
+"""
+
+import os
+import re
+import json
+import threading
+from pathlib import Path
+from collections import defaultdict
+
+
+LESSON_FILENAME_PATTERN = re.compile(r'^(\d{2})-(\d{2})-(.+)\.md$')
+IMAGE_FILENAME_PATTERN = re.compile(r'^(\d{2})_(\d{2})_(.+)\.png$')
+# Shard folders of a sharded images/ layout: images/UU/ or a two-hex-digit fan-out
+SHARD_DIR_PATTERN = re.compile(r'^[0-9a-f]{2}$')
+
+COURSE_CONFIG_FILE = "course.json"
+DEFAULT_COURSE_TITLE = "GoldSim Water Management Course"
+DEFAULT_UNIT_TITLES = {
+    1: "Foundations and Data Preparation",
+    2: "Climate Data and Weather Modeling",
+    3: "Hydrology and Water Balance",
+    4: "Water Demand and Consumption",
+    5: "Reservoir Modeling and Operations",
+    6: "Water Quality and Treatment",
+    7: "Groundwater Systems",
+    8: "Integrated System Analysis",
+    9: "Advanced Topics",
+    10: "Case Studies and Applications"
+}
+
+
+def iter_image_files(images_path):
+    """
+    Yield (relative_path, os.DirEntry) for every PNG in an images folder.
+
+    Covers the flat layout and the sharded layouts (one level of shard folders);
+    other subfolders such as images/web/ are not part of the course images.
+    """
+    with os.scandir(images_path) as entries:
+        shards = []
+        for entry in entries:
+            if entry.is_dir() and SHARD_DIR_PATTERN.match(entry.name):
+                shards.append(entry.name)
+            elif entry.name.lower().endswith('.png') and entry.is_file():
+                yield entry.name, entry
+    for shard in shards:
+        with os.scandir(os.path.join(images_path, shard)) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith('.png') and entry.is_file():
+                    yield f"{shard}/{entry.name}", entry
+
+
+def load_course_config(course_path):
+    """
+    Read the settings of a course from its course.json.
+
+    Args:
+        course_path (str or Path): Course root
+
+    Returns:
+        dict: {'title': str, 'unit_titles': {unit_number: title}}
+
+    Raises:
+        ValueError: If course.json exists but is not valid
+    """
+    config_file = Path(course_path) / COURSE_CONFIG_FILE
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {'title': DEFAULT_COURSE_TITLE, 'unit_titles': dict(DEFAULT_UNIT_TITLES)}
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{config_file}: {e}") from e
+    try:
+        unit_titles = {int(unit): str(title) for unit, title in data.get('unit_titles', {}).items()}
+    except (AttributeError, ValueError) as e:
+        raise ValueError(f"{config_file}: unit_titles must map unit numbers to titles") from e
+    return {'title': data.get('title') or Path(course_path).resolve().name, 'unit_titles': unit_titles}
+
+
+def is_course_root(path):
+    """True if a folder holds a course: a course.json or at least one UU-LL-title.md lesson."""
+    if (Path(path) / COURSE_CONFIG_FILE).is_file():
+        return True
+    with os.scandir(path) as entries:
+        return any(LESSON_FILENAME_PATTERN.match(entry.name) and entry.is_file() for entry in entries)
+
+
+def discover_courses(workspace):
+    """
+    Find the course roots in a workspace: the workspace itself if it is a course,
+    plus every immediate subfolder that is one.
+
+    Args:
+        workspace (str or Path): Folder holding one or more courses
+
+    Returns:
+        list: Course root paths, sorted by name
+    """
+    workspace = Path(workspace)
+    courses = [workspace] if is_course_root(workspace) else []
+    with os.scandir(workspace) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.is_dir() and not entry.name.startswith('.') and is_course_root(entry.path):
+                courses.append(Path(entry.path))
+    return courses
+
+
+def parse_lesson_filename(filename):
+    """
+    Parse a lesson filename to extract unit, lesson number, and title.
+
+    Args:
+        filename (str): The lesson filename (e.g., '01-02-course-resources-and-setup.md')
+
+    Returns:
+        tuple: (unit_number, lesson_number, lesson_title) or (None, None, None) if parsing fails
+    """
+    match = LESSON_FILENAME_PATTERN.match(filename)
+    if not match:
+        return None, None, None
+
+    # Convert hyphens to spaces and apply title case
+    lesson_title = match.group(3).replace('-', ' ').title()
+    return int(match.group(1)), int(match.group(2)), lesson_title
+
+
+class CourseModel:
+    def __init__(self, course_path=None):
+        """
+        Initialize the course model.
+
+        Args:
+            course_path (str, optional): Path to the course directory.
+                                       If None, uses current directory.
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.images_path = self.course_path / "images"
+        self.lessons = []
+        self.images = []
+        self.image_locations = {}
+        self.scanned = False
+        self._config = None
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        """Course settings from course.json (see load_course_config()), read once."""
+        if self._config is None:
+            self._config = load_course_config(self.course_path)
+        return self._config
+
+    def scan(self):
+        """
+        Scan lesson files and images. The result is shared until refresh() is called.
+
+        Returns:
+            CourseModel: self, for chaining
+        """
+        with self._lock:
+            if self.scanned:
+                return self
+
+            lessons = []
+            for file_path in self.course_path.iterdir():
+                unit_num, lesson_num, lesson_title = parse_lesson_filename(file_path.name)
+                if unit_num is not None and file_path.is_file():
+                    lessons.append({
+                        'unit_number': unit_num,
+                        'lesson_number': lesson_num,
+                        'lesson_title': lesson_title,
+                        'filename': file_path.name
+                    })
+            lessons.sort(key=lambda x: (x['unit_number'], x['lesson_number'], x['filename']))
+
+            locations = {}
+            if self.images_path.is_dir():
+                locations = {entry.name: rel_path for rel_path, entry in iter_image_files(self.images_path)}
+
+            self.lessons = lessons
+            self.images = sorted(locations)
+            self.image_locations = locations
+            self.scanned = True
+            return self
+
+    def refresh(self):
+        """Discard the cached scan and rescan (call after steps that rename files)."""
+        with self._lock:
+            self.scanned = False
+        return self.scan()
+
+    def lessons_by_unit(self):
+        """Return {unit_number: [lesson, ...]} with lessons sorted by lesson number."""
+        units = defaultdict(list)
+        for lesson in self.scan().lessons:
+            units[lesson['unit_number']].append(lesson)
+        return units
+
+    def lesson_paths(self):
+        """Return full paths of all lesson files."""
+        return [self.course_path / lesson['filename'] for lesson in self.scan().lessons]
+
+    def image_paths(self):
+        """Return full paths of all images in the global images folder (flat or sharded)."""
+        self.scan()
+        return [self.images_path / self.image_locations[name] for name in self.images]
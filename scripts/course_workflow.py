@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Course Workflow Orchestrator
+
+Cross-platform, in-process replacement for the run_update.bat /
+complete_workflow.bat pipeline. Workflow steps are declared as a DAG and run in
+one Python process: the course directory is scanned once into a shared
+CourseModel, and steps whose dependencies are satisfied (image optimization,
+compliance check, outline generation) run concurrently in a thread pool.
+
+WORKFLOWS:
+- update: [renumber] → update-readme → print-outline   (run_update.bat)
+- full:   [renumber] → compliance → check-headings | optimize-images | update-readme → print-outline
+
+Usage:
+    python course_workflow.py [update|full] [--insert N] [--steps A,B] [--workers N] [--dry-run]
+
+Examples:
+    python course_workflow.py                      # Update README.md and ASSETS_NEEDED.md
+    python course_workflow.py update --insert 3    # Renumber from lesson 03, then update docs
+    python course_workflow.py full --workers 3     # Compliance, images and docs concurrently
+    python course_workflow.py --steps compliance   # Run selected steps only
+    python course_workflow.py full --list-steps    # Show the step graph
+    python course_workflow.py full --since HEAD    # Only lessons/images changed since HEAD
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from course_model import CourseModel
+from git_changes import add_since_argument, load_changes
+from lesson_parser import LessonIndex
+from course_locks import CourseLock, scopes_for, add_lock_arguments
+
+
+class WorkflowStep:
+    def __init__(self, name, action, depends_on=(), description="", supports_dry_run=False):
+        """
+        A single node of the workflow graph.
+
+        Args:
+            name (str): Step name (e.g., 'update-readme')
+            action (callable): Called with the Workflow; returns True on success
+            depends_on (iterable): Names of steps that must succeed first
+            description (str): One-line description for --list-steps
+            supports_dry_run (bool): Whether the step can preview its changes
+        """
+        self.name = name
+        self.action = action
+        self.depends_on = tuple(depends_on)
+        self.description = description
+        self.supports_dry_run = supports_dry_run
+
+
+class Workflow:
+    def __init__(self, course_path=None, workers=4, dry_run=False, metrics=None):
+        """
+        Initialize a workflow over one course directory.
+
+        Args:
+            course_path (str, optional): Course root (default: current directory)
+            workers (int): Maximum number of steps run concurrently
+            dry_run (bool): Preview mode; steps without a dry-run mode are skipped
+            metrics (Instrumentation, optional): Shared instrumentation for all steps
+        """
+        self.model = CourseModel(course_path)
+        self.lessons = LessonIndex(self.model.course_path)
+        self.workers = max(1, workers)
+        self.dry_run = dry_run
+        self.metrics = metrics or Instrumentation("course_workflow")
+        self.steps = {}
+        self.results = {}
+        self.options = {}
+
+    def log(self, message):
+        """Log a message with timestamp (one write, so concurrent steps do not interleave)."""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        sys.stdout.write(f"[{timestamp}] {message}\n")
+        sys.stdout.flush()
+
+    def add_step(self, step):
+        """Add a step to the graph."""
+        self.steps[step.name] = step
+        return step
+
+    def execution_levels(self):
+        """
+        Validate the graph and group steps into levels that may run concurrently.
+
+        Returns:
+            list: Lists of step names; every step only depends on earlier levels
+
+        Raises:
+            ValueError: If a dependency is missing or the graph has a cycle
+        """
+        for step in self.steps.values():
+            for dependency in step.depends_on:
+                if dependency not in self.steps:
+                    raise ValueError(f"Step '{step.name}' depends on unknown step '{dependency}'")
+
+        remaining = {name: set(step.depends_on) for name, step in self.steps.items()}
+        levels = []
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError(f"Workflow has a dependency cycle: {', '.join(sorted(remaining))}")
+            levels.append(ready)
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return levels
+
+    def _run_step(self, step):
+        if self.dry_run and not step.supports_dry_run:
+            self.log(f"DRY-RUN: Would run step '{step.name}'")
+            return True
+        with self.metrics.phase(step.name):
+            return bool(step.action(self))
+
+    def run(self):
+        """
+        Run all steps, starting each as soon as its dependencies have succeeded.
+
+        Returns:
+            bool: True if every step succeeded
+        """
+        self.execution_levels()
+        pending = dict(self.steps)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+            while pending or running:
+                for name, step in list(pending.items()):
+                    states = [self.results.get(dep) for dep in step.depends_on]
+                    if any(state in ('failed', 'skipped') for state in states):
+                        self.results[name] = 'skipped'
+                        self.log(f"⏭️  Skipping '{name}' (a dependency did not succeed)")
+                        del pending[name]
+                    elif all(state == 'success' for state in states):
+                        self.log(f"▶ Starting step '{name}'")
+                        running[pool.submit(self._run_step, step)] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        succeeded = future.result()
+                    except Exception as e:
+                        self.log(f"ERROR: Step '{name}' raised: {e}")
+                        succeeded = False
+                    self.results[name] = 'success' if succeeded else 'failed'
+                    self.log(f"{'✓' if succeeded else '✗'} Step '{name}' {self.results[name]}")
+
+        if self.lessons.files_parsed:
+            self.lessons.save()
+        return all(state == 'success' for state in self.results.values())
+
+
+def step_renumber(workflow):
+    """Renumber lessons from the insertion point, then refresh the shared model."""
+    from renumber_lessons import LessonRenumberingTool
+
+    tool = LessonRenumberingTool(
+        insertion_point=workflow.options['insert'],
+        dry_run=workflow.dry_run,
+        metrics=workflow.metrics,
+        lock_timeout=workflow.options.get('lock_timeout')
+    )
+    success = tool.run()
+    workflow.model.refresh()
+    return success
+
+
+def step_compliance(workflow):
+    """Bring lesson files in line with the lesson design specification."""
+    import lesson_compliance
+
+    required_sections = lesson_compliance.parse_spec_sections(lesson_compliance.SPEC_PATH)
+    lesson_paths = workflow.model.lesson_paths()
+    if workflow.options.get('changes'):
+        lesson_paths = workflow.options['changes'].filter_lessons(lesson_paths)
+    updated = 0
+    with CourseLock(scopes_for(lesson_paths), "course_workflow compliance", workflow.model.course_path,
+                    workflow.options.get('lock_timeout')):
+        for path in lesson_paths:
+            if lesson_compliance.process_lesson_file(str(path), required_sections, workflow.lessons):
+                updated += 1
+    workflow.metrics.count("compliance_files_updated", updated)
+    workflow.log(f"Compliance: checked {len(lesson_paths)} lesson files. Updated: {updated}")
+    return True
+
+
+def step_check_headings(workflow):
+    """Report lessons whose "# Lesson N" heading does not match the filename."""
+    from lesson_headings import HeadingIndex
+
+    index = HeadingIndex(lesson_index=workflow.lessons)
+    filenames = [path.name for path in workflow.model.lesson_paths()]
+    if workflow.options.get('changes'):
+        filenames = workflow.options['changes'].filter_lessons(filenames)
+    drift = index.check(filenames)
+    for filename, file_number, heading in drift:
+        found = f"Lesson {heading}" if heading is not None else "no '# Lesson N' heading"
+        workflow.log(f"Heading drift: {filename} has {found}, expected Lesson {file_number}")
+    workflow.metrics.count("heading_drift", len(drift))
+    hint = " (fix with: python scripts/lesson_headings.py --fix)" if drift else ""
+    workflow.log(f"Headings: checked {len(filenames)} lessons. Drift: {len(drift)}{hint}")
+    return True
+
+
+def step_optimize_images(workflow):
+    """Write web-optimized copies of the course images."""
+    from optimize_images import optimize_images
+
+    all_paths = image_paths = workflow.model.image_paths()
+    if workflow.options.get('changes'):
+        image_paths = workflow.options['changes'].filter_images(image_paths)
+    counts = optimize_images(image_paths, workflow.model.images_path / "web",
+                             workers=workflow.workers, dry_run=workflow.dry_run,
+                             metrics=workflow.metrics, all_sources=all_paths)
+    workflow.log("Images: " + ", ".join(f"{name} {value}" for name, value in counts.items()))
+    return counts['failed'] == 0
+
+
+def step_deploy_images(workflow):
+    """Stage the web images that changed since the last deploy."""
+    from deploy_images import deploy
+
+    delta = deploy(workflow.model.images_path / "web", workers=workflow.workers,
+                   dry_run=workflow.dry_run, metrics=workflow.metrics, log=workflow.log)
+    return delta is not None
+
+
+def step_package_scorm(workflow):
+    """Build or incrementally update the SCORM package of the course."""
+    from package_course import build_package
+
+    counts = build_package(workflow.model.course_path, dry_run=workflow.dry_run,
+                           metrics=workflow.metrics, log=workflow.log)
+    return counts is not None
+
+
+def step_quiz_bank(workflow):
+    """Re-extract the quizzes of changed lessons into the question bank."""
+    from quiz_bank import QuizBank
+
+    if workflow.dry_run:
+        workflow.log("Quiz bank: skipped (dry run)")
+        return True
+    bank = QuizBank(workflow.model.course_path, metrics=workflow.metrics, workers=workflow.workers)
+    try:
+        result = bank.update(lesson_index=workflow.lessons)
+    finally:
+        bank.close()
+    workflow.log(f"Quiz bank: {result['parsed']} lessons extracted, {result['unchanged']} unchanged, "
+                 f"{result['removed']} removed")
+    return True
+
+
+def step_update_readme(workflow):
+    """Update README.md and ASSETS_NEEDED.md from the shared model."""
+    from generate_course_outline import CourseOutlineGenerator
+
+    changes = workflow.options.get('changes')
+    outline_current = changes and not changes.structure_changed and 'renumber' not in workflow.steps
+    if outline_current and not changes.images:
+        workflow.log(f"No lessons added, removed or renamed and no images changed since {changes.since} - "
+                     f"documentation is up to date")
+        return True
+
+    generator = CourseOutlineGenerator(metrics=workflow.metrics, course_model=workflow.model)
+    if outline_current:
+        # Only images changed: the outline stands, the asset summary's image statistics do not
+        workflow.log(f"No lessons added, removed or renamed since {changes.since} - updating the asset summary only")
+        return generator.update_assets_needed(workflow.options.get('assets_path', 'ASSETS_NEEDED.md'))
+    readme_success = generator.update_readme(workflow.options.get('readme_path', 'README.md'))
+    assets_success = generator.update_assets_needed(workflow.options.get('assets_path', 'ASSETS_NEEDED.md'))
+    return readme_success and assets_success
+
+
+def step_print_outline(workflow):
+    """Print the course outline."""
+    from generate_course_outline import CourseOutlineGenerator
+
+    generator = CourseOutlineGenerator(metrics=workflow.metrics, course_model=workflow.model)
+    print("\nCurrent Course Summary:")
+    print("-" * 50)
+    generator.print_outline()
+    return True
+
+
+STEP_DEFINITIONS = {
+    'renumber': (step_renumber, "Renumber lessons from --insert onwards", True),
+    'compliance': (step_compliance, "Apply the lesson design specification", False),
+    'check-headings': (step_check_headings, "Report '# Lesson N' headings that drifted from filenames", True),
+    'optimize-images': (step_optimize_images, "Optimize images into images/web", True),
+    'deploy-images': (step_deploy_images, "Stage changed web images for deployment", True),
+    'package-scorm': (step_package_scorm, "Build the SCORM package for the LMS (incremental)", True),
+    'quiz-bank': (step_quiz_bank, "Extract lesson quizzes into the question bank", True),
+    'update-readme': (step_update_readme, "Update README.md and ASSETS_NEEDED.md", False),
+    'print-outline': (step_print_outline, "Print the course outline", True),
+}
+
+WORKFLOWS = {
+    'update': ['update-readme', 'print-outline'],
+    'full': ['compliance', 'check-headings', 'optimize-images', 'update-readme', 'print-outline'],
+}
+
+# Dependencies between steps when both are part of the same run
+STEP_DEPENDENCIES = {
+    'compliance': ['renumber'],
+    'check-headings': ['renumber', 'compliance'],
+    'optimize-images': ['renumber'],
+    'deploy-images': ['optimize-images'],
+    'package-scorm': ['renumber', 'compliance', 'check-headings'],
+    'quiz-bank': ['renumber'],
+    'update-readme': ['renumber'],
+    'print-outline': ['update-readme', 'renumber'],
+}
+
+
+def build_workflow(step_names, course_path=None, workers=4, dry_run=False, metrics=None, options=None):
+    """
+    Build a workflow for the given step names, wiring up the standard dependencies.
+
+    Args:
+        step_names (list): Steps to include (see STEP_DEFINITIONS)
+        course_path (str, optional): Course root
+        workers (int): Maximum concurrent steps
+        dry_run (bool): Preview mode
+        metrics (Instrumentation, optional): Shared instrumentation
+        options (dict, optional): Step options (e.g., {'insert': 3})
+
+    Returns:
+        Workflow: The configured workflow
+
+    Raises:
+        ValueError: If a step name is unknown
+    """
+    workflow = Workflow(course_path, workers, dry_run, metrics)
+    workflow.options.update(options or {})
+
+    for name in step_names:
+        if name not in STEP_DEFINITIONS:
+            raise ValueError(f"Unknown step '{name}'. Available: {', '.join(STEP_DEFINITIONS)}")
+        action, description, supports_dry_run = STEP_DEFINITIONS[name]
+        depends_on = [dep for dep in STEP_DEPENDENCIES.get(name, []) if dep in step_names]
+        workflow.add_step(WorkflowStep(name, action, depends_on, description, supports_dry_run))
+
+    return workflow
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Run course maintenance workflows in-process as a dependency graph",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python course_workflow.py                      # Update README.md and ASSETS_NEEDED.md
+  python course_workflow.py update --insert 3    # Renumber from lesson 03, then update docs
+  python course_workflow.py full --workers 3     # Compliance, images and docs concurrently
+  python course_workflow.py --steps compliance   # Run selected steps only
+        """
+    )
+    parser.add_argument('workflow', nargs='?', choices=sorted(WORKFLOWS), default='update',
+                        help='Predefined workflow to run (default: update)')
+    parser.add_argument('--steps', type=str,
+                        help=f'Comma-separated steps to run instead ({", ".join(STEP_DEFINITIONS)})')
+    parser.add_argument('--insert', type=int, metavar='N',
+                        help='Renumber lessons from N onwards before the other steps')
+    parser.add_argument('--course-root', type=str, default=None,
+                        help='Course root directory (default: current directory)')
+    parser.add_argument('--workers', type=int, default=4, help='Maximum concurrent steps (default: 4)')
+    parser.add_argument('--dry-run', action='store_true', help='Preview changes without modifying files')
+    parser.add_argument('--list-steps', action='store_true', help='Show the step graph and exit')
+    add_since_argument(parser)
+    add_instrumentation_arguments(parser)
+    add_lock_arguments(parser)
+    args = parser.parse_args()
+
+    if args.insert is not None and not 1 <= args.insert <= 99:
+        print("Error: --insert must be between 1 and 99")
+        return 1
+
+    if args.course_root:
+        os.chdir(args.course_root)
+
+    step_names = [name.strip() for name in args.steps.split(',')] if args.steps else list(WORKFLOWS[args.workflow])
+    if args.insert is not None and 'renumber' not in step_names:
+        step_names.insert(0, 'renumber')
+
+    changes = load_changes(args.since)
+    if changes is False:
+        return 1
+
+    metrics = Instrumentation.from_args("course_workflow", args)
+    try:
+        workflow = build_workflow(step_names, workers=args.workers, dry_run=args.dry_run,
+                                  metrics=metrics, options={'insert': args.insert, 'changes': changes,
+                                                            'lock_timeout': args.lock_timeout})
+        levels = workflow.execution_levels()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+
+    if args.list_steps:
+        for number, level in enumerate(levels, 1):
+            for name in level:
+                step = workflow.steps[name]
+                after = f" (after {', '.join(step.depends_on)})" if step.depends_on else ""
+                print(f"  {number}. {name:<16} {step.description}{after}")
+        return 0
+
+    if 'renumber' in step_names and args.insert is None:
+        print("ERROR: The 'renumber' step requires --insert N")
+        return 1
+
+    print("=" * 60)
+    print(f"COURSE WORKFLOW: {', '.join(' | '.join(level) for level in levels)}")
+    print("=" * 60)
+    if args.dry_run:
+        print("*** DRY-RUN MODE - NO FILES WILL BE MODIFIED ***")
+
+    with metrics.session():
+        success = workflow.run()
+        metrics.set_status("success" if success else "failed")
+
+    print("=" * 60)
+    for name in step_names:
+        print(f"  {name:<16} {workflow.results.get(name, 'not run')}")
+    for line in metrics.summary_lines():
+        print(line)
+    print("=" * 60)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
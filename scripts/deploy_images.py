@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Image Deployment Staging
+
+Python replacement for Deploy-Lesson-Images.ps1 for the flat course layout.
+Web-optimized images (images/web/, including responsive renditions) are staged
+into a local folder laid out as <unit-web-folder>/lesson-LL/<file>, ready for
+manual upload. There is NO direct web server access.
+
+Each deploy writes a manifest (staged path -> sha256, size) to
+<staging>/.deploy/ and computes the delta against the previous deploy:
+- only new or changed files are copied, by a pool of workers
+  (a staged file that went missing or changed size is copied again)
+- staged files whose source no longer exists are removed
+- url_map.json maps every staged file to a cache-busting URL (?v=<hash>)
+
+Manifests are deterministic: entries are sorted and the manifest digest covers
+only (path, sha256, size), so two deploys of the same content share a digest.
+Deploying a single unit or lesson carries the rest of the previous manifest over.
+
+Usage:
+    python deploy_images.py                          # Stage every lesson's images
+    python deploy_images.py --unit 02 --lesson 03    # One lesson
+    python deploy_images.py --dry-run                # Show the delta only
+    python deploy_images.py --staging DIR --domain https://example.com
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from snapshots import hash_file
+from image_index import image_owner
+from optimize_images import MANIFEST_FILE as RENDITION_MANIFEST_FILE
+
+
+DEFAULT_STAGING = Path(tempfile.gettempdir()) / "course-staging" / "images"
+DEFAULT_DOMAIN = "https://your-domain.com"
+MANIFEST_DIR = ".deploy"
+URL_MAP_FILE = "url_map.json"
+HASH_LENGTH = 10
+
+# Web folder name for each unit (units not listed deploy to unit-UU)
+UNIT_WEB_FOLDERS = {
+    1: "getting-started",
+    2: "climate-drivers",
+    3: "surface-flow",
+    4: "water-demand",
+    5: "hydraulic-controls",
+    6: "reservoir-operations",
+    7: "groundwater",
+    8: "flow-network",
+    9: "water-quality",
+    10: "model-analyses",
+    11: "specialized-applications",
+    12: "risk-reliability",
+}
+
+
+def unit_web_folder(unit):
+    """Return the web folder name of a unit number."""
+    return UNIT_WEB_FOLDERS.get(int(unit), f"unit-{int(unit):02d}")
+
+
+def staged_path(name):
+    """Return the staging-relative path of a web image, or None if it has no UU_LL owner."""
+    unit, lesson = image_owner(name)
+    if unit is None:
+        return None
+    return f"{unit_web_folder(unit)}/lesson-{lesson:02d}/{name}"
+
+
+def alt_text(name):
+    """Derive default alt text from an image name, like the PowerShell script."""
+    text = re.sub(r'^\d+[-_]\d+[-_](\d+-)?', '', Path(name).stem)
+    text = re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', text).replace('-', ' ').replace('_', ' ')
+    return text.title() if text.islower() else text
+
+
+def manifest_digest(files):
+    """Digest of a manifest's content: sorted (path, sha256, size) triples."""
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(f"{path}\0{files[path]['sha256']}\0{files[path]['size']}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_last_manifest(staging):
+    """Return the most recent deploy manifest in a staging folder, or None."""
+    manifests = sorted((Path(staging) / MANIFEST_DIR).glob("deploy_*.json"))
+    for path in reversed(manifests):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            continue  # Damaged manifest - fall back to the one before
+    return None
+
+
+def scan_sources(web_dir, last_files, unit=None, lesson=None):
+    """
+    Hash the web images in scope, reusing hashes of files unchanged since the last deploy.
+
+    Returns:
+        dict: {staged_path: {'sha256', 'size', 'source', 'mtime_ns'}}
+    """
+    known = {entry['source']: entry for entry in last_files.values()}
+    files = {}
+    with os.scandir(web_dir) as entries:
+        for item in entries:
+            if not item.is_file() or item.name == RENDITION_MANIFEST_FILE or item.name.endswith('.tmp'):
+                continue
+            rel_path = staged_path(item.name)
+            owner = image_owner(item.name)
+            if rel_path is None or (unit is not None and owner[0] != unit) \
+                    or (lesson is not None and owner[1] != lesson):
+                continue
+            stat = item.stat()
+            previous = known.get(item.name)
+            if previous and previous['size'] == stat.st_size and previous.get('mtime_ns') == stat.st_mtime_ns:
+                sha256 = previous['sha256']
+            else:
+                sha256 = hash_file(item.path)
+            files[rel_path] = {'sha256': sha256, 'size': stat.st_size,
+                               'source': item.name, 'mtime_ns': stat.st_mtime_ns}
+    return files
+
+
+def compute_delta(current, last_files, staging, in_scope):
+    """
+    Compare the current files with the last deploy.
+
+    Returns:
+        dict: 'new', 'changed', 'unchanged', 'removed' lists of staged paths
+    """
+    delta = {'new': [], 'changed': [], 'unchanged': [], 'removed': []}
+    for rel_path, entry in sorted(current.items()):
+        previous = last_files.get(rel_path)
+        if previous is None:
+            delta['new'].append(rel_path)
+            continue
+        target = staging / rel_path
+        try:
+            staged_ok = target.stat().st_size == entry['size']
+        except FileNotFoundError:
+            staged_ok = False
+        if previous['sha256'] != entry['sha256'] or not staged_ok:
+            delta['changed'].append(rel_path)
+        else:
+            delta['unchanged'].append(rel_path)
+    delta['removed'] = sorted(path for path in last_files if in_scope(path) and path not in current)
+    return delta
+
+
+def copy_file(source, target):
+    """Copy a file into place atomically (temp file + replace)."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = target.with_name(target.name + ".tmp")
+    shutil.copy2(source, temp_path)
+    os.replace(temp_path, target)
+
+
+def deploy(web_dir, staging=DEFAULT_STAGING, domain=DEFAULT_DOMAIN, unit=None, lesson=None,
+           workers=4, dry_run=False, metrics=None, log=print):
+    """
+    Stage web images and record the deploy.
+
+    Args:
+        web_dir (Path): Web-optimized images (images/web)
+        staging (Path): Local staging folder
+        domain (str): Web domain used in the URL map
+        unit (int, optional): Only deploy this unit
+        lesson (int, optional): Only deploy this lesson (with unit)
+        workers (int): Parallel copy workers
+        dry_run (bool): Only report the delta
+        metrics (Instrumentation, optional): Shared instrumentation
+        log (callable): Message sink
+
+    Returns:
+        dict: The delta ('new', 'changed', 'unchanged', 'removed'), or None if web_dir is missing
+    """
+    metrics = metrics or Instrumentation("deploy_images")
+    web_dir, staging = Path(web_dir), Path(staging)
+    if not web_dir.is_dir():
+        log(f"ERROR: Web directory not found: {web_dir} (run optimize_images.py first)")
+        return None
+
+    prefix = None
+    if unit is not None:
+        prefix = f"{unit_web_folder(unit)}/" + (f"lesson-{lesson:02d}/" if lesson is not None else "")
+
+    def in_scope(rel_path):
+        return prefix is None or rel_path.startswith(prefix)
+
+    last = load_last_manifest(staging)
+    last_files = last['files'] if last else {}
+    with metrics.phase("scan"):
+        current = scan_sources(web_dir, {p: e for p, e in last_files.items() if in_scope(p)}, unit, lesson)
+    metrics.count("files_scanned", len(current))
+    delta = compute_delta(current, last_files, staging, in_scope)
+
+    to_copy = delta['new'] + delta['changed']
+    log(f"Deploy delta: {len(delta['new'])} new, {len(delta['changed'])} changed, "
+        f"{len(delta['unchanged'])} unchanged, {len(delta['removed'])} removed")
+    if dry_run:
+        for rel_path in to_copy:
+            log(f"  [DRY RUN] Would stage: {rel_path}")
+        for rel_path in delta['removed']:
+            log(f"  [DRY RUN] Would remove: {rel_path}")
+        return delta
+
+    files = {path: entry for path, entry in last_files.items() if not in_scope(path)}
+    files.update(current)
+    digest = manifest_digest(files)
+    if not to_copy and not delta['removed'] and last and last.get('digest') == digest:
+        log("Nothing to deploy - staging matches the last deploy")
+        return delta
+
+    with metrics.phase("copy"):
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            list(pool.map(lambda rel_path: copy_file(web_dir / current[rel_path]['source'], staging / rel_path),
+                          to_copy))
+    for rel_path in to_copy:
+        log(f"  ✓ Staged: {rel_path}")
+    for rel_path in delta['removed']:
+        (staging / rel_path).unlink(missing_ok=True)
+        log(f"  ✓ Removed: {rel_path}")
+    metrics.count("files_copied", len(to_copy))
+    metrics.count("bytes_copied", sum(current[rel_path]['size'] for rel_path in to_copy))
+    metrics.count("files_removed", len(delta['removed']))
+
+    # Manifest of this deploy (sorted, so identical content gives an identical file list)
+    manifest_dir = staging / MANIFEST_DIR
+    manifest_dir.mkdir(parents=True, exist_ok=True)
+    manifest = {'created': datetime.now().isoformat(timespec='seconds'), 'digest': digest,
+                'files': dict(sorted(files.items()))}
+    manifest_id = f"deploy_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}"
+    attempt = 0
+    while True:
+        manifest_path = manifest_dir / f"{manifest_id}{f'_{attempt}' if attempt else ''}.json"
+        try:
+            with open(manifest_path, 'x', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1)
+            break
+        except FileExistsError:
+            attempt += 1
+
+    url_map = {rel_path: f"{domain.rstrip('/')}/course-content/images/{rel_path}?v={entry['sha256'][:HASH_LENGTH]}"
+               for rel_path, entry in sorted(files.items())}
+    url_map_path = staging / URL_MAP_FILE
+    temp_path = url_map_path.with_name(URL_MAP_FILE + ".tmp")
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(url_map, f, indent=1)
+    os.replace(temp_path, url_map_path)
+    log(f"Manifest: {manifest_path.relative_to(staging).as_posix()} (digest {digest[:12]})")
+    log(f"URL map: {url_map_path}")
+    return delta
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Stage web-optimized course images for manual deployment (delta copy)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python deploy_images.py                          # Stage every lesson's images
+  python deploy_images.py --unit 02 --lesson 03    # One lesson
+  python deploy_images.py --dry-run                # Show the delta only
+        """
+    )
+    parser.add_argument('--web-dir', default=str(Path("images") / "web"),
+                        help='Web-optimized images (default: images/web)')
+    parser.add_argument('--staging', default=str(DEFAULT_STAGING), help=f'Staging folder (default: {DEFAULT_STAGING})')
+    parser.add_argument('--domain', default=DEFAULT_DOMAIN, help='Web domain for the URL map')
+    parser.add_argument('--unit', type=int, help='Only deploy this unit')
+    parser.add_argument('--lesson', type=int, help='Only deploy this lesson (requires --unit)')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel copy workers (default: 4)')
+    parser.add_argument('--dry-run', action='store_true', help='Show the delta without copying')
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+
+    if args.lesson is not None and args.unit is None:
+        print("ERROR: --lesson requires --unit")
+        return 1
+
+    print("SAFE DEPLOYMENT MODE - staging only, no direct web server access")
+    metrics = Instrumentation.from_args("deploy_images", args)
+    with metrics.session():
+        delta = deploy(args.web_dir, Path(args.staging), args.domain, args.unit, args.lesson,
+                       args.workers, args.dry_run, metrics)
+        metrics.set_status("failed" if delta is None else "success")
+    if delta is None:
+        return 1
+
+    if args.lesson is not None and not args.dry_run:
+        # Markdown for the lesson's main images, as Deploy-Lesson-Images.ps1 printed
+        url_map_path = Path(args.staging) / URL_MAP_FILE
+        with open(url_map_path, 'r', encoding='utf-8') as f:
+            url_map = json.load(f)
+        prefix = f"{unit_web_folder(args.unit)}/lesson-{args.lesson:02d}/"
+        print("\nWeb URLs for the lesson:")
+        for rel_path, url in url_map.items():
+            name = rel_path[len(prefix):]
+            if rel_path.startswith(prefix) and name.endswith('.png') and not re.search(r'-\d+w\.png$', name):
+                print(f"  ![{alt_text(name)}]({url})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
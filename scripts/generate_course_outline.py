@@ -10,8 +10,18 @@ Usage:
     python generate_course_outline.py                    # Print outline to console
     python generate_course_outline.py --update-readme    # Update README.md with outline
     python generate_course_outline.py --save-outline     # Save outline to course_outline.txt
+    python generate_course_outline.py --workspace ..     # Every course under .. plus a catalog
+    python generate_course_outline.py --diff HEAD~1      # What changed in the outline, and its impact
+    python generate_course_outline.py --save-model before.json   # Save the outline model for a later --diff
 
 The script will automatically scan for lesson files and generate an outline.
+Course and unit titles come from the course's course.json.
+
+Workspace mode (--workspace DIR) handles several courses built from this
+template in one run: every course root in DIR (DIR itself and its immediate
+subfolders that hold a course.json or lesson files) is processed concurrently
+in a thread pool, and a combined catalog of all courses is written to
+DIR/course_catalog.md.
 """
 
 import os
@@ -19,19 +29,35 @@ import re
 import argparse
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from course_model import parse_lesson_filename, iter_image_files, load_course_config, discover_courses
+from image_headers import HeaderCache, format_size
+from image_index import image_owner
+from git_changes import add_since_argument, load_changes, GitChangeError
+from outline_diff import OutlineModel, load_outline_model, diff_outlines, format_report
 
 
 class CourseOutlineGenerator:
-    def __init__(self, course_path=None):
+    def __init__(self, course_path=None, metrics=None, course_model=None):
         """
         Initialize the course outline generator.
         
         Args:
             course_path (str, optional): Path to the course directory. 
                                        If None, uses current directory.
+            metrics (Instrumentation, optional): Shared instrumentation for timing and counters
+            course_model (CourseModel, optional): Pre-scanned course shared with other
+                                                  workflow steps; avoids rescanning the directory
         """
+        if course_model is not None and course_path is None:
+            course_path = course_model.course_path
         self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.course_model = course_model
+        self.config = course_model.config if course_model is not None else load_course_config(self.course_path)
         self.units = defaultdict(list)
+        self.metrics = metrics or Instrumentation("generate_course_outline")
         
     def parse_lesson_filename(self, filename):
         """
@@ -43,21 +69,7 @@ class CourseOutlineGenerator:
         Returns:
             tuple: (unit_number, lesson_number, lesson_title) or (None, None, None) if parsing fails
         """
-        # Pattern to match UU-LL-lesson-title.md format
-        pattern = r'^(\d{2})-(\d{2})-(.+)\.md$'
-        match = re.match(pattern, filename)
-        
-        if match:
-            unit_number = int(match.group(1))
-            lesson_number = int(match.group(2))
-            lesson_title_raw = match.group(3)
-            
-            # Convert hyphens to spaces and apply title case
-            lesson_title = lesson_title_raw.replace('-', ' ').title()
-            
-            return unit_number, lesson_number, lesson_title
-        
-        return None, None, None
+        return parse_lesson_filename(filename)
     
     def scan_flat_structure(self):
         """
@@ -67,11 +79,19 @@ class CourseOutlineGenerator:
         # Clear any existing data before scanning
         self.units.clear()
         
+        # Reuse the shared scan when running inside the workflow orchestrator
+        if self.course_model is not None:
+            for unit_number, lessons in self.course_model.lessons_by_unit().items():
+                self.units[unit_number] = list(lessons)
+            return len(self.units) > 0
+        
         lesson_files = []
         
         # Get all markdown files that match the lesson pattern
         for file_path in self.course_path.iterdir():
+            self.metrics.count("files_scanned")
             if file_path.is_file() and file_path.suffix.lower() == '.md':
+                self.metrics.count("regex_evaluations")
                 unit_num, lesson_num, lesson_title = self.parse_lesson_filename(file_path.name)
                 
                 if unit_num is not None and lesson_num is not None:
@@ -94,7 +114,7 @@ class CourseOutlineGenerator:
     
     def get_unit_title(self, unit_number):
         """
-        Get the title for a unit based on the unit number.
+        Get the title for a unit from the course's configured unit titles.
         
         Args:
             unit_number (int): The unit number
@@ -102,21 +122,7 @@ class CourseOutlineGenerator:
         Returns:
             str: The unit title
         """
-        # Predefined unit titles based on course structure
-        unit_titles = {
-            1: "Foundations and Data Preparation",
-            2: "Climate Data and Weather Modeling", 
-            3: "Hydrology and Water Balance",
-            4: "Water Demand and Consumption",
-            5: "Reservoir Modeling and Operations",
-            6: "Water Quality and Treatment",
-            7: "Groundwater Systems",
-            8: "Integrated System Analysis",
-            9: "Advanced Topics",
-            10: "Case Studies and Applications"
-        }
-        
-        return unit_titles.get(unit_number, f"Unit {unit_number}")
+        return self.config['unit_titles'].get(unit_number, f"Unit {unit_number}")
     
     def generate_outline(self):
         """
@@ -133,9 +139,10 @@ class CourseOutlineGenerator:
         
         # Generate the outline
         outline_lines = []
-        outline_lines.append("*******************************************")
-        outline_lines.append("* GoldSim Water Management Course Outline *")
-        outline_lines.append("*******************************************")
+        banner = f"* {self.config['title']} Outline *"
+        outline_lines.append("*" * len(banner))
+        outline_lines.append(banner)
+        outline_lines.append("*" * len(banner))
         outline_lines.append("")
         
         # Sort units by number
@@ -343,15 +350,50 @@ class CourseOutlineGenerator:
             print(f"ERROR: Failed to update {assets_file}: {e}")
             return False
     
+    def _image_stats(self):
+        """
+        Collect image counts, sizes and largest dimensions per unit from the image headers.
+        
+        Returns:
+            dict: unit_number -> {'count', 'bytes', 'largest': (width, height) or None}
+        """
+        images_path = self.course_path / "images"
+        stats = defaultdict(lambda: {'count': 0, 'bytes': 0, 'largest': None})
+        if not images_path.is_dir():
+            return stats
+        
+        headers = HeaderCache(self.course_path)
+        for _, entry in iter_image_files(images_path):
+            self.metrics.count("images_scanned")
+            unit_number, _ = image_owner(entry.name)
+            header = headers.get(entry.path, entry.stat())
+            unit = stats[unit_number]
+            unit['count'] += 1
+            if header is None:
+                continue
+            unit['bytes'] += header.size
+            if unit['largest'] is None or header.width * header.height > unit['largest'][0] * unit['largest'][1]:
+                unit['largest'] = (header.width, header.height)
+        headers.save()
+        self.metrics.count("image_headers_read", headers.headers_read)
+        return stats
+    
     def _generate_units_summary(self):
         """Generate a summary of units for the assets file."""
         summary_lines = []
         sorted_units = sorted(self.units.keys())
+        image_stats = self._image_stats()
         
         for unit_number in sorted_units:
             unit_title = self.get_unit_title(unit_number)
             lesson_count = len(self.units[unit_number])
-            summary_lines.append(f"- Unit {unit_number}: {unit_title} ({lesson_count} lessons)")
+            images = image_stats.get(unit_number)
+            if images:
+                largest = f", largest {images['largest'][0]}×{images['largest'][1]}" if images['largest'] else ""
+                image_summary = f", {images['count']} images, {format_size(images['bytes'])}{largest}"
+            else:
+                image_summary = ", no images"
+            summary_lines.append(f"- Unit {unit_number}: {unit_title} ({lesson_count} lessons{image_summary})")
         
         return '\n'.join(summary_lines)
     
@@ -374,6 +416,138 @@ class CourseOutlineGenerator:
             f.write(outline)
         
         print(f"Course outline saved to: {output_path}")
+    
+    def catalog_entry(self):
+        """
+        Summarize the course for the workspace catalog.
+        
+        Returns:
+            dict: {'title', 'path', 'lessons', 'units': [(unit_number, unit_title, lesson_count), ...]}
+        """
+        self.scan_flat_structure()
+        return {
+            'title': self.config['title'],
+            'path': self.course_path,
+            'lessons': sum(len(lessons) for lessons in self.units.values()),
+            'units': [(unit_number, self.get_unit_title(unit_number), len(self.units[unit_number]))
+                      for unit_number in sorted(self.units)]
+        }
+
+
+def generate_catalog(entries, workspace):
+    """
+    Generate the Markdown catalog of all courses in a workspace.
+    
+    Args:
+        entries (list): catalog_entry() results, one per course
+        workspace (Path): Workspace folder the catalog is written to (links are relative to it)
+        
+    Returns:
+        str: The catalog in Markdown
+    """
+    lines = ["# Course Catalog", "",
+             f"{len(entries)} courses, {sum(entry['lessons'] for entry in entries)} lessons", ""]
+    for entry in entries:
+        readme = os.path.relpath(entry['path'] / "README.md", workspace).replace(os.sep, '/')
+        lines.append(f"## [{entry['title']}]({readme})")
+        lines.append(f"{len(entry['units'])} units, {entry['lessons']} lessons")
+        lines.append("")
+        for unit_number, unit_title, lesson_count in entry['units']:
+            lines.append(f"- Unit {unit_number}: {unit_title} ({lesson_count} lessons)")
+        lines.append("")
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def run_course(generator, args, metrics):
+    """
+    Run the requested --update-readme / --save-outline actions for one course.
+    
+    Returns:
+        bool: True if every update succeeded
+    """
+    success = True
+    if args.update_readme:
+        with metrics.phase("update_readme"):
+            success = generator.update_readme(args.readme_path)
+        with metrics.phase("update_assets"):
+            success = generator.update_assets_needed(args.assets_path) and success
+        if not success:
+            return False
+    if args.save_outline:
+        with metrics.phase("save_outline"):
+            generator.save_outline(args.output_file)
+    return True
+
+
+def run_workspace(args, metrics):
+    """
+    Process every course in a workspace concurrently and write the combined catalog.
+    
+    Returns:
+        bool: True if every course was processed successfully
+    """
+    workspace = Path(args.workspace)
+    if not workspace.is_dir():
+        print(f"ERROR: Workspace not found: {workspace}")
+        return False
+    with metrics.phase("discover_courses"):
+        courses = discover_courses(workspace)
+    if not courses:
+        print(f"ERROR: No courses found in {workspace}")
+        return False
+    metrics.count("courses", len(courses))
+    print(f"Found {len(courses)} courses in {workspace}")
+    
+    def process(course_path):
+        try:
+            generator = CourseOutlineGenerator(course_path, metrics=metrics)
+            success = run_course(generator, args, metrics)
+            outline = None if args.update_readme or args.save_outline else generator.generate_outline()
+            return generator.catalog_entry(), outline, success
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {course_path}: {e}")
+            return None, None, False
+    
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        results = list(pool.map(process, courses))
+    
+    entries = [entry for entry, _, _ in results if entry]
+    for entry, outline, _ in results:
+        if outline:
+            print(f"\n{outline}")
+    
+    catalog_path = workspace / args.catalog_file
+    with open(catalog_path, 'w', encoding='utf-8') as f:
+        f.write(generate_catalog(entries, workspace))
+    print(f"\n✓ Catalog of {len(entries)} courses saved to: {catalog_path}")
+    return all(success for _, _, success in results)
+
+
+def run_outline_diff(args, metrics):
+    """
+    Handle --save-model and --diff: save the current outline model and/or print the change-impact report.
+    
+    Returns:
+        bool: True on success
+    """
+    try:
+        with metrics.phase("build_models"):
+            current = OutlineModel.from_course() if args.save_model or not args.diff_to else None
+            if args.save_model:
+                current.save(args.save_model)
+                print(f"✓ Outline model of {len(current.lessons)} lessons saved to: {args.save_model}")
+            if not args.diff:
+                return True
+            old = load_outline_model(args.diff)
+            new = load_outline_model(args.diff_to) if args.diff_to else current
+    except (GitChangeError, OSError, ValueError) as e:
+        print(f"ERROR: Could not load outline: {e}")
+        return False
+    metrics.count("lessons_compared", len(old.lessons) + len(new.lessons))
+    with metrics.phase("diff"):
+        diff = diff_outlines(old, new)
+    print(format_report(diff))
+    return True
 
 
 def main():
@@ -387,6 +561,9 @@ Examples:
   python generate_course_outline.py --update-readme    # Update README.md and ASSETS_NEEDED.md
   python generate_course_outline.py --save-outline     # Save outline to course_outline.txt
   python generate_course_outline.py --update-readme --save-outline  # Do both
+  python generate_course_outline.py --workspace .. --update-readme  # Every course in .., plus a catalog
+  python generate_course_outline.py --diff HEAD~1      # Added/removed/moved/renamed lessons since HEAD~1
+  python generate_course_outline.py --save-model before.json && ... && python generate_course_outline.py --diff before.json
         """
     )
     
@@ -400,34 +577,87 @@ Examples:
                         help='Path to ASSETS_NEEDED file (default: ASSETS_NEEDED.md)')
     parser.add_argument('--output-file', type=str, default='course_outline.txt',
                         help='Output file for saved outline (default: course_outline.txt)')
+    parser.add_argument('--workspace', type=str, default=None, metavar='DIR',
+                        help='Process every course in DIR concurrently and write a combined catalog '
+                             '(--since is ignored in this mode)')
+    parser.add_argument('--catalog-file', type=str, default='course_catalog.md',
+                        help='Catalog file written to the workspace (default: course_catalog.md)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Courses processed concurrently in workspace mode (default: 4)')
+    parser.add_argument('--diff', type=str, default=None, metavar='REF',
+                        help='Report lessons added, removed, moved and renamed since REF (a git revision '
+                             'or a model saved with --save-model), with the affected images and links')
+    parser.add_argument('--diff-to', type=str, default=None, metavar='REF',
+                        help='Compare --diff against REF instead of the working tree')
+    parser.add_argument('--save-model', type=str, default=None, metavar='FILE',
+                        help='Save the current outline model as JSON for a later --diff')
+    add_since_argument(parser)
+    add_instrumentation_arguments(parser)
     
     args = parser.parse_args()
     
-    # Create the generator
-    generator = CourseOutlineGenerator()
+    if args.diff or args.save_model:
+        metrics = Instrumentation.from_args("generate_course_outline", args)
+        with metrics.session():
+            if not run_outline_diff(args, metrics):
+                metrics.set_status("failed")
+                exit(1)
+        return
     
-    # If no arguments provided, just print to console (default behavior)
-    if not args.update_readme and not args.save_outline:
-        generator.print_outline()
+    if args.workspace:
+        metrics = Instrumentation.from_args("generate_course_outline", args)
+        with metrics.session():
+            if not run_workspace(args, metrics):
+                metrics.set_status("failed")
+                exit(1)
         return
     
-    # Handle README and ASSETS_NEEDED update
-    if args.update_readme:
-        readme_success = generator.update_readme(args.readme_path)
-        assets_success = generator.update_assets_needed(args.assets_path)
-        
-        if not readme_success or not assets_success:
-            exit(1)
+    # With --since, the outline only changes when lessons are added, removed or
+    # renamed (it is derived from lesson filenames); the asset summary's image
+    # statistics also change when images are added, removed or resized
+    changes = load_changes(args.since)
+    if changes is False:
+        exit(1)
+    assets_only = False
+    if changes and not changes.structure_changed and (args.update_readme or args.save_outline):
+        if not (args.update_readme and changes.images):
+            print(f"✓ No lessons added, removed or renamed since {args.since} - outline is up to date")
+            return
+        assets_only = True
     
-    # Handle saving outline to file
-    if args.save_outline:
-        generator.save_outline(args.output_file)
+    # Create the generator
+    metrics = Instrumentation.from_args("generate_course_outline", args)
+    try:
+        generator = CourseOutlineGenerator(metrics=metrics)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        exit(1)
     
-    # If we only updated README, also show a summary
-    if args.update_readme and not args.save_outline:
-        print("\nCurrent Course Summary:")
-        print("-" * 50)
-        generator.print_outline()
+    with metrics.session():
+        # If no arguments provided, just print to console (default behavior)
+        if not args.update_readme and not args.save_outline:
+            with metrics.phase("print_outline"):
+                generator.print_outline()
+            return
+        
+        if assets_only:
+            print(f"✓ No lessons added, removed or renamed since {args.since} - outline is up to date")
+            with metrics.phase("update_assets"):
+                if not generator.update_assets_needed(args.assets_path):
+                    metrics.set_status("failed")
+                    exit(1)
+            return
+        
+        # Handle README and ASSETS_NEEDED update, and saving the outline to a file
+        if not run_course(generator, args, metrics):
+            metrics.set_status("failed")
+            exit(1)
+        
+        # If we only updated README, also show a summary
+        if args.update_readme and not args.save_outline:
+            print("\nCurrent Course Summary:")
+            print("-" * 50)
+            generator.print_outline()
 
 
 if __name__ == "__main__":
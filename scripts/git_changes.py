@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Git-Aware Change Detection
+
+Shared --since <rev> support for the course tools. The changeset is read from
+git (committed, staged, unstaged and untracked changes since the revision), so
+tools can restrict their work to the UU-LL-*.md lessons and images/*.png files
+that were actually touched, plus the lessons that depend on touched images.
+
+Image dependents follow the naming convention: images/UU_LL_Name.png belongs to
+lesson UU-LL-*.md.
+
+Usage (inside a tool):
+    add_since_argument(parser)
+    changes = ChangeSet.from_git(args.since) if args.since else None
+    lessons = changes.filter_lessons(lessons) if changes else lessons
+
+Command line (inspect a changeset):
+    python git_changes.py HEAD~3
+"""
+
+import sys
+import subprocess
+from pathlib import Path
+
+from course_model import LESSON_FILENAME_PATTERN, IMAGE_FILENAME_PATTERN, SHARD_DIR_PATTERN
+
+
+class GitChangeError(Exception):
+    """Raised when the changeset cannot be read from git."""
+
+
+def _git(args, cwd):
+    try:
+        result = subprocess.run(['git'] + args, cwd=str(cwd), capture_output=True,
+                                text=True, encoding='utf-8', errors='replace')
+    except OSError as e:
+        raise GitChangeError(f"Could not run git: {e}")
+    if result.returncode != 0:
+        raise GitChangeError(result.stderr.strip() or f"git {' '.join(args)} failed")
+    return result.stdout
+
+
+class ChangeSet:
+    def __init__(self, since, added=(), modified=(), deleted=(), renamed=()):
+        """
+        Paths changed since a revision, relative to the course root.
+
+        Args:
+            since (str): The revision the changes are relative to
+            added (iterable): Added (or untracked) paths
+            modified (iterable): Modified paths
+            deleted (iterable): Deleted paths
+            renamed (iterable): (old_path, new_path) pairs
+        """
+        self.since = since
+        self.added = set(added)
+        self.modified = set(modified)
+        self.deleted = set(deleted)
+        self.renamed = set(renamed)
+
+    @classmethod
+    def from_git(cls, since, course_path=None):
+        """
+        Read the changeset from git.
+
+        Args:
+            since (str): Revision to compare against (e.g., 'HEAD', 'HEAD~3', 'main')
+            course_path (str, optional): Course root inside the repository (default: cwd)
+
+        Returns:
+            ChangeSet: Paths relative to the course root
+
+        Raises:
+            GitChangeError: If git is unavailable or the revision is invalid
+        """
+        cwd = Path(course_path) if course_path else Path.cwd()
+        added, modified, deleted, renamed = set(), set(), set(), set()
+
+        # Working tree (staged + unstaged) against the revision, with rename detection
+        fields = _git(['diff', '--name-status', '-M', '-z', '--relative', since, '--'], cwd).split('\0')
+        i = 0
+        while i < len(fields) and fields[i]:
+            status = fields[i]
+            if status[0] in 'RC':
+                old, new = fields[i + 1], fields[i + 2]
+                if status[0] == 'R':
+                    renamed.add((old, new))
+                else:
+                    added.add(new)
+                i += 3
+                continue
+            path = fields[i + 1]
+            if status[0] == 'A':
+                added.add(path)
+            elif status[0] == 'D':
+                deleted.add(path)
+            else:
+                modified.add(path)
+            i += 2
+
+        # Untracked files are changes too (e.g., a lesson created but not yet added)
+        for path in _git(['ls-files', '--others', '--exclude-standard', '-z'], cwd).split('\0'):
+            if path:
+                added.add(path)
+
+        return cls(since, added, modified, deleted, renamed)
+
+    @property
+    def present_paths(self):
+        """Changed paths that exist after the change (added, modified, rename targets)."""
+        return self.added | self.modified | {new for _, new in self.renamed}
+
+    @property
+    def removed_paths(self):
+        """Paths that no longer exist (deleted, rename sources)."""
+        return self.deleted | {old for old, _ in self.renamed}
+
+    @staticmethod
+    def _is_lesson(path):
+        return '/' not in path and LESSON_FILENAME_PATTERN.match(path) is not None
+
+    @staticmethod
+    def _is_image(path):
+        # images/<name> or, in a sharded layout, images/<shard>/<name>
+        parts = path.split('/')
+        if len(parts) == 3 and not SHARD_DIR_PATTERN.match(parts[1]):
+            return False
+        return len(parts) in (2, 3) and parts[0] == 'images' and IMAGE_FILENAME_PATTERN.match(parts[-1]) is not None
+
+    @property
+    def lessons(self):
+        """Changed lesson filenames that exist after the change."""
+        return {path for path in self.present_paths if self._is_lesson(path)}
+
+    @property
+    def images(self):
+        """Changed image filenames (without the images/ prefix), including removed ones."""
+        return {path.rsplit('/', 1)[1] for path in self.present_paths | self.removed_paths if self._is_image(path)}
+
+    @property
+    def structure_changed(self):
+        """True if lessons were added, removed or renamed (the outline must be regenerated)."""
+        changed = (self.added | self.deleted | {old for old, _ in self.renamed} | {new for _, new in self.renamed})
+        return any(self._is_lesson(path) for path in changed)
+
+    def image_lesson_keys(self):
+        """Return {(unit, lesson)} for every changed image."""
+        keys = set()
+        for name in self.images:
+            match = IMAGE_FILENAME_PATTERN.match(name)
+            keys.add((int(match.group(1)), int(match.group(2))))
+        return keys
+
+    def is_lesson_affected(self, filename):
+        """True if a lesson changed itself or owns a changed image."""
+        if filename in self.lessons:
+            return True
+        match = LESSON_FILENAME_PATTERN.match(filename)
+        return bool(match) and (int(match.group(1)), int(match.group(2))) in self.image_lesson_keys()
+
+    def filter_lessons(self, lessons):
+        """
+        Keep only affected lessons.
+
+        Args:
+            lessons (iterable): Lesson filenames, paths or CourseModel lesson dicts
+
+        Returns:
+            list: The affected subset, in the original order
+        """
+        image_keys = self.image_lesson_keys()
+        changed = self.lessons
+        selected = []
+        for lesson in lessons:
+            filename = lesson['filename'] if isinstance(lesson, dict) else Path(lesson).name
+            match = LESSON_FILENAME_PATTERN.match(filename)
+            if filename in changed or (match and (int(match.group(1)), int(match.group(2))) in image_keys):
+                selected.append(lesson)
+        return selected
+
+    def filter_images(self, images):
+        """Keep only changed images (names or paths), in the original order."""
+        changed = self.images
+        return [image for image in images if Path(image).name in changed]
+
+    def summary(self):
+        """Return a one-line description of the changeset."""
+        return (f"Changes since {self.since}: {len(self.lessons)} lessons, {len(self.images)} images"
+                f"{' (lessons added/removed/renamed)' if self.structure_changed else ''}")
+
+
+def add_since_argument(parser):
+    """Add the shared --since option to an argparse parser."""
+    parser.add_argument('--since', type=str, metavar='REV',
+                        help='Only process lessons and images changed since git revision REV '
+                             '(including staged, unstaged and untracked changes)')
+    return parser
+
+
+def load_changes(since, course_path=None):
+    """
+    Load a changeset for --since, printing an error instead of raising.
+
+    Returns:
+        ChangeSet or None: None when since is not set; False when git failed
+    """
+    if not since:
+        return None
+    try:
+        changes = ChangeSet.from_git(since, course_path)
+    except GitChangeError as e:
+        print(f"ERROR: Could not read changes since '{since}': {e}")
+        return False
+    print(changes.summary())
+    return changes
+
+
+def main():
+    """Print the lessons and images changed since a revision."""
+    if len(sys.argv) != 2:
+        print("Usage: python git_changes.py <revision>")
+        return 1
+
+    changes = load_changes(sys.argv[1])
+    if changes is False:
+        return 1
+    for name in sorted(changes.lessons):
+        print(f"  lesson  {name}")
+    for name in sorted(changes.images):
+        print(f"  image   images/{name}")
+    for old, new in sorted(changes.renamed):
+        print(f"  renamed {old} → {new}")
+    for name in sorted(changes.deleted):
+        print(f"  deleted {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Image Budgets at Ingest
+
+Keeps heavy captures out of the repository. Image sorting moves each capture
+through ImageBudget.ingest(), which checks the PNG header against a byte budget
+and a pixel budget. Captures within budget are moved as they are; oversized
+ones are written straight to their destination by ImageMagick - recompressed
+(metadata stripped, maximum PNG compression) and, when they exceed the pixel
+budget, downscaled. If the result is still over the byte budget it is
+downscaled once more in proportion to the overshoot. The original is removed
+only after the smaller copy is in place.
+
+Budgets come from --max-image-bytes / --max-image-pixels, or the
+COURSE_IMAGE_MAX_BYTES / COURSE_IMAGE_MAX_PIXELS environment variables.
+Without ImageMagick oversized captures are moved unchanged and reported.
+
+Usage (inside a tool):
+    budget = ImageBudget.from_args(args, metrics)
+    result = budget.ingest(source, target)       # Move, shrinking if over budget
+    budget.report(results)                       # Savings summary
+"""
+
+import os
+import re
+import math
+import shutil
+import tempfile
+import subprocess
+from collections import namedtuple
+from pathlib import Path
+
+from instrumentation import Instrumentation
+from image_headers import read_image_header, format_size
+from optimize_images import find_imagemagick
+
+
+MAX_BYTES_ENV_VAR = "COURSE_IMAGE_MAX_BYTES"
+MAX_PIXELS_ENV_VAR = "COURSE_IMAGE_MAX_PIXELS"
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_MAX_PIXELS = 2560 * 1440
+SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+# ingest() outcomes
+MOVED = 'moved'
+SHRUNK = 'shrunk'
+OVER_BUDGET = 'over-budget'
+
+IngestResult = namedtuple('IngestResult', 'source target outcome bytes_before bytes_after size_before size_after')
+
+
+def parse_bytes(value):
+    """Parse a byte budget such as '1048576', '800KB' or '1.5MB'."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid byte budget: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_pixels(value):
+    """Parse a pixel budget given as a pixel count ('3686400') or dimensions ('2560x1440')."""
+    match = re.fullmatch(r'\s*(\d+)\s*[x×]\s*(\d+)\s*', str(value))
+    if match:
+        return int(match.group(1)) * int(match.group(2))
+    if str(value).strip().isdigit():
+        return int(value)
+    raise ValueError(f"invalid pixel budget: {value}")
+
+
+def add_budget_arguments(parser):
+    """Add the shared image budget options to an argparse parser."""
+    parser.add_argument('--max-image-bytes', type=parse_bytes, default=None, metavar='SIZE',
+                        help=f'Byte budget per image, e.g. 800KB or 2MB '
+                             f'(default: ${MAX_BYTES_ENV_VAR} or {format_size(DEFAULT_MAX_BYTES)})')
+    parser.add_argument('--max-image-pixels', type=parse_pixels, default=None, metavar='PIXELS',
+                        help=f'Pixel budget per image, e.g. 2560x1440 '
+                             f'(default: ${MAX_PIXELS_ENV_VAR} or {DEFAULT_MAX_PIXELS})')
+    parser.add_argument('--no-image-budget', action='store_true',
+                        help='Ingest images unchanged, whatever their size')
+    parser.add_argument('--budget-workers', type=int, default=4,
+                        help='Concurrent image conversions at ingest (default: 4)')
+    return parser
+
+
+class ImageBudget:
+    def __init__(self, max_bytes=None, max_pixels=None, workers=4, enabled=True, metrics=None, magick=None):
+        """
+        Initialize the ingest budget.
+
+        Args:
+            max_bytes (int, optional): Byte budget (default: $COURSE_IMAGE_MAX_BYTES or 1 MB)
+            max_pixels (int, optional): Pixel budget (default: $COURSE_IMAGE_MAX_PIXELS or 2560x1440)
+            workers (int): Concurrent conversions callers should use
+            enabled (bool): If False every image is moved unchanged
+            metrics (Instrumentation, optional): Shared instrumentation
+            magick (list, optional): ImageMagick command prefix (default: detected)
+        """
+        if max_bytes is None:
+            max_bytes = parse_bytes(os.environ.get(MAX_BYTES_ENV_VAR, DEFAULT_MAX_BYTES))
+        if max_pixels is None:
+            max_pixels = parse_pixels(os.environ.get(MAX_PIXELS_ENV_VAR, DEFAULT_MAX_PIXELS))
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.workers = max(1, workers)
+        self.enabled = enabled
+        self.metrics = metrics or Instrumentation("image_budget")
+        self.magick = magick if magick is not None else find_imagemagick()
+
+    @classmethod
+    def from_args(cls, args, metrics=None):
+        """Create a budget from arguments added by add_budget_arguments()."""
+        return cls(max_bytes=args.max_image_bytes, max_pixels=args.max_image_pixels,
+                   workers=args.budget_workers, enabled=not args.no_image_budget, metrics=metrics)
+
+    def violations(self, header):
+        """Return the budgets an image header exceeds (empty if within budget)."""
+        if not self.enabled or header is None:
+            return []
+        problems = []
+        if header.size > self.max_bytes:
+            problems.append(f"{format_size(header.size)} > {format_size(self.max_bytes)}")
+        if header.width * header.height > self.max_pixels:
+            problems.append(f"{header.width}×{header.height} > {self.max_pixels} pixels")
+        return problems
+
+    def _convert(self, source, target, area=None):
+        """Recompress source into target, shrinking to at most `area` pixels. True on success."""
+        command = list(self.magick) + [str(source)]
+        if area:
+            command += ["-resize", f"{int(area)}@>"]
+        command += ["-strip", "-define", "png:compression-level=9", f"PNG:{target}"]
+        return subprocess.run(command, capture_output=True).returncode == 0
+
+    def _shrink(self, source, target, header):
+        """Write a within-budget copy of source to target. Returns its header, or None if not smaller."""
+        fd, temp_name = tempfile.mkstemp(dir=target.parent, suffix='.png.tmp')
+        os.close(fd)
+        temp = Path(temp_name)
+        try:
+            area = self.max_pixels if header.width * header.height > self.max_pixels else None
+            if not self._convert(source, temp, area):
+                return None
+            result = read_image_header(temp)
+            if result and result.size > self.max_bytes:
+                # Recompression alone was not enough: trade pixels for bytes
+                area = result.width * result.height * self.max_bytes / result.size
+                if self._convert(temp, temp, math.floor(area)):
+                    result = read_image_header(temp)
+            if result is None or result.size >= header.size:
+                return None
+            shutil.copymode(source, temp)  # mkstemp files are private
+            os.replace(temp, target)
+            return result
+        finally:
+            temp.unlink(missing_ok=True)
+
+    def ingest(self, source, target, header=None):
+        """
+        Move an image into the course, shrinking it first if it is over budget.
+
+        Args:
+            source (Path): Captured image
+            target (Path): Destination (its folder must exist)
+            header (ImageHeader, optional): Header of the source, if already read
+
+        Returns:
+            IngestResult
+        """
+        source, target = Path(source), Path(target)
+        header = header or read_image_header(source)
+        size = (header.width, header.height) if header else (None, None)
+        bytes_before = header.size if header else source.stat().st_size
+        if self.violations(header) and self.magick:
+            with self.metrics.phase("shrink_images"):
+                result = self._shrink(source, target, header)
+            if result:
+                source.unlink()
+                self.metrics.count("images_shrunk")
+                self.metrics.count("bytes_saved", bytes_before - result.size)
+                return IngestResult(source, target, SHRUNK, bytes_before, result.size,
+                                    size, (result.width, result.height))
+        shutil.move(str(source), str(target))
+        outcome = OVER_BUDGET if self.violations(header) else MOVED
+        if outcome == OVER_BUDGET:
+            self.metrics.count("images_over_budget")
+        return IngestResult(source, target, outcome, bytes_before, bytes_before, size, size)
+
+    def report(self, results, log=print):
+        """Print what the budget changed: shrunk images with their savings, and images left over budget."""
+        shrunk = [r for r in results if r.outcome == SHRUNK]
+        over = [r for r in results if r.outcome == OVER_BUDGET]
+        if not shrunk and not over:
+            return
+        log(f"\n📉 Image budget ({format_size(self.max_bytes)}, {self.max_pixels} pixels):")
+        for r in shrunk:
+            log(f"   {r.target.name}: {format_size(r.bytes_before)} → {format_size(r.bytes_after)}"
+                f" ({r.size_before[0]}×{r.size_before[1]} → {r.size_after[0]}×{r.size_after[1]})")
+        if shrunk:
+            saved = sum(r.bytes_before - r.bytes_after for r in shrunk)
+            before = sum(r.bytes_before for r in shrunk)
+            log(f"   Shrunk {len(shrunk)} images, saved {format_size(saved)} ({saved * 100 // max(1, before)}%)")
+        if over:
+            reason = "ImageMagick not found" if not self.magick else "could not be made smaller"
+            log(f"   ⚠️  {len(over)} images are over budget and were moved unchanged ({reason}):")
+            for r in over:
+                log(f"      {r.target.name}: {format_size(r.bytes_before)}")
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Image Header Reader
+
+Reads the dimensions and color type of PNG and JPEG images from their headers
+only - the PNG IHDR chunk (the first 33 bytes) or the JPEG SOF marker (found by
+skipping segment by segment, without reading their payload). Nothing is decoded,
+so checking a screenshot costs one small buffered read instead of a full image
+load.
+
+Results are cached in .course_cache/image_headers.json by path, keyed on the
+file's size and modification time, so repeated audits only read new or changed
+files.
+
+Usage (inside a tool):
+    header = read_image_header("images/02_03_Name.png")   # ImageHeader or None
+    headers = HeaderCache()
+    header = headers.get(path)                              # Cached lookup
+    headers.save()
+
+Command line:
+    python image_headers.py                  # Audit images/
+    python image_headers.py path/to/folder   # Audit another folder (PNG and JPEG)
+"""
+
+import os
+import sys
+import json
+import struct
+import argparse
+import tempfile
+import threading
+from collections import namedtuple, Counter
+from pathlib import Path
+
+from lesson_parser import CACHE_DIR
+from course_model import iter_image_files
+
+
+HEADER_CACHE_FILE = "image_headers.json"
+HEADER_CACHE_VERSION = 1
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+READ_BUFFER = 512
+
+PNG_COLOR_TYPES = {0: 'gray', 2: 'rgb', 3: 'palette', 4: 'gray+alpha', 6: 'rgba'}
+JPEG_COLOR_TYPES = {1: 'gray', 3: 'rgb', 4: 'cmyk'}
+# SOF0-SOF15 carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) share the range but do not
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = frozenset(range(0xD0, 0xDA)) | {0x01}
+
+ImageHeader = namedtuple('ImageHeader', 'format width height bit_depth color_type size')
+
+
+def _read_png(f, size):
+    data = f.read(18)
+    if len(data) < 18 or data[4:8] != b'IHDR':
+        return None
+    width, height, bit_depth, color_type = struct.unpack('>IIBB', data[8:18])
+    return ImageHeader('png', width, height, bit_depth,
+                       PNG_COLOR_TYPES.get(color_type, str(color_type)), size)
+
+
+def _read_jpeg(f, size):
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':  # Fill bytes
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS or marker == 0x00:
+            continue
+        if marker in (0xD9, 0xDA):  # End of image or start of scan before any frame
+            return None
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack('>H', length)[0]
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(6)
+            if len(data) < 6:
+                return None
+            bit_depth, height, width, components = struct.unpack('>BHHB', data)
+            return ImageHeader('jpeg', width, height, bit_depth,
+                               JPEG_COLOR_TYPES.get(components, str(components)), size)
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_header(path, size=None):
+    """
+    Read the header of a PNG or JPEG image without decoding it.
+
+    Args:
+        path (str or Path): Image file
+        size (int, optional): File size, if the caller already has it from a stat
+
+    Returns:
+        ImageHeader or None: None if the file is neither a PNG nor a JPEG, or is truncated
+    """
+    if size is None:
+        size = os.stat(path).st_size
+    with open(path, 'rb', buffering=READ_BUFFER) as f:
+        signature = f.read(8)
+        if signature == PNG_SIGNATURE:
+            return _read_png(f, size)
+        if signature[:2] == b'\xff\xd8':
+            f.seek(2)
+            return _read_jpeg(f, size)
+    return None
+
+
+def image_dimensions(path):
+    """Return (width, height) of a PNG or JPEG, or (None, None) if the header cannot be read."""
+    header = read_image_header(path)
+    if header is None:
+        return None, None
+    return header.width, header.height
+
+
+class HeaderCache:
+    def __init__(self, course_path=None):
+        """
+        Initialize the cached header reader.
+
+        Args:
+            course_path (str, optional): Course root holding the cache (default: current directory)
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.cache_path = self.course_path / CACHE_DIR / HEADER_CACHE_FILE
+        self.entries = {}
+        self.headers_read = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == HEADER_CACHE_VERSION:
+                self.entries = data['headers']
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+
+    def save(self):
+        """Write the cache back to disk if anything was read."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': HEADER_CACHE_VERSION, 'headers': dict(self.entries)}
+            self._dirty = False
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, self.cache_path)
+
+    def get(self, path, stat=None):
+        """
+        Return the header of an image, reading the file only if it changed.
+
+        Args:
+            path (str or Path): Image file (relative paths are inside the course root)
+            stat (os.stat_result, optional): Stat of the file, if the caller already has it
+
+        Returns:
+            ImageHeader or None
+        """
+        path = Path(path)
+        if not path.is_absolute():
+            path = self.course_path / path
+        key = str(path)
+        if stat is None:
+            stat = path.stat()
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return ImageHeader(*entry['header']) if entry['header'] else None
+
+        header = read_image_header(path, stat.st_size)
+        with self._lock:
+            self.entries[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                 'header': list(header) if header else None}
+            self.headers_read += 1
+            self._dirty = True
+        return header
+
+
+def format_size(size):
+    """Return a byte count as a short human-readable string."""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def describe(header):
+    """Return 'W×H, size, color type' for an image header."""
+    return f"{header.width}×{header.height}, {format_size(header.size)}, {header.color_type}"
+
+
+def _audit_files(folder):
+    folder = Path(folder)
+    if folder.name == 'images':
+        for _, entry in iter_image_files(folder):
+            yield Path(entry.path), entry.stat()
+        return
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(('.png', '.jpg', '.jpeg')) and entry.is_file():
+                yield Path(entry.path), entry.stat()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit image dimensions, sizes and color types from their headers")
+    parser.add_argument('folder', nargs='?', default='images', help='Folder to audit (default: images)')
+    parser.add_argument('--largest', type=int, default=5, help='Number of largest images to list (default: 5)')
+    args = parser.parse_args()
+
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"❌ Folder not found: {folder}")
+        return 1
+
+    headers = HeaderCache()
+    results, unreadable = [], []
+    for path, stat in _audit_files(folder):
+        header = headers.get(path, stat)
+        if header is None:
+            unreadable.append(path)
+        else:
+            results.append((path, header))
+    headers.save()
+
+    total = sum(header.size for _, header in results)
+    print(f"{len(results)} images, {format_size(total)} "
+          f"({headers.headers_read} headers read, {len(results) + len(unreadable) - headers.headers_read} cached)")
+    for color_type, count in Counter(header.color_type for _, header in results).most_common():
+        print(f"  {color_type}: {count}")
+    if results and args.largest:
+        print("Largest (pixels):")
+        for path, header in sorted(results, key=lambda r: r[1].width * r[1].height, reverse=True)[:args.largest]:
+            print(f"  {path.name}: {describe(header)}")
+    if unreadable:
+        print(f"⚠️  {len(unreadable)} files are not readable PNG/JPEG images:")
+        for path in unreadable:
+            print(f"  {path.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
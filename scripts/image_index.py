@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Course Image Index
+
+Keeps a record of every image in the global images/ folder so tools do not have
+to list the folder (slow for tens of thousands of PNGs on a network or synced
+drive). For each image the index stores:
+
+    path                     - location inside images/ (see layouts below)
+    sha256, size, mtime_ns   - content identity
+    width, height            - PNG dimensions (from the IHDR header)
+    unit, lesson             - owning lesson, from the UU_LL_ / UU-LL- name prefix
+
+The index lives in .course_cache/images.json. Ingest tools (sort-images-flat,
+migrate-to-flat) check their whole batch against it before moving anything, so
+name collisions are reported up front instead of silently clobbering or
+skipping files, and they record every image they place. Changes made outside
+the course tools are picked up when the modification time of images/ (or of
+one of its shard folders) changes; only that folder is listed again, and only
+new or changed files are hashed.
+
+Layouts (recorded in images/.layout, default flat):
+    flat   - images/UU_LL_Name.png
+    unit   - images/UU/UU_LL_Name.png (images without a unit prefix stay in images/)
+    hash   - images/3f/UU_LL_Name.png (two hex digits of the name's SHA-1)
+
+Lessons always reference images/UU_LL_Name.png; tools resolve the reference to
+the stored file through the index, so the layout is invisible to authors.
+
+Usage (inside a tool):
+    index = ImageIndex()
+    index.unit_images(2)                 # Names of unit 2 images, no listing
+    index.resolve("02_03_Name.png")      # Path of the stored file
+    index.check_batch([(src, name)])     # Collision check before ingest
+    index.place(name)                    # Where to put a new image
+    index.add(name)                      # After placing it
+    index.save()
+
+Command line:
+    python image_index.py status
+    python image_index.py unit 02
+    python image_index.py collisions
+    python image_index.py rebuild
+    python image_index.py layout unit    # Move every image into the unit layout
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+from course_model import SHARD_DIR_PATTERN
+from lesson_parser import CACHE_DIR
+from snapshots import hash_file
+from image_headers import image_dimensions
+from course_locks import CourseLock, LockError, COURSE_SCOPE, add_lock_arguments
+
+
+IMAGE_CACHE_FILE = "images.json"
+INDEX_VERSION = 2
+LAYOUT_FILE = ".layout"
+LAYOUTS = ('flat', 'unit', 'hash')
+IMAGE_OWNER_PATTERN = re.compile(r'^(\d{2})[-_](\d{2})[-_]')
+
+# check_batch() statuses
+NEW = 'new'
+IDENTICAL = 'identical'
+CONFLICT = 'conflict'
+DUPLICATE = 'duplicate'
+
+
+def image_owner(name):
+    """Return (unit, lesson) numbers for an image name, or (None, None) without a UU_LL prefix."""
+    match = IMAGE_OWNER_PATTERN.match(name)
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+def read_layout(images_path):
+    """Return the layout recorded in images/.layout ('flat' if none is recorded)."""
+    try:
+        layout = (Path(images_path) / LAYOUT_FILE).read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return 'flat'
+    return layout if layout in LAYOUTS else 'flat'
+
+
+def shard_for(name, layout):
+    """Return the shard folder of an image name in a layout ('' for the images/ root)."""
+    if layout == 'unit':
+        match = IMAGE_OWNER_PATTERN.match(name)
+        return match.group(1) if match else ''
+    if layout == 'hash':
+        # Case-folded, so names that collide on Windows land in the same folder
+        return hashlib.sha1(name.casefold().encode('utf-8')).hexdigest()[:2]
+    return ''
+
+
+def _shard_of(rel_path):
+    return rel_path.rpartition('/')[0]
+
+
+class ImageIndex:
+    def __init__(self, course_path=None):
+        """
+        Initialize the cached image index.
+
+        Args:
+            course_path (str, optional): Course root (default: current directory)
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.images_path = self.course_path / "images"
+        self.cache_path = self.course_path / CACHE_DIR / IMAGE_CACHE_FILE
+        self.layout = read_layout(self.images_path)
+        self.entries = {}
+        self.dir_mtimes = {}
+        self.files_hashed = 0
+        self.listings = 0
+        self._folded = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.entries = data['images']
+                self.dir_mtimes = data['dir_mtimes']
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+            self.dir_mtimes = {}
+
+    def save(self):
+        """Write the index back to disk."""
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'dir_mtimes': self.dir_mtimes, 'images': self.entries}
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.cache_path)
+
+    def _dir_mtime(self, shard=''):
+        try:
+            return (self.images_path / shard).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _entry(self, name, rel_path=None, stat=None):
+        """Return the entry for an image, hashing the file only if it changed."""
+        entry = self.entries.get(name)
+        if rel_path is None:
+            rel_path = entry['path'] if entry else self.location(name).relative_to(self.images_path).as_posix()
+        path = self.images_path / rel_path
+        stat = stat or path.stat()
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            # Unchanged (a move between shard folders keeps size and mtime)
+            entry['path'] = rel_path
+            return entry
+        width, height = image_dimensions(path)
+        unit, lesson = image_owner(name)
+        entry = {'path': rel_path, 'sha256': hash_file(path), 'size': stat.st_size,
+                 'mtime_ns': stat.st_mtime_ns, 'width': width, 'height': height,
+                 'unit': unit, 'lesson': lesson}
+        self.entries[name] = entry
+        self._folded = None
+        self.files_hashed += 1
+        return entry
+
+    def _list(self, shard):
+        """Re-list one folder (the root when shard is '') and update its entries."""
+        folder = self.images_path / shard
+        seen = set()
+        subfolders = []
+        with os.scandir(folder) as items:
+            for item in items:
+                if shard == '' and item.is_dir() and SHARD_DIR_PATTERN.match(item.name):
+                    subfolders.append(item.name)
+                elif item.name.lower().endswith('.png') and item.is_file():
+                    rel_path = f"{shard}/{item.name}" if shard else item.name
+                    seen.add(item.name)
+                    self._entry(item.name, rel_path, item.stat())
+        for name in [name for name, entry in self.entries.items()
+                     if _shard_of(entry['path']) == shard and name not in seen]:
+            del self.entries[name]
+        self._folded = None
+        self.listings += 1
+        return subfolders
+
+    def refresh(self, force=False):
+        """
+        Bring the index in line with images/ where folders changed since the last sync.
+
+        Only folders whose modification time changed are listed: the root, and
+        in a sharded layout each shard folder separately.
+
+        Args:
+            force (bool): List every folder even if its modification time is unchanged
+
+        Returns:
+            bool: True if any folder was listed
+        """
+        with self._lock:
+            root_mtime = self._dir_mtime()
+            if root_mtime is None:
+                listed = bool(self.entries)
+                self.entries, self.dir_mtimes, self._folded = {}, {}, None
+                return listed
+
+            listed = False
+            shards = [shard for shard in self.dir_mtimes if shard]
+            if force or root_mtime != self.dir_mtimes.get(''):
+                shards = self._list('')
+                self.dir_mtimes = {'': root_mtime, **{s: self.dir_mtimes.get(s) for s in shards}}
+                listed = True
+            for shard in shards:
+                mtime = self._dir_mtime(shard)
+                if mtime is None:
+                    self.dir_mtimes.pop(shard, None)
+                    for name in [n for n, e in self.entries.items() if _shard_of(e['path']) == shard]:
+                        del self.entries[name]
+                    self._folded = None
+                elif force or mtime != self.dir_mtimes.get(shard):
+                    self._list(shard)
+                    self.dir_mtimes[shard] = mtime
+                    listed = True
+            # Entries in shard folders that no longer exist
+            for name in [n for n, e in self.entries.items() if _shard_of(e['path']) not in self.dir_mtimes]:
+                del self.entries[name]
+            return listed
+
+    def _synced(self, *rel_paths):
+        """
+        Record folder modification times after a change made by a course tool.
+
+        Tools query the index (which syncs it) before changing images/ and record
+        their own changes afterwards, so the folders are not listed again.
+        """
+        self.dir_mtimes[''] = self._dir_mtime()
+        for rel_path in rel_paths:
+            shard = _shard_of(rel_path)
+            if shard:
+                self.dir_mtimes[shard] = self._dir_mtime(shard)
+
+    def location(self, name):
+        """Return where an image of this name belongs in the current layout."""
+        shard = shard_for(name, self.layout)
+        return self.images_path / shard / name if shard else self.images_path / name
+
+    def place(self, name):
+        """Return the location for a new image, creating its shard folder if needed."""
+        path = self.location(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def resolve(self, name):
+        """Return the path of a stored image, or None if it is not in images/."""
+        entry = self.get(name)
+        return self.images_path / entry['path'] if entry else None
+
+    def resolve_reference(self, target):
+        """Resolve a lesson reference such as 'images/02_03_Name.png' to the stored file, or None."""
+        if not target.startswith('images/'):
+            return None
+        return self.resolve(target[len('images/'):])
+
+    def add(self, name):
+        """Record an image that was just placed at place(name)."""
+        with self._lock:
+            entry = self._entry(name, self.location(name).relative_to(self.images_path).as_posix())
+            self._synced(entry['path'])
+            return entry
+
+    def remove(self, name):
+        """Forget an image that was just removed from images/."""
+        with self._lock:
+            entry = self.entries.pop(name, None)
+            self._folded = None
+            self._synced(*([entry['path']] if entry else []))
+
+    def rename(self, old_name, new_name):
+        """Move an entry after an image was renamed to location(new_name)."""
+        with self._lock:
+            entry = self.entries.pop(old_name, None)
+            new_path = self.location(new_name).relative_to(self.images_path).as_posix()
+            if entry is not None:
+                entry['unit'], entry['lesson'] = image_owner(new_name)
+                self.entries[new_name] = entry
+            self._folded = None
+            self._entry(new_name, new_path)
+            self._synced(new_path, *([entry['path']] if entry else []))
+
+    def get(self, name):
+        """Return the entry for an image name, or None if it is not in images/."""
+        with self._lock:
+            self.refresh()
+            if name not in self.entries:
+                return None
+            try:
+                return self._entry(name)
+            except FileNotFoundError:
+                return None
+
+    def unit_images(self, unit):
+        """Return the sorted names of the images owned by a unit (int or 'UU')."""
+        unit = int(unit)
+        with self._lock:
+            self.refresh()
+            return sorted(name for name, entry in self.entries.items() if entry['unit'] == unit)
+
+    def lesson_images(self, unit, lesson):
+        """Return the sorted names of the images owned by one lesson."""
+        unit, lesson = int(unit), int(lesson)
+        with self._lock:
+            self.refresh()
+            return sorted(name for name, entry in self.entries.items()
+                          if entry['unit'] == unit and entry['lesson'] == lesson)
+
+    def _existing_name(self, name):
+        """Return the indexed name that collides with name (case-insensitive, as on Windows)."""
+        if self._folded is None:
+            self._folded = {existing.casefold(): existing for existing in self.entries}
+        return self._folded.get(name.casefold())
+
+    def check_batch(self, items):
+        """
+        Check a batch of images about to be placed in images/ for name collisions.
+
+        Args:
+            items (list): (source_path, target_name) pairs
+
+        Returns:
+            list: (source_path, target_name, status, existing_name) per item, where status is
+                  NEW, IDENTICAL (same content already there), CONFLICT (different content
+                  already there) or DUPLICATE (an earlier item in the batch takes the name)
+        """
+        results = []
+        planned = set()
+        with self._lock:
+            self.refresh()
+            for source, name in items:
+                folded = name.casefold()
+                if folded in planned:
+                    results.append((source, name, DUPLICATE, None))
+                    continue
+                planned.add(folded)
+                existing = self._existing_name(name)
+                if existing is None:
+                    results.append((source, name, NEW, None))
+                    continue
+                try:
+                    entry = self._entry(existing)
+                except FileNotFoundError:
+                    results.append((source, name, NEW, None))
+                    continue
+                same = existing == name and entry['sha256'] == hash_file(source)
+                results.append((source, name, IDENTICAL if same else CONFLICT, existing))
+        return results
+
+    def set_layout(self, layout, dry_run=False, log=print):
+        """
+        Move every image to its location in another layout and record the layout.
+
+        Args:
+            layout (str): 'flat', 'unit' or 'hash'
+            dry_run (bool): Only report how many images would move
+            log (callable): Message sink
+
+        Returns:
+            int: Number of images moved (or that would be moved)
+        """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout '{layout}' (choose from {', '.join(LAYOUTS)})")
+        with self._lock:
+            self.refresh(force=True)
+            self.layout = layout
+            moves = []
+            for name, entry in sorted(self.entries.items()):
+                target = self.location(name).relative_to(self.images_path).as_posix()
+                if target != entry['path']:
+                    moves.append((name, entry['path'], target))
+            if dry_run:
+                self.layout = read_layout(self.images_path)
+                log(f"DRY-RUN: Would move {len(moves)} of {len(self.entries)} images into the '{layout}' layout")
+                return len(moves)
+
+            for name, old_path, new_path in moves:
+                target = self.images_path / new_path
+                target.parent.mkdir(exist_ok=True)
+                os.rename(self.images_path / old_path, target)
+                self.entries[name]['path'] = new_path
+            with open(self.images_path / LAYOUT_FILE, 'w', encoding='utf-8') as f:
+                f.write(layout + "\n")
+
+            # Drop shard folders the new layout no longer uses
+            for shard in {_shard_of(old_path) for _, old_path, _ in moves} - {''}:
+                try:
+                    os.rmdir(self.images_path / shard)
+                except OSError:
+                    pass
+            self.dir_mtimes = {}
+            self.refresh(force=True)
+            log(f"Moved {len(moves)} of {len(self.entries)} images into the '{layout}' layout")
+            return len(moves)
+
+    def duplicates(self):
+        """Return groups of image names with identical content."""
+        with self._lock:
+            self.refresh()
+            groups = {}
+            for name, entry in self.entries.items():
+                groups.setdefault(entry['sha256'], []).append(name)
+        return sorted(sorted(names) for names in groups.values() if len(names) > 1)
+
+    def case_collisions(self):
+        """Return groups of image names that differ only in case."""
+        with self._lock:
+            self.refresh()
+            groups = {}
+            for name in self.entries:
+                groups.setdefault(name.casefold(), []).append(name)
+        return sorted(sorted(names) for names in groups.values() if len(names) > 1)
+
+
+def main():
+    """Show, query, rebuild or re-shard the image index."""
+    parser = argparse.ArgumentParser(description="Show, query or rebuild the course image index")
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    subparsers.add_parser('status', help='Summarize the index')
+    unit_parser = subparsers.add_parser('unit', help="List a unit's images with size and dimensions")
+    unit_parser.add_argument('unit', help='Unit number, e.g. 02')
+    subparsers.add_parser('collisions', help='List case-insensitive name collisions and duplicate content')
+    subparsers.add_parser('rebuild', help='List and re-check every image')
+    layout_parser = subparsers.add_parser('layout', help='Move every image into a storage layout')
+    layout_parser.add_argument('layout', choices=LAYOUTS)
+    layout_parser.add_argument('--dry-run', action='store_true', help='Only report how many images would move')
+    add_lock_arguments(layout_parser)
+    args = parser.parse_args()
+
+    index = ImageIndex()
+    if args.action == 'rebuild':
+        index.refresh(force=True)
+        print(f"✓ Indexed {len(index.entries)} images ({index.files_hashed} hashed)")
+    elif args.action == 'unit':
+        for name in index.unit_images(args.unit):
+            entry = index.entries[name]
+            print(f"  {entry['path']:<50} {entry['size']:>9,} B  {entry['width']}x{entry['height']}  "
+                  f"lesson {entry['lesson']:02d}")
+    elif args.action == 'collisions':
+        case_groups, duplicate_groups = index.case_collisions(), index.duplicates()
+        for names in case_groups:
+            print(f"  ✗ Names differ only in case: {', '.join(names)}")
+        for names in duplicate_groups:
+            print(f"  ⚠️  Identical content: {', '.join(names)}")
+        if not case_groups and not duplicate_groups:
+            print("(No collisions)")
+    elif args.action == 'layout':
+        scopes = [] if args.dry_run else [COURSE_SCOPE]
+        try:
+            with CourseLock(scopes, "image_index", index.course_path, args.lock_timeout):
+                index.set_layout(args.layout, args.dry_run, log=lambda message: print(f"✓ {message}"))
+        except LockError as e:
+            print(f"❌ Cannot change the image layout while another operation is running: {e}")
+            return 1
+    else:
+        index.refresh()
+        owned = sum(1 for entry in index.entries.values() if entry['unit'] is not None)
+        units = sorted({entry['unit'] for entry in index.entries.values() if entry['unit'] is not None})
+        print(f"{len(index.entries)} images ({owned} owned by a lesson) in {len(units)} units, "
+              f"'{index.layout}' layout; {index.files_hashed} hashed, {index.listings} folder listings this run")
+    index.save()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Shared Timing and Profiling Instrumentation for Course Automation Scripts
+
+Every course tool records a single structured run record: per-phase timers,
+counters (files scanned, bytes copied, renames, regex evaluations, ...) and
+the final status. Records are appended as JSON lines so runs of the same tool
+can be compared over time.
+
+FEATURES:
+- Per-phase wall-clock timers (phases may repeat; durations accumulate)
+- Named counters
+- Optional cProfile dump for a whole run
+- One JSON line per run in the metrics file
+
+Usage (inside a tool):
+    metrics = Instrumentation("renumber_lessons")
+    with metrics.session():
+        with metrics.phase("scan"):
+            files = scan()
+            metrics.count("files_scanned", len(files))
+
+Command-line integration:
+    add_instrumentation_arguments(parser)
+    metrics = Instrumentation.from_args("renumber_lessons", args)
+
+The metrics file defaults to automation_metrics.jsonl in the working directory
+and can be overridden with --metrics-file or the COURSE_METRICS_FILE
+environment variable. Passing an empty path disables metric output.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+
+DEFAULT_METRICS_FILE = "automation_metrics.jsonl"
+METRICS_ENV_VAR = "COURSE_METRICS_FILE"
+PROFILE_ENV_VAR = "COURSE_PROFILE_FILE"
+
+
+def default_metrics_file():
+    """Return the metrics file configured by the environment, or the default."""
+    return os.environ.get(METRICS_ENV_VAR, DEFAULT_METRICS_FILE)
+
+
+class Instrumentation:
+    def __init__(self, tool, metrics_file=None, profile_file=None):
+        """
+        Initialize instrumentation for one tool run.
+
+        Args:
+            tool (str): Name of the tool being measured (e.g., 'renumber_lessons')
+            metrics_file (str, optional): JSON-lines file to append run records to.
+                                          None uses the default; '' disables output.
+            profile_file (str, optional): Path for a cProfile dump of the session
+        """
+        self.tool = tool
+        self.metrics_file = default_metrics_file() if metrics_file is None else metrics_file
+        self.profile_file = profile_file if profile_file is not None else os.environ.get(PROFILE_ENV_VAR) or None
+        self.run_id = os.urandom(6).hex()
+        self.phases = {}
+        self.counters = {}
+        self.started_at = None
+        self.start_time = None
+        self.duration = None
+        self.status = None
+        self._profiler = None
+        self._active = False
+        self._session_status = "success"
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, tool, args):
+        """Create instrumentation from arguments added by add_instrumentation_arguments()."""
+        return cls(tool,
+                   metrics_file=getattr(args, 'metrics_file', None),
+                   profile_file=getattr(args, 'profile', None))
+
+    def count(self, name, amount=1):
+        """Increment a named counter (safe to call from worker threads)."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def phase(self, name):
+        """Time a named phase. Repeated phases accumulate their durations."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def start(self):
+        """Start timing the run (and profiling, if requested)."""
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.start_time = time.perf_counter()
+        self._active = True
+        if self.profile_file:
+            import cProfile  # Only profiled runs pay for the import
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def finish(self, status):
+        """
+        Stop timing and write the run record.
+
+        Args:
+            status (str): Final status (e.g., 'success', 'failed', 'error')
+
+        Returns:
+            dict: The run record that was written
+        """
+        if not self._active:
+            self.start()
+        self._active = False
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            try:
+                self._profiler.dump_stats(self.profile_file)
+            except OSError as e:
+                print(f"WARNING: Could not write profile to {self.profile_file}: {e}")
+            self._profiler = None
+
+        self.duration = time.perf_counter() - self.start_time
+        self.status = status
+        record = self.to_record()
+        self.write_record(record)
+        return record
+
+    @contextmanager
+    def session(self):
+        """
+        Measure a whole tool run.
+
+        The session status is 'success' unless set_status() is called, a
+        non-zero exit is requested ('failed') or an exception escapes ('error').
+        A session opened while another is active (a tool run as a step of the
+        workflow orchestrator) joins the outer session instead of writing its
+        own record.
+        """
+        if self._active:
+            yield self
+            return
+
+        self.start()
+        self._session_status = "success"
+        try:
+            yield self
+        except SystemExit as e:
+            self.finish("failed" if e.code else self._session_status)
+            raise
+        except BaseException:
+            self.finish("error")
+            raise
+        else:
+            self.finish(self._session_status)
+
+    def set_status(self, status):
+        """Set the status reported when the current session ends."""
+        self._session_status = status
+
+    def to_record(self):
+        """Return the run as a JSON-serializable dictionary."""
+        return {
+            'tool': self.tool,
+            'run_id': self.run_id,
+            'started': self.started_at,
+            'duration_s': round(self.duration or 0.0, 6),
+            'status': self.status,
+            'phases': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            'counters': dict(self.counters),
+            'argv': sys.argv[1:],
+            'cwd': str(Path.cwd()),
+            'profile': self.profile_file,
+        }
+
+    def write_record(self, record):
+        """Append a run record to the metrics file as one JSON line."""
+        if not self.metrics_file:
+            return
+        try:
+            with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+        except OSError as e:
+            print(f"WARNING: Could not write metrics to {self.metrics_file}: {e}")
+
+    def summary_lines(self):
+        """Return human-readable summary lines for console output."""
+        lines = [f"Run {self.run_id} ({self.tool}): {self.duration or 0.0:.3f}s"]
+        for name, seconds in self.phases.items():
+            lines.append(f"  phase {name}: {seconds:.3f}s")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name}: {value}")
+        return lines
+
+
+def add_instrumentation_arguments(parser):
+    """Add the shared --metrics-file and --profile options to an argparse parser."""
+    parser.add_argument('--metrics-file', type=str, default=None,
+                        help=f'Append a JSON-lines run record to this file '
+                             f'(default: ${METRICS_ENV_VAR} or {DEFAULT_METRICS_FILE}; "" disables)')
+    parser.add_argument('--profile', type=str, default=None, metavar='PATH',
+                        help='Write a cProfile dump of the run to PATH')
+    return parser
+
+
+def load_records(metrics_file=None, tool=None):
+    """
+    Read run records from a metrics file.
+
+    Args:
+        metrics_file (str, optional): Metrics file to read (default: configured file)
+        tool (str, optional): Only return records for this tool
+
+    Returns:
+        list: Run records in file order
+    """
+    path = Path(metrics_file or default_metrics_file())
+    if not path.exists():
+        return []
+
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if tool is None or record.get('tool') == tool:
+                records.append(record)
+    return records
+
+
+def main():
+    """Print a comparison of recorded runs."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare recorded automation runs")
+    parser.add_argument('--metrics-file', type=str, default=None,
+                        help=f'Metrics file to read (default: {DEFAULT_METRICS_FILE})')
+    parser.add_argument('--tool', type=str, help='Only show runs for this tool')
+    parser.add_argument('--last', type=int, default=10, help='Number of recent runs to show (default: 10)')
+    args = parser.parse_args()
+
+    records = load_records(args.metrics_file, args.tool)[-args.last:]
+    if not records:
+        print("No recorded runs found")
+        return 0
+
+    for record in records:
+        phases = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in record.get('phases', {}).items())
+        print(f"{record.get('started')}  {record.get('tool'):<24} {record.get('status'):<8} "
+              f"{record.get('duration_s', 0):8.3f}s  {phases}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,19 @@
 import os
 import re
+import sys
 import logging
+import argparse
 from typing import List, Dict
 
+from instrumentation import Instrumentation
+from git_changes import add_since_argument, load_changes
+from lesson_parser import LessonIndex
+from course_locks import CourseLock, LockError, scopes_for, add_lock_arguments
+
 SPEC_PATH = 'Lesson-Design-Specification.md'
 LESSON_PATTERN = re.compile(r'\d{2}-\d{2}-.+\.md$')
 
-# Configure logging
-logging.basicConfig(filename='lesson_compliance.log',
-                    filemode='w',
-                    level=logging.INFO,
-                    format='%(asctime)s %(levelname)s: %(message)s')
+LOG_FILE = 'lesson_compliance.log'
 
 REQUIRED_SECTIONS = [
     'Lesson Title',
@@ -22,6 +25,9 @@ REQUIRED_SECTIONS = [
     # Optional: 'Quiz', 'Assets Needed', 'Next Steps'
 ]
 
+OPTIONAL_SECTIONS = ['Quiz', 'Assets Needed', 'Next Steps']
+OBJECTIVE_PATTERN = re.compile(r'^##?\s*Objective:?$', re.IGNORECASE)
+
 SECTION_HEADER_MAP = {
     'Lesson Title': re.compile(r'^# Lesson', re.IGNORECASE),
     'Learning Objectives': re.compile(r'^## Learning Objectives', re.IGNORECASE),
@@ -83,7 +89,7 @@ def rewrite_lesson(sections: Dict[str, List[str]], required_sections: List[str],
             else:
                 new_lines.append(f'## {section}\n\n*This section is required by the specification but was missing. Please update.*\n')
     # Add any remaining sections (e.g., Quiz, Assets Needed) at the end
-    for section in ['Quiz', 'Assets Needed', 'Next Steps']:
+    for section in OPTIONAL_SECTIONS:
         if section in sections:
             new_lines.extend(sections[section])
             if not new_lines[-1].endswith('\n'):
@@ -92,7 +98,42 @@ def rewrite_lesson(sections: Dict[str, List[str]], required_sections: List[str],
 
 
 
-def process_lesson_file(path: str, required_sections: List[str]) -> bool:
+def is_compliant(summary, required_sections: List[str]) -> bool:
+    """
+    Decide from a parsed lesson summary whether process_lesson_file would leave
+    the file unchanged: the file starts with its title, every section appears
+    once in specification order and there is no 'Objective' heading. A False
+    result only means the file has to be read and processed in full.
+    """
+    found = []
+    for line_number, text, _ in summary.headings:
+        if OBJECTIVE_PATTERN.match(text):
+            return False
+        for section, pattern in SECTION_HEADER_MAP.items():
+            if pattern.match(text):
+                found.append((line_number, section))
+                break
+    if not found or not summary.ends_with_newline:
+        return False
+    present = {section for _, section in found}
+    expected = list(required_sections) + [section for section in OPTIONAL_SECTIONS if section in present]
+
+    # Without a '# Lesson' header the first '# ' line is kept as the title
+    first_line = 0
+    if expected[0] == 'Lesson Title' and 'Lesson Title' not in present:
+        titles = [line_number for line_number, text, _ in summary.headings if text.startswith('# ')]
+        if not titles or titles[0] != 0:
+            return False
+        expected = expected[1:]
+        first_line = 1
+    return found[0][0] == first_line and [section for _, section in found] == expected
+
+
+def process_lesson_file(path: str, required_sections: List[str], index: LessonIndex = None) -> bool:
+    if index is not None and is_compliant(index.get(path), required_sections):
+        logging.info(f'No changes needed: {path}')
+        return False
+
     with open(path, 'r', encoding='utf-8') as f:
         lines = f.readlines()
 
@@ -101,7 +142,7 @@ def process_lesson_file(path: str, required_sections: List[str]) -> bool:
     changed_heading = False
     for line in lines:
         # Replace '## Objective' or 'Objective:' (with or without ##) with '## Learning Objectives'
-        if re.match(r'^##?\s*Objective:?$', line.strip(), re.IGNORECASE):
+        if OBJECTIVE_PATTERN.match(line.strip()):
             updated_lines.append('## Learning Objectives\n')
             changed_heading = True
         else:
@@ -123,14 +164,48 @@ def process_lesson_file(path: str, required_sections: List[str]) -> bool:
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Bring lesson files in line with the lesson design specification')
+    add_since_argument(parser)
+    add_lock_arguments(parser)
+    args = parser.parse_args()
+
+    # Only the command line writes lesson_compliance.log; importers keep their own logging
+    logging.basicConfig(filename=LOG_FILE,
+                        filemode='w',
+                        level=logging.INFO,
+                        format='%(asctime)s %(levelname)s: %(message)s')
+
     root = os.getcwd()
-    required_sections = parse_spec_sections(SPEC_PATH)
-    lesson_files = find_lesson_files(root)
-    updated = []
-    for lesson in lesson_files:
-        changed = process_lesson_file(lesson, required_sections)
-        if changed:
-            updated.append(lesson)
+    changes = load_changes(args.since, root)
+    if changes is False:
+        sys.exit(1)
+
+    metrics = Instrumentation('lesson_compliance')
+    with metrics.session():
+        required_sections = parse_spec_sections(SPEC_PATH)
+        with metrics.phase('scan'):
+            lesson_files = find_lesson_files(root)
+            if changes:
+                lesson_files = changes.filter_lessons(lesson_files)
+        metrics.count('files_scanned', len(lesson_files))
+        try:
+            lock = CourseLock(scopes_for(lesson_files), 'lesson_compliance', root, args.lock_timeout).acquire()
+        except LockError as e:
+            print(f'ERROR: Cannot update lessons while another operation is running: {e}')
+            sys.exit(1)
+        updated = []
+        index = LessonIndex(root)
+        try:
+            with metrics.phase('process'):
+                for lesson in lesson_files:
+                    changed = process_lesson_file(lesson, required_sections, index)
+                    if changed:
+                        updated.append(lesson)
+        finally:
+            lock.release()
+        index.save()
+        metrics.count('files_parsed', index.files_parsed)
+        metrics.count('files_updated', len(updated))
     logging.info(f'Checked {len(lesson_files)} lesson files. Updated: {len(updated)}')
     print(f'Checked {len(lesson_files)} lesson files. Updated: {len(updated)}')
 
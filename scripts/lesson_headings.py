@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Lesson Heading Synchronization
+
+Keeps the first "# Lesson N:" heading inside each lesson file in step with the
+lesson number in its UU-LL-lesson-title.md filename. The renumbering and gap
+closing tools call sync_heading() for every file they rename, and this script
+reports (or fixes) any drift across the course.
+
+The drift check reads headings from the shared lesson index (lesson_parser.py),
+so only files changed since the last check are read again.
+
+Usage:
+    python lesson_headings.py                 # Report heading drift
+    python lesson_headings.py --fix           # Rewrite drifted headings
+    python lesson_headings.py --since HEAD    # Only check lessons changed since HEAD
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+from course_model import LESSON_FILENAME_PATTERN
+from git_changes import add_since_argument, load_changes
+from lesson_parser import LessonIndex, LESSON_HEADING_PATTERN, FENCE_PATTERN
+from course_locks import CourseLock, LockError, scopes_for, add_lock_arguments
+
+
+def sync_heading(path, lesson_number, dry_run=False):
+    """
+    Rewrite the first "# Lesson N" heading to the given lesson number. Headings in
+    fenced code blocks are examples, not the lesson's heading (as in the lesson index).
+
+    Args:
+        path (Path): Lesson file
+        lesson_number (int): Lesson number the heading should show
+        dry_run (bool): Only report whether a change is needed
+
+    Returns:
+        tuple: (old_number, changed) - old_number is None if the file has no heading
+    """
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        lines = f.readlines()
+
+    in_code = False
+    for index, line in enumerate(lines):
+        if FENCE_PATTERN.match(line.strip()):
+            in_code = not in_code
+            continue
+        match = None if in_code else LESSON_HEADING_PATTERN.match(line)
+        if not match:
+            continue
+        old_number = int(match.group(2))
+        if old_number == lesson_number:
+            return old_number, False
+        if not dry_run:
+            lines[index] = f"{match.group(1)}{lesson_number}{line[match.end():]}"
+            temp_path = path.with_name(path.name + ".tmp")
+            with open(temp_path, 'w', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
+            os.replace(temp_path, path)
+        return old_number, True
+
+    return None, False
+
+
+class HeadingIndex:
+    def __init__(self, course_path=None, lesson_index=None):
+        """
+        Initialize the heading check on top of the cached lesson index.
+
+        Args:
+            course_path (str, optional): Course root (default: current directory)
+            lesson_index (LessonIndex, optional): Shared lesson index to reuse
+        """
+        self.lessons = lesson_index or LessonIndex(course_path)
+        self.course_path = self.lessons.course_path
+
+    @property
+    def files_read(self):
+        return self.lessons.files_parsed
+
+    def save(self):
+        """Write the lesson index back to disk."""
+        self.lessons.save()
+
+    def heading_number(self, filename):
+        """Return the heading number of a lesson file, reading it only if it changed."""
+        return self.lessons.get(filename).lesson_number
+
+    def check(self, filenames=None):
+        """
+        Report lessons whose heading number does not match their filename.
+
+        Args:
+            filenames (list, optional): Lesson filenames to check (default: all lessons)
+
+        Returns:
+            list: (filename, file_lesson_number, heading_number) for every drifted lesson;
+                  heading_number is None when the heading is missing
+        """
+        full_scan = filenames is None
+        if full_scan:
+            filenames = sorted(name for name in os.listdir(self.course_path)
+                               if LESSON_FILENAME_PATTERN.match(name))
+
+        drift = []
+        for filename in filenames:
+            file_number = int(LESSON_FILENAME_PATTERN.match(filename).group(2))
+            heading = self.heading_number(filename)
+            if heading != file_number:
+                drift.append((filename, file_number, heading))
+
+        # Forget files that no longer exist
+        if full_scan:
+            self.lessons.prune(filenames)
+        return drift
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Report or fix '# Lesson N' headings that do not match lesson filenames",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python lesson_headings.py                 # Report heading drift
+  python lesson_headings.py --fix           # Rewrite drifted headings
+  python lesson_headings.py --since HEAD    # Only check lessons changed since HEAD
+        """
+    )
+    parser.add_argument('--fix', action='store_true', help='Rewrite drifted headings to match filenames')
+    add_since_argument(parser)
+    add_lock_arguments(parser)
+    args = parser.parse_args()
+
+    changes = load_changes(args.since)
+    if changes is False:
+        return 1
+
+    index = HeadingIndex()
+    filenames = sorted(changes.lessons) if changes else None
+    drift = index.check(filenames)
+
+    missing = [item for item in drift if item[2] is None]
+    mismatched = [item for item in drift if item[2] is not None]
+
+    scopes = scopes_for(item[0] for item in mismatched) if args.fix else []
+    try:
+        lock = CourseLock(scopes, "lesson_headings", index.course_path, args.lock_timeout).acquire()
+    except LockError as e:
+        print(f"ERROR: Cannot fix headings while another operation is running: {e}")
+        return 1
+    try:
+        for filename, file_number, heading in mismatched:
+            if args.fix:
+                sync_heading(index.course_path / filename, file_number)
+                index.heading_number(filename)
+                print(f"  ✓ Fixed {filename}: Lesson {heading} → Lesson {file_number}")
+            else:
+                print(f"  ✗ {filename}: heading says Lesson {heading}, filename says {file_number:02d}")
+    finally:
+        lock.release()
+    for filename, file_number, _ in missing:
+        print(f"  ⚠️  {filename}: no '# Lesson N' heading found")
+
+    index.save()
+    print(f"Checked headings ({index.files_read} files read). "
+          f"Drift: {len(mismatched)} mismatched, {len(missing)} missing")
+    if args.fix:
+        return 1 if missing else 0
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Streaming Lesson Parser
+
+One parser for the lesson markdown files, shared by the course tools. A lesson
+is read once, line by line (through mmap for large files), and produces a
+stream of events:
+
+    ('heading', line, text, in_code)          - any line starting with '#'
+    ('section', start, end, level, title)     - a heading and its line range
+    ('image',   line, alt, target, in_code)   - ![alt](target)
+    ('link',    line, text, target, in_code)  - [text](target)
+    ('url',     line, url, in_code)           - any http(s) URL, bare or as a link target
+                                                (not inside `inline code`)
+
+Line numbers are 0-based. in_code is True inside fenced code blocks.
+
+The events are folded into a compact LessonSummary, and LessonIndex caches the
+summaries in .course_cache/lessons.json keyed by (size, mtime), so tools only
+re-read lessons that changed since the last run.
+
+Usage:
+    index = LessonIndex()
+    summary = index.get("01-02-lesson-title.md")
+    summary.lesson_number, summary.sections, summary.images, summary.links
+    index.save()
+
+Command line (inspect a lesson):
+    python lesson_parser.py 01-02-lesson-title.md
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+from course_model import LESSON_FILENAME_PATTERN
+
+
+CACHE_DIR = ".course_cache"
+LESSON_CACHE_FILE = "lessons.json"
+CACHE_VERSION = 2
+MMAP_THRESHOLD = 1024 * 1024
+
+LESSON_HEADING_PATTERN = re.compile(r'^(#\s+Lesson\s+)(\d+)', re.IGNORECASE)
+SECTION_PATTERN = re.compile(r'^(#{1,6})(?:\s+(.*?))?\s*$')
+FENCE_PATTERN = re.compile(r'^(```|~~~)')
+IMAGE_PATTERN = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+LINK_PATTERN = re.compile(r'(?<!!)\[([^\]]*)\]\(([^)]+)\)')
+URL_PATTERN = re.compile(r'https?://[^\s<>()\[\]`"\']+')
+INLINE_CODE_PATTERN = re.compile(r'`[^`]*`')
+URL_TRAILING_PUNCTUATION = '.,;:!?*_'
+
+
+def iter_lines(path):
+    """
+    Yield the decoded lines of a file without loading it into a list.
+
+    Files of MMAP_THRESHOLD bytes or more are read through mmap.
+    """
+    size = os.path.getsize(path)
+    if size >= MMAP_THRESHOLD:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for raw in iter(mm.readline, b''):
+                yield raw.decode('utf-8').replace('\r\n', '\n')
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from f
+
+
+def iter_events(path, digest=None):
+    """
+    Stream the structural events of a lesson file.
+
+    Args:
+        path (Path): Lesson file
+        digest (hashlib object, optional): Updated with the file content as it is read
+
+    Yields:
+        tuple: Events as described in the module docstring, then ('end', line_count, ends_with_newline)
+    """
+    return iter_line_events(iter_lines(path), digest)
+
+
+def iter_line_events(lines, digest=None):
+    """Stream the structural events of lesson content given as lines (see iter_events())."""
+    in_code = False
+    open_section = None
+    line_number = -1
+    last_line = ''
+
+    for line_number, line in enumerate(lines):
+        last_line = line
+        if digest is not None:
+            digest.update(line.encode('utf-8'))
+        stripped = line.strip()
+
+        if FENCE_PATTERN.match(stripped):
+            in_code = not in_code
+            continue
+
+        if stripped.startswith('#'):
+            yield ('heading', line_number, stripped, in_code)
+            match = SECTION_PATTERN.match(stripped)
+            if match and not in_code:
+                if open_section:
+                    yield ('section', open_section[0], line_number - 1, open_section[1], open_section[2])
+                open_section = (line_number, len(match.group(1)), match.group(2) or '')
+
+        if '](' in line:
+            for match in IMAGE_PATTERN.finditer(line):
+                yield ('image', line_number, match.group(1), match.group(2), in_code)
+            for match in LINK_PATTERN.finditer(line):
+                yield ('link', line_number, match.group(1), match.group(2), in_code)
+
+        if '://' in line:
+            for match in URL_PATTERN.finditer(INLINE_CODE_PATTERN.sub('', line)):
+                yield ('url', line_number, match.group(0).rstrip(URL_TRAILING_PUNCTUATION), in_code)
+
+    line_count = line_number + 1
+    if open_section:
+        yield ('section', open_section[0], line_count - 1, open_section[1], open_section[2])
+    yield ('end', line_count, last_line.endswith('\n'))
+
+
+class LessonSummary:
+    FIELDS = ('size', 'mtime_ns', 'sha256', 'line_count', 'ends_with_newline',
+              'headings', 'sections', 'images', 'links', 'urls')
+
+    def __init__(self, **values):
+        """
+        Compact parse result for one lesson file.
+
+        Attributes:
+            size, mtime_ns: File stat the summary was built from
+            sha256: Content digest (exact duplicate detection)
+            line_count, ends_with_newline: Shape of the file
+            headings: [(line, text, in_code)]
+            sections: [(start, end, level, title)]
+            images: [(line, alt, target, in_code)]
+            links: [(line, text, target, in_code)]
+            urls: [(line, url, in_code)]
+        """
+        for field in self.FIELDS:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def parse(cls, path):
+        """Parse a lesson file into a summary."""
+        stat = os.stat(path)
+        return cls.parse_lines(iter_lines(path), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    @classmethod
+    def parse_lines(cls, lines, size=None, mtime_ns=None):
+        """Parse lesson content given as lines (e.g. read from git) into a summary."""
+        digest = hashlib.sha256()
+        headings, sections, images, links, urls = [], [], [], [], []
+        line_count, ends_with_newline = 0, False
+
+        for event in iter_line_events(lines, digest):
+            kind = event[0]
+            if kind == 'heading':
+                headings.append(event[1:])
+            elif kind == 'section':
+                sections.append(event[1:])
+            elif kind == 'image':
+                images.append(event[1:])
+            elif kind == 'link':
+                links.append(event[1:])
+            elif kind == 'url':
+                urls.append(event[1:])
+            else:
+                line_count, ends_with_newline = event[1], event[2]
+
+        return cls(size=size, mtime_ns=mtime_ns, sha256=digest.hexdigest(),
+                   line_count=line_count, ends_with_newline=ends_with_newline,
+                   headings=headings, sections=sections, images=images, links=links, urls=urls)
+
+    @classmethod
+    def from_dict(cls, data):
+        values = dict(data)
+        for field in ('headings', 'sections', 'images', 'links', 'urls'):
+            values[field] = [tuple(item) for item in data[field]]
+        return cls(**values)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def matches_stat(self, stat):
+        """True if the summary was built from a file with this size and mtime."""
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+    @property
+    def lesson_number(self):
+        """Number from the first '# Lesson N' heading, or None."""
+        for _, text, in_code in self.headings:
+            match = LESSON_HEADING_PATTERN.match(text)
+            if match and not in_code:
+                return int(match.group(2))
+        return None
+
+    @property
+    def title(self):
+        """Text of the first level-1 section, or None."""
+        for _, _, level, title in self.sections:
+            if level == 1:
+                return title
+        return None
+
+
+class LessonIndex:
+    def __init__(self, course_path=None):
+        """
+        Initialize the cached lesson index.
+
+        Args:
+            course_path (str, optional): Course root (default: current directory)
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.cache_path = self.course_path / CACHE_DIR / LESSON_CACHE_FILE
+        self.summaries = {}
+        self.files_parsed = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self.summaries = {name: LessonSummary.from_dict(entry) for name, entry in data['lessons'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.summaries = {}
+
+    def save(self):
+        """Write the index back to disk."""
+        with self._lock:
+            data = {'version': CACHE_VERSION,
+                    'lessons': {name: summary.to_dict() for name, summary in self.summaries.items()}}
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, self.cache_path)
+
+    def get(self, lesson):
+        """
+        Return the summary of a lesson, parsing it only if it changed.
+
+        Args:
+            lesson (str or Path): Lesson filename or path inside the course root
+
+        Returns:
+            LessonSummary
+        """
+        path = Path(lesson)
+        if not path.is_absolute():
+            path = self.course_path / path
+        name = path.name
+        stat = path.stat()
+        with self._lock:
+            summary = self.summaries.get(name)
+        if summary and summary.matches_stat(stat):
+            return summary
+
+        summary = LessonSummary.parse(path)
+        with self._lock:
+            self.summaries[name] = summary
+            self.files_parsed += 1
+        return summary
+
+    def prune(self, existing):
+        """Forget lessons that are not in existing (filenames)."""
+        with self._lock:
+            for name in set(self.summaries) - set(existing):
+                del self.summaries[name]
+
+    def all_lessons(self):
+        """Return {filename: summary} for every lesson in the course root."""
+        names = sorted(name for name in os.listdir(self.course_path) if LESSON_FILENAME_PATTERN.match(name))
+        self.prune(names)
+        return {name: self.get(name) for name in names}
+
+
+def main():
+    """Print the parsed structure of lesson files."""
+    if len(sys.argv) < 2:
+        print("Usage: python lesson_parser.py <lesson.md> [...]")
+        return 1
+
+    index = LessonIndex()
+    for name in sys.argv[1:]:
+        summary = index.get(name)
+        print(f"{name}: {summary.line_count} lines, lesson heading {summary.lesson_number}")
+        for start, end, level, title in summary.sections:
+            print(f"  {'  ' * (level - 1)}{title}  [{start + 1}-{end + 1}]")
+        for line, alt, target, _ in summary.images:
+            print(f"  image {target} (line {line + 1})")
+        print(f"  {len(summary.links)} links, {len(summary.urls)} external URLs")
+    index.save()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
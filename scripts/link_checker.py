@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+External Link Checker
+
+Checks the http(s) URLs the lessons point to - the GoldSim Help Center, the
+model library, data portals. URLs come from the shared lesson parser (the
+'url' events of every UU-LL-*.md, cached in .course_cache/lessons.json), so
+each distinct URL is checked once however many lessons use it.
+
+Checks run on asyncio with bounded concurrency and per-host spacing, so a
+course full of links to one site is checked quickly without hammering it.
+Each check is a HEAD request (GET if the server refuses HEAD), following up to
+MAX_REDIRECTS redirects. Working results are cached in
+.course_cache/links.json for --ttl hours; broken ones are re-checked on every
+run.
+
+With --offline no network is used: requests go to a local stub HTTP server
+that answers 200, or the status given for the URL in --stub-responses (a JSON
+file of {url: status} or {url: {"status": 301, "location": url}}; a
+"head_status" entry answers HEAD requests differently, e.g. 405).
+
+Usage (inside a tool):
+    links = collect_urls()                              # {url: [(lesson, line)]}
+    results = check_urls(links, workers=16)             # {url: LinkResult}
+
+Command line:
+    python link_checker.py                        # Check all lessons
+    python link_checker.py --offline --stub-responses stub.json
+    python link_checker.py --refresh              # Ignore cached results
+"""
+
+import os
+import ssl
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, urljoin
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from lesson_parser import CACHE_DIR, LessonIndex
+
+
+LINK_CACHE_FILE = "links.json"
+LINK_CACHE_VERSION = 1
+TTL_ENV_VAR = "COURSE_LINK_TTL_HOURS"
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_WORKERS = 16
+DEFAULT_HOST_DELAY = 0.25
+DEFAULT_TIMEOUT = 15.0
+MAX_REDIRECTS = 5
+USER_AGENT = "course-link-checker/1.0"
+# Servers that reject HEAD with these statuses get a GET instead
+HEAD_REJECTED = (403, 405, 501)
+
+LinkResult = namedtuple('LinkResult', 'url ok status final_url error checked_at')
+
+
+def collect_urls(course_path=None, lesson_index=None):
+    """
+    Collect the external URLs of every lesson.
+
+    Returns:
+        dict: url -> [(lesson filename, 0-based line)] in course order
+    """
+    index = lesson_index or LessonIndex(course_path)
+    urls = {}
+    for name, summary in index.all_lessons().items():
+        for line, url, in_code in summary.urls:
+            if not in_code and urlsplit(url).hostname:
+                urls.setdefault(url, []).append((name, line))
+    if lesson_index is None:
+        index.save()
+    return urls
+
+
+class LinkCache:
+    def __init__(self, course_path=None, ttl_hours=None):
+        """
+        Initialize the on-disk link result cache.
+
+        Args:
+            course_path (str, optional): Course root holding the cache (default: current directory)
+            ttl_hours (float, optional): Hours a working result stays valid
+                                         (default: $COURSE_LINK_TTL_HOURS or one week)
+        """
+        if ttl_hours is None:
+            ttl_hours = float(os.environ.get(TTL_ENV_VAR, DEFAULT_TTL_HOURS))
+        self.ttl = ttl_hours * 3600
+        self.cache_path = (Path(course_path) if course_path else Path.cwd()) / CACHE_DIR / LINK_CACHE_FILE
+        self.results = {}
+        self._load()
+
+    def _load(self):
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == LINK_CACHE_VERSION:
+                self.results = {url: LinkResult(*entry) for url, entry in data['links'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.results = {}
+
+    def save(self):
+        """Write the cache back to disk."""
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': LINK_CACHE_VERSION,
+                       'links': {url: list(result) for url, result in self.results.items()}},
+                      f, separators=(',', ':'))
+        os.replace(temp_path, self.cache_path)
+
+    def get(self, url, now=None):
+        """Return the cached result of a URL if it worked and is younger than the TTL, else None."""
+        result = self.results.get(url)
+        if result and result.ok and (now or time.time()) - result.checked_at < self.ttl:
+            return result
+        return None
+
+    def put(self, result):
+        self.results[result.url] = result
+
+    def prune(self, urls):
+        """Forget URLs that no lesson uses any more."""
+        for url in set(self.results) - set(urls):
+            del self.results[url]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def _respond(self):
+        # Requests arrive in absolute form ("HEAD https://host/path HTTP/1.1")
+        self.server.requests.append((self.command, self.path))
+        response = self.server.responses.get(self.path, 200)
+        if isinstance(response, int):
+            response = {'status': response}
+        status = response['status']
+        if self.command == 'HEAD':
+            status = response.get('head_status', status)
+        self.send_response(status)
+        if response.get('location'):
+            self.send_header('Location', response['location'])
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    def __init__(self, responses=None):
+        """
+        Local HTTP server standing in for every external host in offline mode.
+
+        Args:
+            responses (dict, optional): url -> status, or url -> {'status', 'location', 'head_status'}
+                                        (default: all 200)
+        """
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self.server.responses = responses or {}
+        self.server.requests = []
+        self.requests = self.server.requests  # [(method, url)] in arrival order
+        self.address = self.server.server_address
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HostLimiter:
+    def __init__(self, delay):
+        """Space the start of requests to the same host at least `delay` seconds apart."""
+        self.delay = delay
+        self._next = {}
+
+    async def wait(self, host):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self._next.get(host, now))
+        self._next[host] = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class LinkChecker:
+    def __init__(self, workers=DEFAULT_WORKERS, host_delay=DEFAULT_HOST_DELAY, timeout=DEFAULT_TIMEOUT,
+                 stub_address=None, metrics=None):
+        """
+        Initialize the checker.
+
+        Args:
+            workers (int): Requests in flight at once
+            host_delay (float): Minimum seconds between requests to the same host
+            timeout (float): Seconds per request
+            stub_address (tuple, optional): (host, port) of a StubServer to send every request to
+            metrics (Instrumentation, optional): Shared instrumentation
+        """
+        self.workers = max(1, workers)
+        self.limiter = HostLimiter(host_delay)
+        self.timeout = timeout
+        self.stub_address = stub_address
+        self.metrics = metrics or Instrumentation("link_checker")
+        self._ssl = ssl.create_default_context()
+
+    async def _request(self, method, url):
+        """Send one request and return (status, location header or None)."""
+        parts = urlsplit(url)
+        if self.stub_address:
+            host, port = self.stub_address
+            ssl_context, target = None, url
+        else:
+            host = parts.hostname
+            port = parts.port or (443 if parts.scheme == 'https' else 80)
+            ssl_context = self._ssl if parts.scheme == 'https' else None
+            target = parts.path or '/'
+            if parts.query:
+                target += '?' + parts.query
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context,
+                                                       server_hostname=parts.hostname if ssl_context else None)
+        try:
+            writer.write(f"{method} {target} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                         f"User-Agent: {USER_AGENT}\r\nAccept: */*\r\nConnection: close\r\n\r\n".encode('ascii'))
+            await writer.drain()
+            status_line = await reader.readline()
+            fields = status_line.decode('latin-1').split(None, 2)
+            if len(fields) < 2 or not fields[1].isdigit():
+                raise ValueError(f"invalid response {status_line[:40]!r}")
+            location = None
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'location':
+                    location = value.strip()
+            return int(fields[1]), location
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass  # The response is already read; a reset while closing does not matter
+
+    async def check(self, url, semaphore):
+        """Check one URL, following redirects. Returns a LinkResult."""
+        current, method, status, error = url, 'HEAD', None, None
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                await self.limiter.wait(urlsplit(current).hostname)
+                async with semaphore:
+                    status, location = await asyncio.wait_for(self._request(method, current), self.timeout)
+                self.metrics.count("requests")
+                if status in HEAD_REJECTED and method == 'HEAD':
+                    method = 'GET'
+                    continue
+                if 300 <= status < 400 and location:
+                    current = urljoin(current, location)
+                    continue
+                break
+            else:
+                error = f"more than {MAX_REDIRECTS} redirects"
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout:g}s"
+        except (OSError, ValueError, UnicodeError) as e:
+            error = str(e) or type(e).__name__
+        ok = error is None and status is not None and status < 400
+        return LinkResult(url, ok, status, current, error, time.time())
+
+    async def check_all(self, urls):
+        semaphore = asyncio.Semaphore(self.workers)
+        results = await asyncio.gather(*(self.check(url, semaphore) for url in urls))
+        return {result.url: result for result in results}
+
+
+def check_urls(urls, cache=None, workers=DEFAULT_WORKERS, host_delay=DEFAULT_HOST_DELAY,
+               timeout=DEFAULT_TIMEOUT, stub_address=None, metrics=None):
+    """
+    Check URLs, reusing cached working results.
+
+    Args:
+        urls (iterable): URLs to check
+        cache (LinkCache, optional): Result cache (updated in place; the caller saves it)
+        stub_address (tuple, optional): Send every request to this StubServer address
+
+    Returns:
+        dict: url -> LinkResult
+    """
+    metrics = metrics or Instrumentation("link_checker")
+    results, pending = {}, []
+    now = time.time()
+    for url in urls:
+        cached = cache.get(url, now) if cache else None
+        if cached:
+            results[url] = cached
+        else:
+            pending.append(url)
+    metrics.count("links_cached", len(results))
+
+    if pending:
+        checker = LinkChecker(workers, host_delay, timeout, stub_address, metrics)
+        with metrics.phase("check_links"):
+            checked = asyncio.run(checker.check_all(pending))
+        metrics.count("links_checked", len(checked))
+        for result in checked.values():
+            if cache:
+                cache.put(result)
+        results.update(checked)
+    return results
+
+
+def format_report(urls, results):
+    """Return the broken-link report: each broken URL with the lessons that use it."""
+    broken = [results[url] for url in urls if not results[url].ok]
+    redirected = [results[url] for url in urls if results[url].ok and results[url].final_url != url]
+    lines = [f"{len(urls)} external URLs, {len(broken)} broken, {len(redirected)} redirected"]
+    for result in broken:
+        reason = result.error or f"HTTP {result.status}"
+        lines.append(f"\n❌ {result.url} ({reason})")
+        lines.extend(f"   {lesson}:{line + 1}" for lesson, line in urls[result.url])
+    if redirected:
+        lines.append("\nRedirected (consider updating):")
+        lines.extend(f"   {result.url} → {result.final_url}" for result in redirected)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the external links of all lessons")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Requests in flight at once (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--host-delay', type=float, default=DEFAULT_HOST_DELAY,
+                        help=f'Seconds between requests to the same host (default: {DEFAULT_HOST_DELAY})')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help=f'Seconds per request (default: {DEFAULT_TIMEOUT:g})')
+    parser.add_argument('--ttl', type=float, default=None,
+                        help=f'Hours to trust a cached working result (default: ${TTL_ENV_VAR} or {DEFAULT_TTL_HOURS})')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached results')
+    parser.add_argument('--offline', action='store_true', help='Check against a local stub server instead of the network')
+    parser.add_argument('--stub-responses', help='JSON file of {url: status} for the offline stub server')
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+
+    metrics = Instrumentation.from_args("link_checker", args)
+    with metrics.session():
+        urls = collect_urls()
+        if not urls:
+            print("No external links found")
+            return 0
+        # Offline results are not real results: keep them out of the cache
+        cache = None if args.offline else LinkCache(ttl_hours=0 if args.refresh else args.ttl)
+
+        if args.offline:
+            responses = {}
+            if args.stub_responses:
+                with open(args.stub_responses, 'r', encoding='utf-8') as f:
+                    responses = json.load(f)
+            with StubServer(responses) as stub:
+                results = check_urls(urls, workers=args.workers, host_delay=0, timeout=args.timeout,
+                                     stub_address=stub.address, metrics=metrics)
+        else:
+            results = check_urls(urls, cache, args.workers, args.host_delay, args.timeout, metrics=metrics)
+            cache.prune(urls)
+            cache.save()
+
+        print(format_report(urls, results))
+        if any(not result.ok for result in results.values()):
+            metrics.set_status("broken_links")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,104 +5,392 @@ Migrate from nested lesson folders to ultra-flat structure
 Converts:
   01-Getting-Started/Lesson_01-Welcome/lesson.md
   04-Water-Demand/Lesson_01-Introduction/lesson.md
-  
+
 To:
   01-01-welcome-to-the-course.md
   04-01-introduction-to-water-demand.md
   images/ (all images moved here)
+
+The migration is planned up front, then executed by parallel workers. Every
+operation is recorded with its source hash in a checkpoint file, so an
+interrupted migration resumes where it stopped. Images are renamed into images/ when
+source and destination share a file system, and copied, verified and removed
+otherwise. A final verification pass compares the hashes of the source set
+(recorded before each operation) with the destination set. Once a run is
+complete and verified, its checkpoint is set aside (migrate_verified.jsonl,
+which --verify-only falls back to), so a later migration starts fresh.
+
+Image names are checked against the image index before anything moves: an
+image whose name is taken by different content (already in images/ or from
+another lesson) is reported and left in place rather than clobbered.
+
+Usage:
+    python migrate-to-flat.py                  # Migrate (resumes automatically)
+    python migrate-to-flat.py --workers 8      # More parallel workers
+    python migrate-to-flat.py --rate 200       # At most 200 operations per second
+    python migrate-to-flat.py --restart        # Discard the checkpoint and start over
+    python migrate-to-flat.py --verify-only    # Only verify a finished migration
+    python migrate-to-flat.py --dry-run        # Show the plan
 """
 
 import os
+import re
+import sys
+import json
+import time
 import shutil
+import argparse
+import threading
 from pathlib import Path
-import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from course_locks import CourseLock, LockError, COURSE_SCOPE, add_lock_arguments
+from snapshots import hash_file
+from image_index import ImageIndex, CONFLICT, DUPLICATE
 
-def main():
-    course_root = Path(".")
-    print("=" * 60)
-    print("MIGRATING TO ULTRA-FLAT STRUCTURE")
-    print("=" * 60)
-    
-    # Create global images directory
+
+CHECKPOINT_FILE = Path(".course_cache") / "migrate_checkpoint.jsonl"
+VERIFIED_FILE = Path(".course_cache") / "migrate_verified.jsonl"
+
+
+class Checkpoint:
+    def __init__(self, path):
+        """
+        Append-only record of migration operations and their source hashes.
+
+        Args:
+            path (Path): Checkpoint file (one JSON object per line)
+        """
+        self.path = Path(path)
+        self.done = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # A line cut short by an interruption
+                    self.done[entry['dst']] = entry
+
+    def record(self, entry):
+        """Append an operation (safe to call from worker threads)."""
+        with self._lock:
+            self.done[entry['dst']] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    def discard(self):
+        self.done = {}
+        self.path.unlink(missing_ok=True)
+
+    def set_aside(self, path):
+        """Move the checkpoint of a verified migration to path, leaving this one empty."""
+        with self._lock:
+            if self.path.exists():
+                os.replace(self.path, path)
+            self.done = {}
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        """Allow at most rate operations per second across all workers (0 = unlimited)."""
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def plan_migration(course_root, index, metrics):
+    """
+    Build the list of operations for every nested lesson.
+
+    Image names are checked against the image index (existing images/) and against
+    each other before anything is moved.
+
+    Returns:
+        tuple: (operations, collisions) - operations are dicts with kind ('lesson' or 'image'),
+               src and dst; collisions are (src, dst, reason) for images that are skipped
+    """
     global_images = course_root / "images"
-    global_images.mkdir(exist_ok=True)
-    print(f"✅ Created: {global_images}")
-    
-    # Find all current lesson.md files
-    lesson_files = list(course_root.rglob("lesson.md"))
+    with metrics.phase("scan"):
+        lesson_files = sorted(course_root.rglob("lesson.md"))
+    metrics.count("files_scanned", len(lesson_files))
     print(f"\nFound {len(lesson_files)} lesson files to migrate")
-    
+
+    operations = []
+    images = []
     for lesson_file in lesson_files:
-        print(f"\nProcessing: {lesson_file}")
-        
         # Parse the path to get unit and lesson info
         # Example: 01-Getting-Started/Lesson_01-Welcome-to-the-Course/lesson.md
-        parts = lesson_file.parts
-        
-        if len(parts) >= 3:
-            unit_dir = parts[-3]  # "01-Getting-Started"
-            lesson_dir = parts[-2]  # "Lesson_01-Welcome-to-the-Course"
-            
-            # Extract unit number
-            unit_match = re.match(r'^(\d{2})', unit_dir)
-            if not unit_match:
-                print(f"  ⚠️  Could not parse unit number from: {unit_dir}")
-                continue
-            unit_num = unit_match.group(1)
-            
-            # Extract lesson number and name
-            lesson_match = re.match(r'^Lesson_(\d+)-(.+)$', lesson_dir)
-            if not lesson_match:
-                print(f"  ⚠️  Could not parse lesson from: {lesson_dir}")
-                continue
-            
-            lesson_num = lesson_match.group(1).zfill(2)  # Ensure 2 digits
-            lesson_name = lesson_match.group(2)
-            
-            # Create new filename
-            safe_name = lesson_name.lower().replace(' ', '-').replace('_', '-')
-            new_filename = f"{unit_num}-{lesson_num}-{safe_name}.md"
-            new_path = course_root / new_filename
-            
-            print(f"  📝 New name: {new_filename}")
-            
-            # Copy lesson.md to new location
-            try:
-                shutil.copy2(lesson_file, new_path)
-                print(f"  ✅ Copied lesson content")
-            except Exception as e:
-                print(f"  ❌ Failed to copy lesson: {e}")
-                continue
-            
-            # Move images from lesson folder to global folder
-            lesson_images_dir = lesson_file.parent / "images"
-            if lesson_images_dir.exists():
-                moved_count = 0
-                for img_file in lesson_images_dir.rglob("*.png"):
-                    try:
-                        # Move to global images folder
-                        target_path = global_images / img_file.name
-                        if not target_path.exists():
-                            shutil.move(str(img_file), str(target_path))
-                            moved_count += 1
-                    except Exception as e:
-                        print(f"    ⚠️  Could not move {img_file.name}: {e}")
-                
-                if moved_count > 0:
-                    print(f"  📁 Moved {moved_count} images to global folder")
-        
-        else:
+        parts = lesson_file.relative_to(course_root).parts
+        if len(parts) < 3:
             print(f"  ⚠️  Unexpected path structure: {lesson_file}")
-    
+            continue
+
+        unit_dir = parts[-3]  # "01-Getting-Started"
+        lesson_dir = parts[-2]  # "Lesson_01-Welcome-to-the-Course"
+
+        # Extract unit number
+        metrics.count("regex_evaluations")
+        unit_match = re.match(r'^(\d{2})', unit_dir)
+        if not unit_match:
+            print(f"  ⚠️  Could not parse unit number from: {unit_dir}")
+            continue
+        unit_num = unit_match.group(1)
+
+        # Extract lesson number and name
+        metrics.count("regex_evaluations")
+        lesson_match = re.match(r'^Lesson_(\d+)-(.+)$', lesson_dir)
+        if not lesson_match:
+            print(f"  ⚠️  Could not parse lesson from: {lesson_dir}")
+            continue
+
+        lesson_num = lesson_match.group(1).zfill(2)  # Ensure 2 digits
+        safe_name = lesson_match.group(2).lower().replace(' ', '-').replace('_', '-')
+        new_path = course_root / f"{unit_num}-{lesson_num}-{safe_name}.md"
+        operations.append({'kind': 'lesson', 'src': lesson_file, 'dst': new_path})
+
+        # Images from the lesson folder go to the global folder
+        lesson_images_dir = lesson_file.parent / "images"
+        if lesson_images_dir.exists():
+            images.extend((img_file, img_file.name) for img_file in sorted(lesson_images_dir.rglob("*.png")))
+
+    collisions = []
+    for img_file, name, status, existing in index.check_batch(images):
+        target_path = index.location(name)
+        if status == DUPLICATE:
+            collisions.append((img_file, target_path, "another lesson's image has the same name"))
+        elif status == CONFLICT:
+            collisions.append((img_file, target_path, f"images/{existing} already exists with different content"))
+        else:
+            operations.append({'kind': 'image', 'src': img_file, 'dst': target_path})
+    return operations, collisions
+
+
+def move_file(src, dst):
+    """
+    Move a file, renaming when source and destination share a file system.
+
+    Returns:
+        bool: True if the file was renamed, False if it was copied and removed
+    """
+    try:
+        os.rename(src, dst)
+        return True
+    except OSError:
+        pass
+    # Different file system: copy next to the target, verify, then swap in
+    temp_path = dst.with_name(dst.name + ".migrate.tmp")
+    shutil.copy2(src, temp_path)
+    if hash_file(temp_path) != hash_file(src):
+        temp_path.unlink()
+        raise OSError(f"Copy of {src} does not match the source")
+    os.replace(temp_path, dst)
+    os.unlink(src)
+    return False
+
+
+def run_operation(operation, checkpoint, limiter, index, metrics):
+    """
+    Execute one planned operation, recording it (with the source hash) first.
+
+    Destinations are only ever created complete (rename or temp file + replace),
+    so an existing destination of a recorded operation means it finished - as
+    long as the source is gone or still has the recorded content. A source that
+    changed since is a new file and goes through the usual collision check.
+
+    Returns:
+        str: 'done', 'resumed' or 'skipped'
+    """
+    src, dst = operation['src'], operation['dst']
+    key = str(dst)
+
+    if key in checkpoint.done and dst.exists():
+        if not src.exists():
+            return 'resumed'
+        if hash_file(src) == checkpoint.done[key]['sha256']:
+            if operation['kind'] == 'image':
+                os.unlink(src)  # Interrupted after copying across file systems
+            return 'resumed'
+
+    limiter.wait()
+    src_hash = hash_file(src)
+    size = src.stat().st_size
+
+    if dst.exists() and hash_file(dst) != src_hash:
+        print(f"    ⚠️  {dst.name} already exists with different content - skipped")
+        metrics.count("collisions")
+        return 'skipped'
+
+    checkpoint.record({'kind': operation['kind'], 'src': str(src), 'dst': key, 'sha256': src_hash, 'size': size})
+
+    if dst.exists():
+        # Identical content is already in place
+        if operation['kind'] == 'image':
+            os.unlink(src)
+            index.add(dst.name)
+    elif operation['kind'] == 'lesson':
+        with metrics.phase("copy_lessons"):
+            temp_path = dst.with_name(dst.name + ".migrate.tmp")
+            shutil.copy2(src, temp_path)
+            os.replace(temp_path, dst)
+        metrics.count("bytes_copied", size)
+    else:
+        with metrics.phase("move_images"):
+            dst.parent.mkdir(exist_ok=True)
+            renamed = move_file(src, dst)
+        if renamed:
+            metrics.count("images_renamed")
+        else:
+            metrics.count("bytes_copied", size)
+        index.add(dst.name)
+        metrics.count("images_moved")
+    return 'done'
+
+
+def verify(checkpoint, metrics):
+    """
+    Compare the recorded source hashes with the destination files.
+
+    Returns:
+        list: (dst, problem) for every mismatch
+    """
+    problems = []
+    with metrics.phase("verify"):
+        for key, entry in sorted(checkpoint.done.items()):
+            dst = Path(key)
+            if not dst.exists():
+                problems.append((key, "missing"))
+            elif hash_file(dst) != entry['sha256']:
+                problems.append((key, "content differs from source"))
+            elif entry['kind'] == 'lesson' and Path(entry['src']).exists() and hash_file(entry['src']) != entry['sha256']:
+                problems.append((key, "source changed after migration"))
+    metrics.count("files_verified", len(checkpoint.done))
+    return problems
+
+
+def migrate(metrics, workers=4, rate=0, restart=False, dry_run=False, verify_only=False):
+    """Migrate nested lesson folders in the current directory to the flat layout."""
+    course_root = Path(".")
+    print("=" * 60)
+    print("MIGRATING TO ULTRA-FLAT STRUCTURE")
+    print("=" * 60)
+
+    checkpoint = Checkpoint(course_root / CHECKPOINT_FILE)
+    if verify_only and not checkpoint.done:
+        checkpoint = Checkpoint(course_root / VERIFIED_FILE)  # The last completed migration
+    index = ImageIndex(course_root)
+    if restart and not dry_run:
+        checkpoint.discard()
+        print("🔄 Discarded checkpoint - starting over")
+
+    if not verify_only:
+        with metrics.phase("plan"):
+            operations, collisions = plan_migration(course_root, index, metrics)
+        images = sum(1 for op in operations if op['kind'] == 'image')
+        print(f"Plan: {len(operations) - images} lessons, {images} images "
+              f"({len(checkpoint.done)} operations already done)")
+        for src, dst, reason in collisions:
+            print(f"  ⚠️  Name collision: {src} → images/{dst.name}: {reason} - skipped")
+        metrics.count("collisions", len(collisions))
+
+        if dry_run:
+            for op in operations:
+                state = "done" if str(op['dst']) in checkpoint.done else "pending"
+                print(f"  [DRY RUN] {op['kind']:<6} {op['src']} → {op['dst']} ({state})")
+            return 0
+
+        # Create global images directory
+        global_images = course_root / "images"
+        global_images.mkdir(exist_ok=True)
+
+        limiter = RateLimiter(rate)
+        counts = {'done': 0, 'resumed': 0, 'skipped': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(run_operation, op, checkpoint, limiter, index, metrics): op
+                       for op in operations}
+            for future in as_completed(futures):
+                op = futures[future]
+                try:
+                    counts[future.result()] += 1
+                except Exception as e:
+                    counts['failed'] += 1
+                    print(f"  ❌ Failed: {op['src']} → {op['dst']}: {e}")
+        index.save()
+        print("\n" + ", ".join(f"{name}: {value}" for name, value in counts.items()))
+        if counts['failed']:
+            print("❌ Some operations failed - fix the cause and run again to resume")
+            return 1
+
+    print("\n🔍 Verifying migrated files...")
+    problems = verify(checkpoint, metrics)
+    for key, problem in problems:
+        print(f"  ❌ {key}: {problem}")
+    if problems:
+        print(f"❌ Verification failed for {len(problems)} of {len(checkpoint.done)} files")
+        return 1
+    print(f"✅ Verified {len(checkpoint.done)} files against their source hashes")
+    if not verify_only:
+        checkpoint.set_aside(course_root / VERIFIED_FILE)
+
     print(f"\n✅ Migration complete!")
     print(f"\nNew structure:")
-    print(f"  images/           ← All images here") 
+    print(f"  images/           ← All images here")
     print(f"  01-01-*.md        ← All lessons here")
     print(f"  04-01-*.md")
     print(f"  07-03-*.md")
     print(f"\nYou can now delete the old unit directories if everything looks good!")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Migrate nested lesson folders to the flat layout (resumable)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python migrate-to-flat.py                  # Migrate (resumes automatically)
+  python migrate-to-flat.py --workers 8      # More parallel workers
+  python migrate-to-flat.py --rate 200       # At most 200 operations per second
+  python migrate-to-flat.py --verify-only    # Only verify a finished migration
+        """
+    )
+    parser.add_argument('--workers', type=int, default=4, help='Parallel copy/move workers (default: 4)')
+    parser.add_argument('--rate', type=float, default=0, help='Maximum operations per second (default: unlimited)')
+    parser.add_argument('--restart', action='store_true', help='Discard the checkpoint and start over')
+    parser.add_argument('--verify-only', action='store_true', help='Only verify migrated files against the checkpoint')
+    parser.add_argument('--dry-run', action='store_true', help='Show the plan without modifying files')
+    add_instrumentation_arguments(parser)
+    add_lock_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        lock = CourseLock([] if args.dry_run else [COURSE_SCOPE], "migrate_to_flat",
+                          timeout=args.lock_timeout).acquire()
+    except LockError as e:
+        print(f"❌ Cannot migrate while another operation is running: {e}")
+        return 1
+    metrics = Instrumentation.from_args("migrate_to_flat", args)
+    try:
+        with metrics.session():
+            result = migrate(metrics, args.workers, args.rate, args.restart, args.dry_run, args.verify_only)
+            metrics.set_status("success" if result == 0 else "failed")
+    finally:
+        lock.release()
+    return result
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
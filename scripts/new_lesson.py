@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+New Lesson Scaffolding
+
+Adds a lesson in one step: makes room at its position (renumber_lessons.py's
+insertion, limited to the lesson's unit), writes a lesson file that already
+has every section of the design specification, registers it in the lesson
+index and updates the outline in README.md and ASSETS_NEEDED.md. The new file
+passes lesson_compliance.py as it is, so no rewrite pass is needed later.
+
+The lesson template is compiled from REQUIRED_SECTIONS / OPTIONAL_SECTIONS
+and the section descriptions of Lesson-Design-Specification.md (section 4),
+which become the placeholder text of each section. The compiled template is
+cached in .course_cache/lesson_template.json and only recompiled when the
+specification file or the section lists change.
+
+If anything fails after lessons were renumbered, the unit is restored from
+the renumbering snapshot.
+
+Usage:
+    python new_lesson.py <unit> "<title>" [--position N] [--with Quiz] [--dry-run]
+
+Examples:
+    python new_lesson.py 3 "Snowmelt Modeling" --position 4   # Insert as lesson 03-04
+    python new_lesson.py 3 "Snowmelt Modeling"                # Append to Unit 3
+    python new_lesson.py 3 "Snowmelt Modeling" --with Quiz --with "Next Steps"
+    python new_lesson.py --show-template                      # Print the compiled template
+"""
+
+import os
+import re
+import sys
+import json
+import string
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from automation_log import ToolLogStream
+from snapshots import SnapshotStore
+from course_model import CourseModel
+from course_locks import CourseLock, LockError, unit_scope, add_lock_arguments
+from lesson_parser import CACHE_DIR, LessonIndex
+from lesson_compliance import SPEC_PATH, REQUIRED_SECTIONS, OPTIONAL_SECTIONS, is_compliant
+from renumber_lessons import LessonRenumberingTool
+
+
+TEMPLATE_CACHE_FILE = "lesson_template.json"
+TEMPLATE_CACHE_VERSION = 1
+MAX_LESSON_NUMBER = 99
+
+# Section items of the specification: '1. **Lesson Title:** `# Lesson X: [Full Lesson Title]`'
+SPEC_ITEM_PATTERN = re.compile(r'^\d+\.\s+\*\*(.+?):\*\*\s*(.+)$')
+DEFAULT_GUIDANCE = "Add this section's content."
+OBJECTIVES_INTRO = "By the end of this lesson, students will be able to:"
+
+
+def lesson_slug(title):
+    """Filename part of a lesson title: 'Snowmelt & Ice Modeling' → 'snowmelt-ice-modeling'."""
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')
+
+
+def read_spec_guidance(spec_path):
+    """Return {section: description} from the numbered section items of the specification."""
+    guidance = {}
+    try:
+        with open(spec_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                match = SPEC_ITEM_PATTERN.match(line.strip())
+                if match and match.group(1) in REQUIRED_SECTIONS + OPTIONAL_SECTIONS:
+                    guidance.setdefault(match.group(1), match.group(2).strip())
+    except OSError:
+        pass
+    return guidance
+
+
+def compile_template(sections, guidance):
+    """
+    Build the template text of a lesson with the given sections.
+
+    Returns:
+        str: string.Template source with $number and $title placeholders
+    """
+    parts = ["# Lesson $number: $title\n"]
+    for section in sections:
+        if section == 'Lesson Title':
+            continue
+        text = guidance.get(section, DEFAULT_GUIDANCE).replace('$', '$$')
+        body = f"*{text}*\n"
+        if section == 'Learning Objectives':
+            body = f"{OBJECTIVES_INTRO}\n\n- **Verb** ...\n\n{body}"
+        parts.append(f"## {section}\n\n{body}")
+    return "\n".join(parts)
+
+
+class TemplateCache:
+    def __init__(self, course_path=None, spec_path=SPEC_PATH):
+        """
+        Compiled lesson templates, cached until the specification changes.
+
+        Args:
+            course_path (str, optional): Course root holding the cache (default: current directory)
+            spec_path (str): Design specification, relative to the course root
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.spec_path = self.course_path / spec_path
+        self.cache_path = self.course_path / CACHE_DIR / TEMPLATE_CACHE_FILE
+        self.compiled = 0
+
+    def _spec_key(self):
+        try:
+            stat = self.spec_path.stat()
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load(self, spec_key):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != TEMPLATE_CACHE_VERSION or data.get('spec') != spec_key:
+            return {}
+        return data.get('templates', {})
+
+    def _save(self, spec_key, templates):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': TEMPLATE_CACHE_VERSION, 'spec': spec_key, 'templates': templates}, f, indent=1)
+        os.replace(temp_path, self.cache_path)
+
+    def get(self, sections):
+        """Return the compiled template (string.Template) for a list of sections."""
+        spec_key = self._spec_key()
+        templates = self._load(spec_key)
+        key = "|".join(sections)
+        if key not in templates:
+            templates[key] = compile_template(sections, read_spec_guidance(self.spec_path))
+            self.compiled += 1
+            try:
+                self._save(spec_key, templates)
+            except OSError:
+                pass  # An unwritable cache only costs a recompile next time
+        return string.Template(templates[key])
+
+
+def lesson_sections(optional=()):
+    """Required sections, then the chosen optional ones in specification order."""
+    return list(REQUIRED_SECTIONS) + [section for section in OPTIONAL_SECTIONS if section in optional]
+
+
+class NewLessonTool:
+    def __init__(self, unit, title, position=None, optional=(), dry_run=False, update_outline=True,
+                 metrics=None, lock_timeout=None):
+        """
+        Initialize the new lesson tool.
+
+        Args:
+            unit (int): Unit of the new lesson
+            title (str): Lesson title (the filename slug is derived from it)
+            position (int, optional): Lesson number; default appends to the unit
+            optional (iterable): Optional sections to include (see OPTIONAL_SECTIONS)
+            dry_run (bool): Preview only
+            update_outline (bool): Update README.md and ASSETS_NEEDED.md afterwards
+            metrics (Instrumentation, optional): Instrumentation for this run
+            lock_timeout (float, optional): Seconds to wait for the unit lock
+        """
+        self.unit = unit
+        self.title = title.strip()
+        self.position = position
+        self.sections = lesson_sections(optional)
+        self.dry_run = dry_run
+        self.update_outline = update_outline
+        self.current_dir = Path.cwd()
+        self.errors = []
+        self.metrics = metrics or Instrumentation("new_lesson")
+        self.log_stream = ToolLogStream("new_lesson")
+        self.lock_timeout = lock_timeout
+        self.lock = None
+        self.renumber_tool = None
+        self.lesson_path = None
+
+    def log(self, message, level="INFO"):
+        """Log a message with timestamp and level."""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.log_stream.emit(level, message)
+        print(f"[{timestamp}] {level}: {message}")
+
+    def error(self, message):
+        """Log an error message."""
+        self.log(message, "ERROR")
+        self.errors.append(message)
+
+    def plan(self, model):
+        """Check the title and position against the course. Returns the new filename, or None."""
+        slug = lesson_slug(self.title)
+        if not slug:
+            self.error(f"Title '{self.title}' has no letters or digits for a filename")
+            return None
+        for lesson in model.lessons:
+            if lesson['filename'][6:-3] == slug:
+                self.error(f"DUPLICATE: {lesson['filename']} already has the title '{self.title}'")
+                return None
+
+        numbers = [lesson['lesson_number'] for lesson in model.lessons_by_unit().get(self.unit, [])]
+        last = max(numbers, default=0)
+        if self.position is None:
+            self.position = last + 1
+        if self.position > last + 1:
+            self.error(f"Unit {self.unit:02d} ends at lesson {last:02d}: position {self.position:02d} "
+                       f"would leave a gap (use {last + 1:02d} or lower)")
+            return None
+        if last >= MAX_LESSON_NUMBER and self.position <= last:
+            self.error(f"Unit {self.unit:02d} already has lesson {MAX_LESSON_NUMBER}; no room to insert")
+            return None
+        if self.position > MAX_LESSON_NUMBER:
+            self.error(f"Unit {self.unit:02d} is full (lesson {MAX_LESSON_NUMBER} is the last)")
+            return None
+        return f"{self.unit:02d}-{self.position:02d}-{slug}.md"
+
+    def render(self):
+        """Return the content of the new lesson."""
+        with self.metrics.phase("template"):
+            cache = TemplateCache(self.current_dir)
+            content = cache.get(self.sections).substitute(number=self.position, title=self.title)
+        self.metrics.count("templates_compiled", cache.compiled)
+        return content
+
+    def make_room(self):
+        """Shift the unit's lessons at and after the position. Returns success."""
+        self.renumber_tool = LessonRenumberingTool(
+            self.position, dry_run=self.dry_run, metrics=Instrumentation("renumber_lessons", metrics_file=''),
+            lock_timeout=self.lock_timeout, unit=self.unit)
+        with self.metrics.phase("renumber"):
+            success = self.renumber_tool.run()
+        self.metrics.count("lessons_shifted", self.renumber_tool.metrics.counters.get("renames", 0))
+        if not success:
+            self.error("Renumbering failed; the new lesson was not created")
+        return success
+
+    def restore(self):
+        """Undo the renumbering after a later step failed."""
+        snapshot_id = self.renumber_tool.snapshot_id if self.renumber_tool else None
+        if not snapshot_id:
+            return
+        self.log(f"Restoring Unit {self.unit:02d} from snapshot {snapshot_id}")
+        try:
+            with self.metrics.phase("rollback"):
+                SnapshotStore(self.current_dir).restore(snapshot_id, log=self.log, units=[self.unit])
+        except OSError as e:
+            self.error(f"Snapshot restore failed: {e}")
+
+    def write_lesson(self, content):
+        """Create the lesson file (never overwriting) and register it in the lesson index."""
+        with self.metrics.phase("write"):
+            with open(self.lesson_path, 'x', encoding='utf-8') as f:
+                f.write(content)
+        with self.metrics.phase("index"):
+            index = LessonIndex(self.current_dir)
+            # Incremental: only the new lesson and the renamed ones are parsed
+            summary = index.all_lessons()[self.lesson_path.name]
+            index.save()
+        self.metrics.count("files_parsed", index.files_parsed)
+        if not is_compliant(summary, REQUIRED_SECTIONS):
+            self.log(f"Warning: {self.lesson_path.name} does not match the specification order", "WARNING")
+
+    def run(self):
+        """Create the lesson, timed and recorded by the instrumentation layer."""
+        with self.metrics.session():
+            try:
+                success = self._run_steps()
+            finally:
+                if self.lock is not None:
+                    self.lock.release()
+                    self.lock = None
+            self.metrics.set_status("success" if success else "failed")
+        self.log_stream.finish(success)
+        return success
+
+    def _run_steps(self):
+        """Run the new lesson steps."""
+        self.log("=" * 60)
+        self.log(f"NEW LESSON - UNIT {self.unit:02d}: {self.title}")
+        self.log("=" * 60)
+        if self.dry_run:
+            self.log("DRY RUN MODE - No files will be modified")
+        else:
+            try:
+                self.lock = CourseLock([unit_scope(self.unit)], "new_lesson", self.current_dir,
+                                       self.lock_timeout).acquire()
+            except LockError as e:
+                self.error(f"Cannot add a lesson while another operation is running: {e}")
+                return False
+
+        with self.metrics.phase("scan"):
+            model = CourseModel(self.current_dir).scan()
+            filename = self.plan(model)
+        if filename is None:
+            return False
+        self.lesson_path = self.current_dir / filename
+        self.log(f"New lesson: {filename}")
+        content = self.render()
+
+        shifts = any(lesson['lesson_number'] >= self.position
+                     for lesson in model.lessons_by_unit().get(self.unit, []))
+        if shifts and not self.make_room():
+            return False
+
+        if self.dry_run:
+            self.log(f"DRY RUN: Would create {filename}:")
+            print(content)
+            return True
+
+        try:
+            self.write_lesson(content)
+        except OSError as e:
+            self.error(f"Failed to create {filename}: {e}")
+            self.restore()
+            return False
+        self.log(f"✓ Created {filename} with sections: {', '.join(self.sections)}")
+
+        if self.update_outline:
+            from generate_course_outline import CourseOutlineGenerator
+
+            with self.metrics.phase("outline"):
+                generator = CourseOutlineGenerator(metrics=self.metrics, course_model=model.refresh())
+                if not (generator.update_readme() and generator.update_assets_needed()):
+                    self.log("Warning: Outline update failed; run generate_course_outline.py --update-readme",
+                             "WARNING")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Create a specification-compliant lesson, renumbering its unit to make room",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python new_lesson.py 3 "Snowmelt Modeling" --position 4   # Insert as lesson 03-04
+  python new_lesson.py 3 "Snowmelt Modeling"                # Append to Unit 3
+  python new_lesson.py 3 "Snowmelt Modeling" --with Quiz --dry-run
+  python new_lesson.py --show-template
+        """
+    )
+    parser.add_argument('unit', type=int, nargs='?', help='Unit of the new lesson (1-12)')
+    parser.add_argument('title', nargs='?', help='Lesson title')
+    parser.add_argument('--position', type=int, default=None,
+                        help='Lesson number of the new lesson (default: after the last lesson)')
+    parser.add_argument('--with', dest='optional', action='append', default=[], choices=OPTIONAL_SECTIONS,
+                        metavar='SECTION', help=f'Include an optional section ({", ".join(OPTIONAL_SECTIONS)})')
+    parser.add_argument('--dry-run', action='store_true', help='Preview changes without modifying files')
+    parser.add_argument('--no-outline', action='store_true', help='Do not update README.md and ASSETS_NEEDED.md')
+    parser.add_argument('--show-template', action='store_true', help='Print the compiled lesson template and exit')
+    add_instrumentation_arguments(parser)
+    add_lock_arguments(parser)
+    args = parser.parse_args()
+
+    if args.show_template:
+        print(TemplateCache().get(lesson_sections(args.optional)).template)
+        return 0
+    if args.unit is None or not args.title:
+        parser.error("the unit and title are required")
+    if not 1 <= args.unit <= 12:
+        print("ERROR: Invalid unit number: Unit number must be between 1 and 12")
+        return 1
+    if args.position is not None and not 1 <= args.position <= MAX_LESSON_NUMBER:
+        print(f"ERROR: --position must be between 1 and {MAX_LESSON_NUMBER}")
+        return 1
+
+    tool = NewLessonTool(args.unit, args.title, args.position, args.optional, args.dry_run,
+                         update_outline=not args.no_outline,
+                         metrics=Instrumentation.from_args("new_lesson", args), lock_timeout=args.lock_timeout)
+    return 0 if tool.run() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Web Image Optimization
+
+Python port of Optimize-Images-For-Web.ps1 for the flat course layout. Each
+PNG in images/ (including shard folders of a sharded layout) is resized to fit
+within the web bounds with ImageMagick and written flat to images/web/. Without
+ImageMagick the images are copied unchanged, like the PowerShell script's
+fallback. Conversions run in a small worker pool.
+
+Responsive renditions: besides the bounded copy (images/web/<name>.png), each
+image gets narrower PNG renditions (<stem>-480w.png, ...) and, where the local
+ImageMagick can write them, WebP and AVIF renditions at every width. Images are
+never upscaled. All renditions are recorded in images/web/renditions.json with
+their pixel sizes; RenditionManifest turns an entry into srcset/<picture>
+markup with width and height attributes for HTML output.
+
+The manifest also serves as the cache: an image is only re-encoded when its
+content hash or the rendition settings changed (the hash is only recomputed
+when the file's size or mtime changed). Entries of source images that were
+deleted or renamed are dropped and their rendition files deleted.
+
+Usage:
+    python optimize_images.py [--source DIR] [--dest DIR] [--max-width N] [--max-height N]
+                              [--widths 480,800] [--formats auto|none|webp,avif]
+
+Examples:
+    python optimize_images.py                          # images/ -> images/web/
+    python optimize_images.py --max-width 800 --dry-run
+    python optimize_images.py --formats none           # PNG renditions only
+    python optimize_images.py --html 02_03_Name.png    # Print the <picture> markup
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from html import escape
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from course_model import iter_image_files
+from snapshots import hash_file
+from image_headers import HeaderCache, image_dimensions
+
+
+DEFAULT_MAX_WIDTH = 1200
+DEFAULT_MAX_HEIGHT = 800
+DEFAULT_QUALITY = 85
+DEFAULT_WIDTHS = (480, 800)
+MODERN_FORMATS = ('avif', 'webp')
+FORMAT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png'}
+MANIFEST_FILE = "renditions.json"
+MANIFEST_VERSION = 1
+
+
+def find_imagemagick():
+    """Return the ImageMagick command prefix, or None if it is not installed."""
+    if shutil.which("magick"):
+        return ["magick", "convert"]
+    if os.name != 'nt' and shutil.which("convert"):
+        return ["convert"]
+    return None
+
+
+def writable_formats(magick):
+    """Return the modern formats ('avif', 'webp') the local ImageMagick can write."""
+    if not magick:
+        return []
+    try:
+        result = subprocess.run(magick[:1] + ["-list", "format"], capture_output=True, text=True)
+    except OSError:
+        return []
+    formats = set()
+    for line in result.stdout.splitlines():
+        # "     WEBP* WEBP      rw+   WebP Image Format (libwebp 1.2.4)"
+        match = re.match(r'^\s*(\w+)\*?\s+\S+\s+[r-]([w-])', line)
+        if match and match.group(2) == 'w':
+            formats.add(match.group(1).lower())
+    return [fmt for fmt in MODERN_FORMATS if fmt in formats]
+
+
+def fit(width, height, max_width, max_height):
+    """Return (width, height) scaled down to fit the bounds, keeping the aspect ratio."""
+    scale = min(1.0, max_width / width, max_height / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def plan_renditions(name, width, height, max_width=DEFAULT_MAX_WIDTH, max_height=DEFAULT_MAX_HEIGHT,
+                    widths=DEFAULT_WIDTHS, formats=()):
+    """
+    List the renditions of one image.
+
+    The first rendition is the bounded PNG under the source name; narrower
+    widths are only produced when they are smaller than it (no upscaling).
+
+    Returns:
+        list: {'file', 'width', 'height', 'format'} dicts
+    """
+    stem = Path(name).stem
+    main_width, main_height = fit(width, height, max_width, max_height)
+    sizes = [(main_width, main_height)]
+    for target in sorted(set(widths)):
+        if target < main_width:
+            sizes.append(fit(width, height, target, max_height))
+
+    renditions = [{'file': name, 'width': main_width, 'height': main_height, 'format': 'png'}]
+    for w, h in sizes[1:]:
+        renditions.append({'file': f"{stem}-{w}w.png", 'width': w, 'height': h, 'format': 'png'})
+    for fmt in formats:
+        for w, h in sizes:
+            renditions.append({'file': f"{stem}-{w}w.{fmt}", 'width': w, 'height': h, 'format': fmt})
+    return renditions
+
+
+def optimize_image(source, target, magick, max_width=DEFAULT_MAX_WIDTH,
+                   max_height=DEFAULT_MAX_HEIGHT, quality=DEFAULT_QUALITY):
+    """
+    Write a web-optimized copy of one image.
+
+    Args:
+        source (Path): Source PNG
+        target (Path): Destination path (the extension selects the output format)
+        magick (list): ImageMagick command prefix, or None to copy unchanged
+        max_width (int): Maximum output width
+        max_height (int): Maximum output height
+        quality (int): Output quality
+
+    Returns:
+        str: 'optimized', 'copied' or 'fallback'
+
+    Raises:
+        subprocess.SubprocessError: If a non-PNG rendition cannot be encoded
+    """
+    if magick:
+        result = subprocess.run(
+            magick + [str(source), "-resize", f"{max_width}x{max_height}>",
+                      "-quality", str(quality), str(target)],
+            capture_output=True)
+        if result.returncode == 0:
+            return 'optimized'
+        if target.suffix.lower() != '.png':
+            raise subprocess.SubprocessError(result.stderr.decode(errors='replace').strip()
+                                             or f"ImageMagick could not write {target.name}")
+        shutil.copy2(source, target)
+        return 'fallback'
+
+    shutil.copy2(source, target)
+    return 'copied'
+
+
+class RenditionManifest:
+    def __init__(self, dest_dir):
+        """
+        Load the rendition manifest of a web image directory.
+
+        Args:
+            dest_dir (Path): Web output directory (holds renditions.json)
+        """
+        self.dest_dir = Path(dest_dir)
+        self.path = self.dest_dir / MANIFEST_FILE
+        self.images = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.images = data['images']
+        except (OSError, ValueError, KeyError):
+            self.images = {}
+
+    def save(self):
+        """Write the manifest back to disk."""
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.dest_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'images': self.images}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def srcset(self, name, fmt='png', base_url='images/web/'):
+        """Return the srcset value for one format of an image ('' if it has no such renditions)."""
+        renditions = sorted((r for r in self.images.get(name, {}).get('renditions', [])
+                             if r['format'] == fmt and r['width']),
+                            key=lambda r: r['width'])
+        return ", ".join(f"{base_url}{r['file']} {r['width']}w" for r in renditions)
+
+    def picture_html(self, name, alt='', base_url='images/web/'):
+        """
+        Return <picture> markup for an image: AVIF/WebP sources, then the PNG <img>.
+
+        Images without renditions fall back to a plain <img> of the original.
+        """
+        entry = self.images.get(name)
+        if not entry or not entry['renditions'][0]['width']:
+            return f'<img src="images/{escape(name)}" alt="{escape(alt)}" loading="lazy">'
+        main = entry['renditions'][0]
+        sizes = f"(max-width: {main['width']}px) 100vw, {main['width']}px"
+        lines = ["<picture>"]
+        for fmt in MODERN_FORMATS:
+            srcset = self.srcset(name, fmt, base_url)
+            if srcset:
+                lines.append(f'  <source type="{FORMAT_TYPES[fmt]}" srcset="{escape(srcset)}" sizes="{sizes}">')
+        lines.append(f'  <img src="{escape(base_url + main["file"])}" '
+                     f'srcset="{escape(self.srcset(name, "png", base_url))}" sizes="{sizes}" '
+                     f'width="{main["width"]}" height="{main["height"]}" '
+                     f'alt="{escape(alt)}" loading="lazy" decoding="async">')
+        lines.append("</picture>")
+        return "\n".join(lines)
+
+
+def optimize_images(sources, dest_dir, max_width=DEFAULT_MAX_WIDTH, max_height=DEFAULT_MAX_HEIGHT,
+                    quality=DEFAULT_QUALITY, workers=4, dry_run=False, metrics=None,
+                    widths=DEFAULT_WIDTHS, formats=None, headers=None, all_sources=None):
+    """
+    Optimize a set of images into a web directory, with responsive renditions.
+
+    Args:
+        sources (list): Source image paths
+        dest_dir (Path): Output directory
+        max_width (int): Maximum output width
+        max_height (int): Maximum output height
+        quality (int): Output quality
+        workers (int): Number of concurrent conversions
+        dry_run (bool): Only report what would be done
+        metrics (Instrumentation, optional): Shared instrumentation
+        widths (iterable): Narrower rendition widths (only those below the bounded width are used)
+        formats (list, optional): Modern formats to add (default: whatever ImageMagick can write)
+        headers (HeaderCache, optional): Cached image headers (default: the current course's cache)
+        all_sources (list, optional): Every current source image, when `sources` is only the changed
+                                      ones; renditions of images not in it are deleted (default: sources)
+
+    Returns:
+        dict: Counts per outcome ('optimized', 'copied', 'fallback', 'skipped', 'failed'),
+              and 'removed' for images whose source is gone
+    """
+    metrics = metrics or Instrumentation("optimize_images")
+    dest_dir = Path(dest_dir)
+    magick = find_imagemagick()
+    if not magick:
+        widths, formats = (), []
+    elif formats is None:
+        formats = writable_formats(magick)
+    settings = (f"{max_width}x{max_height} q{quality} widths={','.join(map(str, sorted(widths)))} "
+                f"formats={','.join(formats)} {'magick' if magick else 'copy'}")
+    manifest = RenditionManifest(dest_dir)
+    headers = headers or HeaderCache()
+    counts = {'optimized': 0, 'copied': 0, 'fallback': 0, 'skipped': 0, 'failed': 0, 'removed': 0}
+
+    pending = []
+    with metrics.phase("check_renditions"):
+        for source in sources:
+            source = Path(source)
+            stat = source.stat()
+            entry = manifest.images.get(source.name)
+            known = (entry and entry['source']['size'] == stat.st_size
+                     and entry['source']['mtime_ns'] == stat.st_mtime_ns)
+            sha256 = entry['source']['sha256'] if known else hash_file(source)
+            if (entry and entry['source']['sha256'] == sha256 and entry['settings'] == settings
+                    and all((dest_dir / r['file']).exists() for r in entry['renditions'])):
+                entry['source'].update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                counts['skipped'] += 1
+                continue
+            header = headers.get(source, stat)
+            width, height = (header.width, header.height) if header and header.format == 'png' else (None, None)
+            if width is None:
+                renditions = [{'file': source.name, 'width': None, 'height': None, 'format': 'png'}]
+            else:
+                renditions = plan_renditions(source.name, width, height, max_width, max_height, widths, formats)
+            pending.append((source, {
+                'source': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256},
+                'settings': settings, 'width': width, 'height': height, 'renditions': renditions}))
+    headers.save()
+
+    # Sources deleted or renamed since the last run
+    current = {Path(source).name for source in (sources if all_sources is None else all_sources)}
+    removed = sorted(set(manifest.images) - current)
+
+    if dry_run:
+        for source, entry in pending:
+            print(f"  [DRY RUN] Would optimize: {source.name} ({len(entry['renditions'])} renditions)")
+        for name in removed:
+            print(f"  [DRY RUN] Would remove the renditions of {name} (source removed)")
+        counts['removed'] = len(removed)
+        return counts
+
+    if removed:
+        in_use = {r['file'] for name, entry in manifest.images.items() if name not in removed
+                  for r in entry['renditions']}
+        in_use.update(r['file'] for _, entry in pending for r in entry['renditions'])
+        for name in removed:
+            files = [r['file'] for r in manifest.images.pop(name)['renditions']]
+            for file in files:
+                if file not in in_use:
+                    (dest_dir / file).unlink(missing_ok=True)
+            print(f"  ✗ {name} (source removed, {len(files)} renditions deleted)")
+        counts['removed'] = len(removed)
+
+    if pending:
+        dest_dir.mkdir(parents=True, exist_ok=True)
+
+    def work(item):
+        source, rendition = item
+        target = dest_dir / rendition['file']
+        try:
+            outcome = optimize_image(source, target, magick, rendition['width'] or max_width,
+                                     rendition['height'] or max_height, quality)
+            rendition['bytes'] = target.stat().st_size
+            if rendition['format'] == 'png':
+                # Exact size of what was written (copies and fallbacks keep the source size)
+                rendition['width'], rendition['height'] = image_dimensions(target)
+            return outcome, None
+        except (OSError, subprocess.SubprocessError) as e:
+            return 'failed', e
+
+    jobs = [(source, rendition) for source, entry in pending for rendition in entry['renditions']]
+    with metrics.phase("optimize_images"):
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(pool.map(work, jobs))
+
+    # One outcome per image: that of its bounded PNG, or 'failed' if any rendition failed
+    outcomes = {}
+    for (source, rendition), (outcome, error) in zip(jobs, results):
+        if error:
+            print(f"  ⚠ Failed to process {source.name} → {rendition['file']}: {error}")
+            outcomes[source.name] = 'failed'
+        else:
+            outcomes.setdefault(source.name, outcome)
+
+    for source, entry in pending:
+        outcome = outcomes[source.name]
+        counts[outcome] += 1
+        if outcome == 'failed':
+            manifest.images.pop(source.name, None)
+            continue
+        # Remove renditions the previous settings produced but the new ones do not
+        old_files = {r['file'] for r in manifest.images.get(source.name, {}).get('renditions', [])}
+        for stale in old_files - {r['file'] for r in entry['renditions']}:
+            (dest_dir / stale).unlink(missing_ok=True)
+        manifest.images[source.name] = entry
+
+        size = entry['source']['size']
+        note = ""
+        if outcome == 'optimized':
+            note = f", {(size - entry['renditions'][0]['bytes']) * 100 // max(1, size)}% size reduction"
+        print(f"  ✓ {source.name} ({outcome}, {len(entry['renditions'])} renditions{note})")
+
+    if pending or counts['skipped'] or removed:
+        manifest.save()
+    metrics.count("images_optimized", counts['optimized'] + counts['copied'] + counts['fallback'])
+    metrics.count("renditions_written", sum(1 for _, error in results if not error))
+    metrics.count("images_skipped", counts['skipped'])
+    metrics.count("images_removed", counts['removed'])
+    return counts
+
+
+def parse_formats(value):
+    """Parse --formats: 'auto' (None), 'none' ([]) or a comma-separated list."""
+    if value == 'auto':
+        return None
+    if value == 'none':
+        return []
+    formats = [fmt.strip().lower() for fmt in value.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in MODERN_FORMATS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unsupported format(s): {', '.join(unknown)}")
+    return formats
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Optimize course images for web deployment")
+    parser.add_argument('--source', type=str, default='images', help='Source image directory (default: images)')
+    parser.add_argument('--dest', type=str, default=None, help='Output directory (default: <source>/web)')
+    parser.add_argument('--max-width', type=int, default=DEFAULT_MAX_WIDTH)
+    parser.add_argument('--max-height', type=int, default=DEFAULT_MAX_HEIGHT)
+    parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY)
+    parser.add_argument('--widths', type=lambda value: tuple(int(w) for w in value.split(',') if w),
+                        default=DEFAULT_WIDTHS,
+                        help=f"Narrower rendition widths (default: {','.join(map(str, DEFAULT_WIDTHS))})")
+    parser.add_argument('--formats', type=parse_formats, default=None,
+                        help="Modern formats: 'auto' (what ImageMagick can write, default), 'none', "
+                             "or a list such as 'webp,avif'")
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent conversions (default: 4)')
+    parser.add_argument('--dry-run', action='store_true', help='Preview without writing files')
+    parser.add_argument('--html', metavar='NAME', help='Print the <picture> markup for an optimized image and exit')
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+
+    source_dir = Path(args.source)
+    dest_dir = Path(args.dest) if args.dest else source_dir / "web"
+    if args.html:
+        print(RenditionManifest(dest_dir).picture_html(args.html, base_url=f"{dest_dir.as_posix()}/"))
+        return 0
+    if not source_dir.is_dir():
+        print(f"ERROR: Source directory not found: {source_dir}")
+        return 1
+
+    metrics = Instrumentation.from_args("optimize_images", args)
+    with metrics.session():
+        sources = sorted(entry.path for _, entry in iter_image_files(source_dir))
+        metrics.count("files_scanned", len(sources))
+        print(f"Optimizing {len(sources)} images: {source_dir} -> {dest_dir}")
+        if not find_imagemagick():
+            print("WARNING: ImageMagick not found. Images will be copied without optimization.")
+        counts = optimize_images(sources, dest_dir, args.max_width, args.max_height, args.quality,
+                                 args.workers, args.dry_run, metrics, args.widths, args.formats)
+
+    print(", ".join(f"{name}: {value}" for name, value in counts.items()))
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
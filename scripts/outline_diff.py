@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Outline Diff and Change-Impact Report
+
+Compares two states of a course - the working tree, a git revision, or an
+outline model saved as JSON - and reports what a reviewer needs to check
+instead of re-reading the whole regenerated outline:
+
+    added / removed lessons
+    moved lessons      - same lesson, new UU-LL position
+    renamed lessons    - same position (or moved too), new title slug
+    image references   - images added to or dropped from a changed lesson
+    stale image names  - images/UU_LL_*.png whose lesson position no longer exists
+    broken links       - links to lesson files that no longer exist, with the new name if known
+
+Lessons are matched by filename, then by content hash, then by title slug,
+each through a dict lookup, so the diff is linear in the number of lessons.
+
+Usage (inside a tool):
+    old = load_outline_model("HEAD~1")           # git revision, or a saved .json model
+    new = OutlineModel.from_course()
+    print(format_report(diff_outlines(old, new)))
+"""
+
+import os
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+
+from course_model import LESSON_FILENAME_PATTERN, iter_image_files
+from lesson_parser import LessonIndex, LessonSummary
+from git_changes import GitChangeError, _git
+from image_index import image_owner
+
+
+MODEL_VERSION = 1
+LINK_SCHEMES = ('http:', 'https:', 'mailto:', '#')
+
+
+def _lesson_record(summary):
+    """Reduce a LessonSummary to what the outline diff compares."""
+    # A target's first word is the path ('images/x.png "title"'); whitespace-only targets have none
+    images = sorted({target.split()[0] for _, _, target, in_code in summary.images
+                     if not in_code and target.strip()})
+    links = sorted({(line, target.split('#')[0]) for line, _, target, in_code in summary.links
+                    if not in_code and target.split('#')[0].endswith('.md')
+                    and not target.startswith(LINK_SCHEMES)})
+    return {'sha256': summary.sha256, 'title': summary.title, 'images': images,
+            'links': [list(link) for link in links]}
+
+
+def _slug(filename):
+    return LESSON_FILENAME_PATTERN.match(filename).group(3)
+
+
+def _position(filename):
+    match = LESSON_FILENAME_PATTERN.match(filename)
+    return int(match.group(1)), int(match.group(2))
+
+
+class OutlineModel:
+    def __init__(self, source, lessons=None, images=()):
+        """
+        The lessons and images of one course state.
+
+        Args:
+            source (str): Where the state came from (shown in reports)
+            lessons (dict): filename -> {'sha256', 'title', 'images', 'links'}
+            images (iterable): Image filenames in images/ (any layout)
+        """
+        self.source = source
+        self.lessons = lessons or {}
+        self.images = set(images)
+
+    @classmethod
+    def from_course(cls, course_path=None, lesson_index=None):
+        """Build the model of the working tree, reusing the cached lesson summaries."""
+        course_path = Path(course_path) if course_path else Path.cwd()
+        index = lesson_index or LessonIndex(course_path)
+        lessons = {}
+        with os.scandir(course_path) as entries:
+            for entry in entries:
+                if LESSON_FILENAME_PATTERN.match(entry.name) and entry.is_file():
+                    lessons[entry.name] = _lesson_record(index.get(entry.path))
+        if lesson_index is None:
+            index.save()
+        images_path = course_path / "images"
+        images = [entry.name for _, entry in iter_image_files(images_path)] if images_path.is_dir() else []
+        return cls("working tree", lessons, images)
+
+    @classmethod
+    def from_git(cls, revision, course_path=None):
+        """
+        Build the model of a git revision, reading all lesson blobs in one git process.
+
+        Raises:
+            GitChangeError: If git is unavailable or the revision is invalid
+        """
+        cwd = Path(course_path) if course_path else Path.cwd()
+        names, images = [], []
+        # Paths are relative to the course root (ls-tree lists relative to the cwd)
+        for path in _git(['ls-tree', '-r', '--name-only', '-z', revision], cwd).split('\0'):
+            parts = path.split('/')
+            if len(parts) == 1 and LESSON_FILENAME_PATTERN.match(path):
+                names.append(path)
+            elif parts[0] == 'images' and len(parts) in (2, 3) and path.lower().endswith('.png'):
+                images.append(parts[-1])
+
+        request = ''.join(f"{revision}:./{name}\n" for name in names).encode('utf-8')
+        try:
+            result = subprocess.run(['git', 'cat-file', '--batch'], cwd=str(cwd), input=request, capture_output=True)
+        except OSError as e:
+            raise GitChangeError(f"Could not run git: {e}")
+        if result.returncode != 0:
+            raise GitChangeError(result.stderr.decode(errors='replace').strip() or "git cat-file failed")
+
+        lessons, output, pos = {}, result.stdout, 0
+        for name in names:
+            header_end = output.index(b'\n', pos)
+            size = int(output[pos:header_end].split()[2])
+            content = output[header_end + 1:header_end + 1 + size]
+            pos = header_end + 1 + size + 1
+            text = content.decode('utf-8', errors='replace').replace('\r\n', '\n')
+            lessons[name] = _lesson_record(LessonSummary.parse_lines(text.splitlines(keepends=True), size=size))
+        return cls(f"git {revision}", lessons, images)
+
+    @classmethod
+    def from_json(cls, path):
+        """
+        Load a model saved with save().
+
+        Raises:
+            ValueError: If the file is not a saved outline model
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('version') != MODEL_VERSION:
+            raise ValueError(f"{path} is not an outline model (version {MODEL_VERSION})")
+        return cls(f"snapshot {Path(path).name}", data['lessons'], data['images'])
+
+    def save(self, path):
+        """Write the model as JSON, for a later diff."""
+        path = Path(path)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'version': MODEL_VERSION, 'lessons': self.lessons, 'images': sorted(self.images)},
+                      f, indent=1, sort_keys=True)
+        os.replace(temp_path, path)
+
+
+def load_outline_model(reference, course_path=None):
+    """
+    Load the model of a course state: a saved .json model if reference is such a file,
+    otherwise a git revision.
+
+    Raises:
+        GitChangeError, ValueError, OSError
+    """
+    if reference.lower().endswith('.json') and Path(reference).is_file():
+        return OutlineModel.from_json(reference)
+    return OutlineModel.from_git(reference, course_path)
+
+
+class OutlineDiff:
+    def __init__(self, old, new):
+        """
+        Differences between two outline models.
+
+        Attributes:
+            pairs: (old_filename, new_filename) for every lesson present in both states
+            added, removed: Lesson filenames
+            moved, renamed: (old_filename, new_filename) pairs (a lesson can be both)
+            modified: Lessons with the same filename and different content
+            image_changes: [(lesson, added_refs, removed_refs)] for changed lessons
+            stale_images: Images whose UU_LL position has no lesson any more
+            broken_links: [(lesson, line, target, new_target or None)] for links whose
+                          target existed in the old state
+        """
+        self.old, self.new = old, new
+        self.pairs = []
+        self.added, self.removed, self.modified = [], [], []
+        self.moved, self.renamed = [], []
+        self.image_changes, self.stale_images, self.broken_links = [], [], []
+
+    def is_empty(self):
+        """True if the two states have the same lessons with the same content."""
+        return not (self.added or self.removed or self.moved or self.renamed or self.modified
+                    or self.stale_images or self.broken_links)
+
+
+def diff_outlines(old, new):
+    """
+    Diff two outline models.
+
+    Args:
+        old (OutlineModel): Earlier state
+        new (OutlineModel): Later state
+
+    Returns:
+        OutlineDiff
+    """
+    diff = OutlineDiff(old, new)
+    pairs = [(name, name) for name in old.lessons if name in new.lessons]
+    unmatched_old = [name for name in old.lessons if name not in new.lessons]
+    unmatched_new = {name for name in new.lessons if name not in old.lessons}
+
+    # Same content under a new name, then same title slug under a new position
+    for key in (lambda model, name: model.lessons[name]['sha256'], lambda model, name: _slug(name)):
+        candidates = {}
+        for name in sorted(unmatched_new):
+            candidates.setdefault(key(new, name), []).append(name)
+        remaining = []
+        for name in unmatched_old:
+            matches = candidates.get(key(old, name))
+            if matches:
+                match = matches.pop(0)
+                unmatched_new.discard(match)
+                pairs.append((name, match))
+            else:
+                remaining.append(name)
+        unmatched_old = remaining
+
+    diff.pairs = pairs
+    diff.removed = sorted(unmatched_old)
+    diff.added = sorted(unmatched_new)
+    for old_name, new_name in pairs:
+        if _position(old_name) != _position(new_name):
+            diff.moved.append((old_name, new_name))
+        if _slug(old_name) != _slug(new_name):
+            diff.renamed.append((old_name, new_name))
+        old_lesson, new_lesson = old.lessons[old_name], new.lessons[new_name]
+        if old_name == new_name and old_lesson['sha256'] != new_lesson['sha256']:
+            diff.modified.append(new_name)
+        old_images, new_images = set(old_lesson['images']), set(new_lesson['images'])
+        if old_images != new_images:
+            diff.image_changes.append((new_name, sorted(new_images - old_images), sorted(old_images - new_images)))
+    for name in diff.added:
+        if new.lessons[name]['images']:
+            diff.image_changes.append((name, new.lessons[name]['images'], []))
+    diff.moved.sort()
+    diff.renamed.sort()
+    diff.image_changes.sort()
+
+    positions = {_position(name) for name in new.lessons}
+    old_positions = {_position(name) for name in old.lessons}
+    for image in sorted(new.images):
+        owner = image_owner(image)
+        if owner[0] is not None and owner not in positions and owner in old_positions:
+            diff.stale_images.append(image)
+
+    renames = {old_name: new_name for old_name, new_name in pairs if old_name != new_name}
+    for name in sorted(new.lessons):
+        for line, target in new.lessons[name]['links']:
+            filename = target.rsplit('/', 1)[-1]
+            if filename not in new.lessons and filename in old.lessons:
+                diff.broken_links.append((name, line, target, renames.get(filename)))
+    return diff
+
+
+def format_report(diff):
+    """Return the change-impact report of an outline diff as text."""
+    lines = [f"Outline changes: {diff.old.source} → {diff.new.source}"]
+    if diff.is_empty():
+        lines.append("  No lessons added, removed, moved, renamed or modified")
+        return "\n".join(lines)
+
+    def section(title, items):
+        if items:
+            lines.append(f"\n{title} ({len(items)}):")
+            lines.extend(f"  {item}" for item in items)
+
+    section("Added", [f"+ {name}" for name in diff.added])
+    section("Removed", [f"- {name}" for name in diff.removed])
+    section("Moved", [f"{old} → {new}" for old, new in diff.moved])
+    section("Renamed", [f"{old} → {new}" for old, new in diff.renamed])
+    section("Modified", diff.modified)
+    section("Image references", [
+        f"{lesson}: " + ", ".join([f"+{ref}" for ref in added] + [f"-{ref}" for ref in removed])
+        for lesson, added, removed in diff.image_changes])
+    section("Images named for a lesson position that no longer exists",
+            [f"images/{name}" for name in diff.stale_images])
+    section("Broken links", [
+        f"{lesson}:{line + 1} → {target}" + (f" (now {new_target})" if new_target else "")
+        for lesson, line, target, new_target in diff.broken_links])
+    return "\n".join(lines)
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+SCORM Package Builder
+
+Packages the course for an LMS: every lesson of the outline is rendered to
+HTML, and the lessons plus the images they reference (and nothing else) are
+written to a zip with a SCORM 1.2 imsmanifest.xml. Units become organization
+items, lessons become asset resources listing their images.
+
+Rebuilds are incremental. The sha256 of every entry is recorded in
+.course_cache/package.json; when the archive on disk is the one recorded, the
+compressed bytes of unchanged entries are copied from it as they are, so only
+new or changed lessons and images are compressed and written. Images are
+stored without recompression (PNG data is already compressed).
+
+Images that optimize_images.py has rendered into images/web/ are packaged as
+their responsive renditions: the lesson gets <picture> markup with srcset,
+width and height (RenditionManifest.picture_html), and the renditions are
+added to the archive and to the lesson's resource. Images without current
+renditions are packaged as the original.
+
+Lessons are rendered by a small built-in Markdown renderer (headings,
+paragraphs, lists, tables, block quotes, code, emphasis, links and images);
+links to other lessons point at their HTML pages.
+
+Usage:
+    python package_course.py                        # dist/<course>-scorm.zip
+    python package_course.py --output course.zip
+    python package_course.py --dry-run              # What would be reused or rewritten
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import struct
+import hashlib
+import zipfile
+import argparse
+import tempfile
+from html import escape, unescape
+from pathlib import Path
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from lesson_parser import CACHE_DIR
+from image_index import ImageIndex
+from optimize_images import RenditionManifest
+from generate_course_outline import CourseOutlineGenerator
+
+
+PACKAGE_CACHE_FILE = "package.json"
+PACKAGE_CACHE_VERSION = 1
+DEFAULT_OUTPUT_DIR = "dist"
+MANIFEST_NAME = "imsmanifest.xml"
+DATA_DESCRIPTOR_FLAG = 0x08
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+BULLET_PATTERN = re.compile(r'^\s*[-*+]\s+(.*)$')
+NUMBERED_PATTERN = re.compile(r'^\s*\d+[.)]\s+(.*)$')
+TABLE_SEPARATOR_PATTERN = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+RULE_PATTERN = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+CODE_SPAN_PATTERN = re.compile(r'`([^`]+)`')
+IMAGE_PATTERN = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)(?:\s+"[^"]*")?\)')
+LINK_PATTERN = re.compile(r'\[([^\]]*)\]\(([^)\s]+)(?:\s+"[^"]*")?\)')
+STRONG_PATTERN = re.compile(r'\*\*(.+?)\*\*|__(.+?)__')
+EMPHASIS_PATTERN = re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?!\*)|(?<![_\w])_(?!\s)(.+?)(?<!\s)_(?!\w)')
+LESSON_LINK_PATTERN = re.compile(r'^(?:\./)?(\d{2}-\d{2}-[^/#]+)\.md(#.*)?$')
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; line-height: 1.5; max-width: 960px; margin: 2em auto; padding: 0 1em; }}
+img {{ max-width: 100%; height: auto; }}
+table {{ border-collapse: collapse; }} th, td {{ border: 1px solid #ccc; padding: 0.3em 0.6em; }}
+pre {{ background: #f5f5f5; padding: 1em; overflow-x: auto; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+class LessonRenderer:
+    def __init__(self, rewrite, image=None):
+        """
+        Render lesson Markdown to HTML.
+
+        Args:
+            rewrite (callable): Maps a link or image target to its URL inside the package
+            image (callable, optional): Maps (image target, alt text) to the image's HTML,
+                                        or None for a plain <img> of rewrite(target)
+        """
+        self.rewrite = rewrite
+        self.image = image
+
+    def _image_html(self, target, alt):
+        html = self.image(target, alt) if self.image else None
+        if html is None:
+            html = f'<img src="{escape(self.rewrite(target))}" alt="{escape(alt)}">'
+        return html
+
+    def inline(self, text):
+        """Render the inline Markdown of one line or paragraph."""
+        parts = CODE_SPAN_PATTERN.split(text)
+        html = []
+        for i, part in enumerate(parts):
+            if i % 2:
+                html.append(f"<code>{escape(part)}</code>")
+                continue
+            part = escape(part, quote=False)
+            part = IMAGE_PATTERN.sub(lambda m: self._image_html(unescape(m.group(2)), unescape(m.group(1))), part)
+            part = LINK_PATTERN.sub(
+                lambda m: f'<a href="{escape(self.rewrite(unescape(m.group(2))))}">{m.group(1)}</a>', part)
+            part = STRONG_PATTERN.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", part)
+            part = EMPHASIS_PATTERN.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", part)
+            html.append(part)
+        return ''.join(html)
+
+    @staticmethod
+    def _cells(line):
+        return [cell.strip() for cell in line.strip().strip('|').split('|')]
+
+    def render(self, text):
+        """Render a whole lesson to the HTML of its <body>."""
+        lines = text.replace('\r\n', '\n').split('\n')
+        html, paragraph, i = [], [], 0
+
+        def flush():
+            if paragraph:
+                html.append(f"<p>{self.inline(' '.join(paragraph))}</p>")
+                paragraph.clear()
+
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+            if stripped.startswith(('```', '~~~')):
+                flush()
+                fence, code = stripped[:3], []
+                i += 1
+                while i < len(lines) and not lines[i].strip().startswith(fence):
+                    code.append(lines[i])
+                    i += 1
+                html.append(f"<pre><code>{escape(chr(10).join(code))}</code></pre>")
+            elif not stripped:
+                flush()
+            elif HEADING_PATTERN.match(stripped):
+                flush()
+                match = HEADING_PATTERN.match(stripped)
+                level = len(match.group(1))
+                html.append(f"<h{level}>{self.inline(match.group(2))}</h{level}>")
+            elif RULE_PATTERN.match(stripped):
+                flush()
+                html.append("<hr>")
+            elif stripped.startswith('|') and i + 1 < len(lines) and TABLE_SEPARATOR_PATTERN.match(lines[i + 1]):
+                flush()
+                rows = [f"<tr>{''.join(f'<th>{self.inline(cell)}</th>' for cell in self._cells(line))}</tr>"]
+                i += 2
+                while i < len(lines) and lines[i].strip().startswith('|'):
+                    rows.append(f"<tr>{''.join(f'<td>{self.inline(cell)}</td>' for cell in self._cells(lines[i]))}</tr>")
+                    i += 1
+                html.append("<table>\n" + "\n".join(rows) + "\n</table>")
+                continue
+            elif BULLET_PATTERN.match(line) or NUMBERED_PATTERN.match(line):
+                flush()
+                pattern, tag = (BULLET_PATTERN, 'ul') if BULLET_PATTERN.match(line) else (NUMBERED_PATTERN, 'ol')
+                items = []
+                while i < len(lines) and pattern.match(lines[i]):
+                    items.append(f"<li>{self.inline(pattern.match(lines[i]).group(1))}</li>")
+                    i += 1
+                html.append(f"<{tag}>\n" + "\n".join(items) + f"\n</{tag}>")
+                continue
+            elif stripped.startswith('>'):
+                flush()
+                quote = []
+                while i < len(lines) and lines[i].strip().startswith('>'):
+                    quote.append(lines[i].strip()[1:].strip())
+                    i += 1
+                html.append(f"<blockquote><p>{self.inline(' '.join(quote))}</p></blockquote>")
+                continue
+            else:
+                paragraph.append(stripped)
+            i += 1
+        flush()
+        return "\n".join(html)
+
+
+def _identifier(text):
+    return re.sub(r'[^A-Za-z0-9_]', '_', text)
+
+
+def build_manifest(title, units, resources):
+    """
+    Build a SCORM 1.2 imsmanifest.xml.
+
+    Args:
+        title (str): Course title
+        units (list): [(unit_title, [(lesson_id, lesson_title), ...]), ...]
+        resources (dict): lesson_id -> (href, [file hrefs])
+
+    Returns:
+        str: The manifest XML
+    """
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<manifest identifier="{_identifier(title)}" version="1.0"',
+             '          xmlns="http://www.imsproject.org/xsd/imscp_rootv1p1p2"',
+             '          xmlns:adlcp="http://www.adlnet.org/xsd/adlcp_rootv1p2">',
+             '  <metadata>', '    <schema>ADL SCORM</schema>', '    <schemaversion>1.2</schemaversion>', '  </metadata>',
+             '  <organizations default="ORG">', '    <organization identifier="ORG">',
+             f'      <title>{escape(title)}</title>']
+    for unit_index, (unit_title, lessons) in enumerate(units, 1):
+        lines.append(f'      <item identifier="UNIT_{unit_index}">')
+        lines.append(f'        <title>{escape(unit_title)}</title>')
+        for lesson_id, lesson_title in lessons:
+            lines.append(f'        <item identifier="ITEM_{lesson_id}" identifierref="RES_{lesson_id}">'
+                         f'<title>{escape(lesson_title)}</title></item>')
+        lines.append('      </item>')
+    lines += ['    </organization>', '  </organizations>', '  <resources>']
+    for lesson_id, (href, files) in resources.items():
+        lines.append(f'    <resource identifier="RES_{lesson_id}" type="webcontent" '
+                     f'adlcp:scormtype="asset" href="{escape(href)}">')
+        for file_href in [href] + files:
+            lines.append(f'      <file href="{escape(file_href)}"/>')
+        lines.append('    </resource>')
+    lines += ['  </resources>', '</manifest>', '']
+    return "\n".join(lines)
+
+
+def _load_recorded(cache_path, output):
+    """Return the recorded entry hashes of an archive, if the archive on disk is the recorded one."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        record = data['archives'][str(output.resolve())] if data.get('version') == PACKAGE_CACHE_VERSION else None
+        stat = output.stat()
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+    if not record or record['size'] != stat.st_size or record['mtime_ns'] != stat.st_mtime_ns:
+        return {}
+    return record['entries']
+
+
+def _save_recorded(cache_path, output, entries):
+    data = {'version': PACKAGE_CACHE_VERSION, 'archives': {}}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+        if loaded.get('version') == PACKAGE_CACHE_VERSION:
+            data = loaded
+    except (OSError, ValueError):
+        pass
+    stat = output.stat()
+    data['archives'][str(output.resolve())] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'entries': entries}
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temp_path, cache_path)
+
+
+def copy_compressed_entry(source_zip, info, target_zip):
+    """
+    Copy one entry from an open archive into an archive being written, without
+    decompressing or recompressing it.
+
+    The entry's local header is rewritten at the target's current end; zipfile
+    writes the central directory from target_zip.filelist when it is closed.
+    """
+    fp = source_zip.fp
+    fp.seek(info.header_offset)
+    header = fp.read(30)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    fp.seek(info.header_offset + 30 + name_length + extra_length)
+
+    copied = zipfile.ZipInfo(info.filename, info.date_time)
+    copied.compress_type = info.compress_type
+    copied.CRC, copied.compress_size, copied.file_size = info.CRC, info.compress_size, info.file_size
+    copied.external_attr = info.external_attr
+    copied.flag_bits = info.flag_bits & ~DATA_DESCRIPTOR_FLAG
+
+    out = target_zip.fp
+    out.seek(target_zip.start_dir)
+    copied.header_offset = out.tell()
+    out.write(copied.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = fp.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated entry in source archive: {info.filename}")
+        out.write(chunk)
+        remaining -= len(chunk)
+    target_zip.filelist.append(copied)
+    target_zip.NameToInfo[copied.filename] = copied
+    target_zip.start_dir = out.tell()
+
+
+def collect_package(course_path, metrics=None, log=print):
+    """
+    Render the lessons of the outline and resolve the images they reference.
+
+    Returns:
+        tuple: (title, entries, manifest) where entries maps archive names to
+               {'sha256', 'data' (bytes) or 'path' (Path), 'compress'}
+    """
+    metrics = metrics or Instrumentation("package_course")
+    generator = CourseOutlineGenerator(course_path, metrics=metrics)
+    generator.scan_flat_structure()
+    images = ImageIndex(course_path)
+    renditions = RenditionManifest(Path(course_path) / "images" / "web")
+    entries, units, resources, missing = {}, [], {}, set()
+
+    def current_renditions(name, sha256):
+        """The manifest entry of an image, if its renditions exist and were made from this content."""
+        entry = renditions.images.get(name)
+        if (not entry or entry['source']['sha256'] != sha256 or not entry['renditions'][0]['width']
+                or not all((renditions.dest_dir / r['file']).exists() for r in entry['renditions'])):
+            return None
+        return entry
+
+    for unit_number in sorted(generator.units):
+        unit_lessons = []
+        for lesson in generator.units[unit_number]:
+            stem = Path(lesson['filename']).stem
+            lesson_id = _identifier(stem)
+            referenced = []
+
+            def rewrite(target):
+                match = LESSON_LINK_PATTERN.match(target)
+                if match:
+                    return f"{match.group(1)}.html{match.group(2) or ''}"
+                if target.startswith('images/'):
+                    name = target[len('images/'):]
+                    entry = images.get(name)
+                    if entry is None:
+                        missing.add((lesson['filename'], target))
+                    elif f"images/{name}" not in entries:
+                        entries[f"images/{name}"] = {'sha256': entry['sha256'], 'path': images.resolve(name),
+                                                     'compress': zipfile.ZIP_STORED}
+                    if entry is not None and f"images/{name}" not in referenced:
+                        referenced.append(f"images/{name}")
+                    return f"../{target}"
+                return target
+
+            def picture(target, alt):
+                if not target.startswith('images/'):
+                    return None
+                name = target[len('images/'):]
+                entry = images.get(name)
+                web = current_renditions(name, entry['sha256']) if entry else None
+                if web is None:
+                    return None  # rewrite() packages the original
+                for rendition in web['renditions']:
+                    archive_name = f"images/web/{rendition['file']}"
+                    if archive_name not in entries:
+                        # Renditions are determined by their source and the settings that produced them
+                        key = f"{web['source']['sha256']} {web['settings']} {rendition['file']}"
+                        entries[archive_name] = {'sha256': hashlib.sha256(key.encode('utf-8')).hexdigest(),
+                                                 'path': renditions.dest_dir / rendition['file'],
+                                                 'compress': zipfile.ZIP_STORED}
+                    if archive_name not in referenced:
+                        referenced.append(archive_name)
+                metrics.count("images_as_renditions")
+                return renditions.picture_html(name, alt, base_url='../images/web/')
+
+            with metrics.phase("render_lessons"):
+                text = (Path(course_path) / lesson['filename']).read_text(encoding='utf-8')
+                body = LessonRenderer(rewrite, picture).render(text)
+                page = PAGE_TEMPLATE.format(title=escape(lesson['lesson_title']), body=body).encode('utf-8')
+            href = f"lessons/{stem}.html"
+            entries[href] = {'sha256': hashlib.sha256(page).hexdigest(), 'data': page,
+                             'compress': zipfile.ZIP_DEFLATED}
+            resources[lesson_id] = (href, referenced)
+            unit_lessons.append((lesson_id, f"{lesson['lesson_number']:02d}. {lesson['lesson_title']}"))
+            metrics.count("lessons_rendered")
+        units.append((f"Unit {unit_number}: {generator.get_unit_title(unit_number)}", unit_lessons))
+    images.save()
+
+    by_lesson = {}
+    for filename, target in sorted(missing):
+        by_lesson.setdefault(filename, []).append(target[len('images/'):])
+    for filename, names in by_lesson.items():
+        log(f"  ⚠ {filename}: {len(names)} referenced images not found ({', '.join(names)})")
+    manifest = build_manifest(generator.config['title'], units, resources)
+    return generator.config['title'], entries, manifest
+
+
+def build_package(course_path=None, output=None, dry_run=False, metrics=None, log=print):
+    """
+    Write (or incrementally update) the SCORM package of a course.
+
+    Args:
+        course_path (str, optional): Course root (default: current directory)
+        output (str, optional): Archive path (default: dist/<course-title>-scorm.zip)
+        dry_run (bool): Only report what would be reused and rewritten
+        metrics (Instrumentation, optional): Shared instrumentation
+        log (callable): Output function
+
+    Returns:
+        dict: Counts ('reused', 'written', 'lessons', 'images') or None if nothing could be packaged
+    """
+    course_path = Path(course_path) if course_path else Path.cwd()
+    metrics = metrics or Instrumentation("package_course")
+    title, entries, manifest = collect_package(course_path, metrics, log)
+    lessons = sum(1 for name in entries if name.startswith('lessons/'))
+    if not lessons:
+        log("ERROR: No lessons found to package")
+        return None
+    if output is None:
+        output = course_path / DEFAULT_OUTPUT_DIR / f"{_identifier(title).lower()}-scorm.zip"
+    output = Path(output)
+    cache_path = course_path / CACHE_DIR / PACKAGE_CACHE_FILE
+
+    recorded = _load_recorded(cache_path, output)
+    old_zip = zipfile.ZipFile(output) if recorded else None
+    try:
+        reusable = set()
+        if old_zip:
+            old_names = {info.filename: info for info in old_zip.infolist()}
+            reusable = {name for name, entry in entries.items()
+                        if recorded.get(name) == entry['sha256'] and name in old_names}
+        counts = {'reused': len(reusable), 'written': len(entries) - len(reusable),
+                  'lessons': lessons, 'images': len(entries) - lessons}
+        if dry_run:
+            log(f"[DRY RUN] {output}: {counts['reused']} entries reused, {counts['written']} to write")
+            return counts
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=output.parent, suffix='.zip.tmp')
+        os.close(fd)
+        try:
+            with metrics.phase("write_archive"), zipfile.ZipFile(temp_name, 'w') as archive:
+                for name in sorted(entries):
+                    entry = entries[name]
+                    if name in reusable:
+                        copy_compressed_entry(old_zip, old_names[name], archive)
+                    elif 'data' in entry:
+                        archive.writestr(name, entry['data'], compress_type=entry['compress'])
+                    else:
+                        archive.write(entry['path'], name, compress_type=entry['compress'])
+                archive.writestr(MANIFEST_NAME, manifest, compress_type=zipfile.ZIP_DEFLATED)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+    finally:
+        if old_zip:
+            old_zip.close()
+
+    if output.exists():
+        shutil.copymode(output, temp_name)
+    else:
+        os.chmod(temp_name, 0o644)  # mkstemp files are private
+    os.replace(temp_name, output)
+    _save_recorded(cache_path, output, {name: entry['sha256'] for name, entry in entries.items()})
+    metrics.count("entries_reused", counts['reused'])
+    metrics.count("entries_written", counts['written'])
+    log(f"✓ {output}: {lessons} lessons, {counts['images']} images "
+        f"({counts['reused']} entries reused, {counts['written']} written)")
+    return counts
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Build a SCORM package of the course for an LMS")
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help=f'Archive to write or update (default: {DEFAULT_OUTPUT_DIR}/<course>-scorm.zip)')
+    parser.add_argument('--dry-run', action='store_true', help='Show what would be reused and rewritten')
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+
+    metrics = Instrumentation.from_args("package_course", args)
+    with metrics.session():
+        try:
+            counts = build_package(output=args.output, dry_run=args.dry_run, metrics=metrics)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"ERROR: Could not build the package: {e}")
+            counts = None
+        metrics.set_status("failed" if counts is None else "success")
+    return 0 if counts is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
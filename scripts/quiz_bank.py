@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Quiz Bank Extraction
+
+Extracts the quiz questions of every lesson into a SQLite question bank, so
+exams can be assembled and exported to the LMS instead of copying questions
+by hand. The parser understands the quiz layouts used across the course:
+
+    **1.** Question                 1. **Topic**: Question          ### Question 1
+    A) Option                          - A) Option                  Question
+    B) Option                          - B) Option                  **A)** Option
+    ### Quiz Answers                **Answers**: 1-B, 2-C           **Correct Answer:** A) Option
+    1. B) Option
+    (or **Answer:** B) Option after each question)
+
+Questions are read from '## Quiz' sections, and from '## Exercises' sections
+when they have options (exercises are otherwise activities, not questions).
+
+The bank lives in .course_cache/quiz_bank.sqlite and is updated by content
+hash: lesson hashes come from the cached lesson index, and only lessons whose
+hash changed are re-parsed (in parallel) and rewritten in one transaction.
+Questions are indexed by unit and by topic (exact or prefix match, case-
+insensitive), and the topic and question text are full-text indexed in an
+FTS5 table kept in step by triggers.
+
+Usage (inside a tool):
+    bank = QuizBank()
+    bank.update()                                  # Re-extract changed lessons
+    bank.query(unit=5, topic="Hysteresis")         # [Question]
+    bank.query(search="drawdown well")             # Full-text search
+    bank.close()
+
+Command line:
+    python quiz_bank.py                            # Update the bank and print a summary
+    python quiz_bank.py query --unit 5 --topic "Reservoir"
+    python quiz_bank.py query --search drawdown
+    python quiz_bank.py exam --unit 7 --count 10 --seed 1 --output exam.json
+"""
+
+import os
+import re
+import sys
+import json
+import random
+import sqlite3
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from course_model import LESSON_FILENAME_PATTERN
+from lesson_parser import CACHE_DIR, LessonIndex, FENCE_PATTERN, iter_lines
+
+
+QUIZ_BANK_FILE = "quiz_bank.sqlite"
+SCHEMA_VERSION = 2
+
+QUIZ_SECTION_PATTERN = re.compile(r'^##\s+(Quiz|Exercises)\b', re.IGNORECASE)
+SECTION_END_PATTERN = re.compile(r'^#{1,2}\s')
+ANSWER_HEADING_PATTERN = re.compile(r'^###\s+Quiz\s+Answers?\b', re.IGNORECASE)
+# **1.** Question
+BOLD_NUMBER_PATTERN = re.compile(r'^\*\*(\d+)\.\*\*\s*(.*)$')
+# 1. **Topic**: Question
+TOPIC_QUESTION_PATTERN = re.compile(r'^(\d+)\.\s+\*\*([^*]+?):?\*\*:?\s+(.*)$')
+# ### Question 1
+QUESTION_HEADING_PATTERN = re.compile(r'^###\s+Question\s+(\d+)\b', re.IGNORECASE)
+# A) Option / - A) Option / **A)** Option
+OPTION_PATTERN = re.compile(r'^(?:[-*]\s+)?(?:\*\*)?([A-H])\)(?:\*\*)?\s+(.+)$')
+# **Answer:** B) ... / **Correct Answer:** B) ...
+INLINE_ANSWER_PATTERN = re.compile(r'^\*\*(?:Correct\s+)?Answer:?\*\*:?\s*([A-H])\)', re.IGNORECASE)
+# 1. B) ... (under ### Quiz Answers)
+LISTED_ANSWER_PATTERN = re.compile(r'^(\d+)\.\s+(?:\*\*)?([A-H])\)')
+# **Answers**: 1-B, 2-C
+ANSWER_KEY_PATTERN = re.compile(r'^\*\*Answers?:?\*\*:?\s*(.+)$', re.IGNORECASE)
+ANSWER_KEY_ITEM_PATTERN = re.compile(r'(\d+)\s*[-–.:)]\s*([A-H])\b')
+
+Question = namedtuple('Question', 'lesson unit number topic text options answer')
+
+SCHEMA = """
+CREATE TABLE lessons (
+    filename TEXT PRIMARY KEY,
+    unit INTEGER NOT NULL,
+    lesson INTEGER NOT NULL,
+    title TEXT,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE questions (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL REFERENCES lessons(filename) ON DELETE CASCADE,
+    unit INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    topic TEXT,
+    text TEXT NOT NULL,
+    options TEXT NOT NULL,
+    answer TEXT
+);
+CREATE INDEX questions_by_unit ON questions(unit, filename, number);
+CREATE INDEX questions_by_topic ON questions(topic COLLATE NOCASE);
+"""
+# Full-text index over topic and text; the triggers also see the cascade deletes from lessons
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE questions_fts USING fts5(topic, text, content='questions', content_rowid='id');
+CREATE TRIGGER questions_fts_insert AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts(rowid, topic, text) VALUES (new.id, new.topic, new.text);
+END;
+CREATE TRIGGER questions_fts_delete AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts(questions_fts, rowid, topic, text) VALUES ('delete', old.id, old.topic, old.text);
+END;
+"""
+FTS_TERM_PATTERN = re.compile(r'\w+')
+
+
+def _clean(text):
+    return text.strip().rstrip('\\').strip()
+
+
+def parse_quiz(lines):
+    """
+    Parse the quiz questions of a lesson.
+
+    Args:
+        lines (iterable): Lesson content as lines
+
+    Returns:
+        list: (number, topic, text, options, answer) tuples, options as [(label, text)]
+    """
+    questions, answers = [], {}
+    current = None
+    section = None          # 'quiz' or 'exercises' while inside one
+    in_answers = in_code = False
+
+    def finish():
+        if current and (current['options'] or current['section'] == 'quiz'):
+            questions.append(current)
+
+    for line in lines:
+        stripped = line.strip()
+        if FENCE_PATTERN.match(stripped):
+            in_code = not in_code
+            continue
+        if in_code:
+            continue
+
+        match = QUIZ_SECTION_PATTERN.match(stripped)
+        if match:
+            finish()
+            current, in_answers = None, False
+            section = match.group(1).lower()
+            continue
+        if section is None:
+            continue
+        if SECTION_END_PATTERN.match(stripped):
+            finish()
+            current, section, in_answers = None, None, False
+            continue
+        if ANSWER_HEADING_PATTERN.match(stripped):
+            finish()
+            current, in_answers = None, True
+            continue
+
+        if in_answers:
+            match = LISTED_ANSWER_PATTERN.match(stripped)
+            if match:
+                answers[int(match.group(1))] = match.group(2)
+            continue
+
+        match = ANSWER_KEY_PATTERN.match(stripped)
+        if match and ANSWER_KEY_ITEM_PATTERN.search(match.group(1)):
+            for number, label in ANSWER_KEY_ITEM_PATTERN.findall(match.group(1)):
+                answers[int(number)] = label
+            continue
+
+        start = None
+        match = BOLD_NUMBER_PATTERN.match(stripped)
+        if match:
+            start = (int(match.group(1)), None, match.group(2))
+        else:
+            match = TOPIC_QUESTION_PATTERN.match(stripped)
+            if match:
+                start = (int(match.group(1)), _clean(match.group(2)), match.group(3))
+            else:
+                match = QUESTION_HEADING_PATTERN.match(stripped)
+                if match:
+                    start = (int(match.group(1)), None, '')
+        if start:
+            finish()
+            current = {'number': start[0], 'topic': start[1], 'text': _clean(start[2]),
+                       'options': [], 'answer': None, 'section': section}
+            continue
+        if current is None or not stripped or stripped == '---':
+            continue
+        if stripped.startswith('#'):
+            # Any other subheading ends the question
+            finish()
+            current = None
+            continue
+
+        match = INLINE_ANSWER_PATTERN.match(stripped)
+        if match:
+            # The answer closes its question (explanations may follow)
+            current['answer'] = match.group(1)
+            finish()
+            current = None
+            continue
+        match = OPTION_PATTERN.match(stripped)
+        if match:
+            current['options'].append((match.group(1), _clean(match.group(2))))
+        elif current['options']:
+            # Continuation of the last option
+            label, text = current['options'][-1]
+            current['options'][-1] = (label, f"{text} {_clean(stripped)}")
+        else:
+            current['text'] = f"{current['text']} {_clean(stripped)}".strip()
+    finish()
+
+    for question in questions:
+        if question['answer'] is None:
+            question['answer'] = answers.get(question['number'])
+    return [(q['number'], q['topic'], q['text'], q['options'], q['answer']) for q in questions if q['text']]
+
+
+class QuizBank:
+    def __init__(self, course_path=None, path=None, metrics=None, workers=4):
+        """
+        Open (or create) the question bank of a course.
+
+        Args:
+            course_path (str, optional): Course root (default: current directory)
+            path (str, optional): SQLite file (default: .course_cache/quiz_bank.sqlite)
+            metrics (Instrumentation, optional): Shared instrumentation
+            workers (int): Lessons parsed concurrently on update
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.path = Path(path) if path else self.course_path / CACHE_DIR / QUIZ_BANK_FILE
+        self.metrics = metrics or Instrumentation("quiz_bank")
+        self.workers = max(1, workers)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA foreign_keys = ON")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._create_schema()
+
+        self.has_fts = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'").fetchone() is not None
+
+    def _create_schema(self):
+        with self.db:
+            self.db.executescript("DROP TABLE IF EXISTS questions_fts; DROP TABLE IF EXISTS questions;"
+                                  " DROP TABLE IF EXISTS lessons;")
+            self.db.executescript(SCHEMA)
+            try:
+                self.db.executescript(FTS_SCHEMA)
+            except sqlite3.OperationalError:
+                pass  # SQLite without FTS5: search falls back to scanning the question text
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def update(self, lesson_index=None):
+        """
+        Bring the bank in line with the lesson files, re-parsing only lessons whose hash changed.
+
+        Returns:
+            dict: Counts of 'parsed', 'unchanged' and 'removed' lessons
+        """
+        index = lesson_index or LessonIndex(self.course_path)
+        with self.metrics.phase("hash_lessons"):
+            summaries = index.all_lessons()
+        if lesson_index is None:
+            index.save()
+        known = dict(self.db.execute("SELECT filename, sha256 FROM lessons"))
+        changed = [name for name, summary in summaries.items() if known.get(name) != summary.sha256]
+        removed = [name for name in known if name not in summaries]
+
+        def extract(name):
+            return name, parse_quiz(iter_lines(self.course_path / name))
+
+        with self.metrics.phase("parse_quizzes"):
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                extracted = list(pool.map(extract, changed))
+
+        with self.metrics.phase("write_bank"), self.db:
+            self.db.executemany("DELETE FROM lessons WHERE filename = ?", [(name,) for name in removed])
+            for name, questions in extracted:
+                match = LESSON_FILENAME_PATTERN.match(name)
+                unit, lesson = int(match.group(1)), int(match.group(2))
+                self.db.execute("DELETE FROM lessons WHERE filename = ?", (name,))
+                self.db.execute("INSERT INTO lessons VALUES (?, ?, ?, ?, ?)",
+                                (name, unit, lesson, summaries[name].title, summaries[name].sha256))
+                self.db.executemany(
+                    "INSERT INTO questions (filename, unit, number, topic, text, options, answer)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(name, unit, number, topic, text, json.dumps(options, ensure_ascii=False), answer)
+                     for number, topic, text, options, answer in questions])
+                self.metrics.count("questions_extracted", len(questions))
+        self.metrics.count("lessons_parsed", len(extracted))
+        return {'parsed': len(extracted), 'unchanged': len(summaries) - len(changed), 'removed': len(removed)}
+
+    def query(self, unit=None, topic=None, lesson=None, answered_only=False, search=None):
+        """
+        Return questions filtered by unit, topic (case-insensitive, exact or prefix:
+        'Reservoir' matches 'Reservoir Operations'), lesson filename and a full-text
+        search of topic and question text (every word must occur, as a word prefix),
+        in course order.
+
+        Returns:
+            list: [Question]
+        """
+        clauses, params = [], []
+        if unit is not None:
+            clauses.append("unit = ?")
+            params.append(unit)
+        if lesson:
+            clauses.append("filename = ?")
+            params.append(lesson)
+        if topic:
+            # A range on the NOCASE index: topic = x or topic starts with x
+            clauses.append("(topic = ? COLLATE NOCASE OR (topic > ? COLLATE NOCASE AND topic < ? COLLATE NOCASE))")
+            params += [topic, topic, topic + '\U0010ffff']
+        terms = FTS_TERM_PATTERN.findall(search or '')
+        if terms and self.has_fts:
+            clauses.append("id IN (SELECT rowid FROM questions_fts WHERE questions_fts MATCH ?)")
+            params.append(" ".join(f'"{term}"*' for term in terms))
+        elif terms:
+            for term in terms:
+                clauses.append("(topic LIKE ? OR text LIKE ?)")
+                params += [f"%{term}%"] * 2
+        if answered_only:
+            clauses.append("answer IS NOT NULL")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(
+            f"SELECT filename, unit, number, topic, text, options, answer FROM questions {where}"
+            " ORDER BY unit, filename, number", params)
+        return [Question(filename, unit, number, topic, text, [tuple(option) for option in json.loads(options)], answer)
+                for filename, unit, number, topic, text, options, answer in rows]
+
+    def stats(self):
+        """Return [(unit, lessons with questions, questions, unanswered)] per unit."""
+        return self.db.execute(
+            "SELECT unit, COUNT(DISTINCT filename), COUNT(*), SUM(answer IS NULL)"
+            " FROM questions GROUP BY unit ORDER BY unit").fetchall()
+
+
+def question_to_dict(question):
+    """Return a question as a JSON-ready dict (LMS import format)."""
+    return {'lesson': question.lesson, 'unit': question.unit, 'number': question.number,
+            'topic': question.topic, 'text': question.text,
+            'options': [{'label': label, 'text': text} for label, text in question.options],
+            'answer': question.answer}
+
+
+def format_question(question):
+    """Return a question as text, with the answer marked."""
+    topic = f" [{question.topic}]" if question.topic else ""
+    lines = [f"{question.lesson} Q{question.number}{topic}: {question.text}"]
+    for label, text in question.options:
+        marker = "*" if label == question.answer else " "
+        lines.append(f"  {marker}{label}) {text}")
+    if not question.answer:
+        lines.append("  (no answer key)")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract lesson quizzes into a SQLite question bank")
+    parser.add_argument('--bank', default=None, help=f'Question bank file (default: {CACHE_DIR}/{QUIZ_BANK_FILE})')
+    parser.add_argument('--workers', type=int, default=4, help='Lessons parsed concurrently (default: 4)')
+    add_instrumentation_arguments(parser)
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('update', help='Update the bank from the lessons (default)')
+    for name, description in (('query', 'List matching questions'),
+                              ('exam', 'Draw a random set of answered questions')):
+        command = commands.add_parser(name, help=description)
+        command.add_argument('--unit', type=int, help='Only questions of this unit')
+        command.add_argument('--topic', help='Only questions whose topic is or starts with this')
+        command.add_argument('--search', help='Only questions whose topic or text contains these words')
+        command.add_argument('--lesson', help='Only questions of this lesson file')
+        command.add_argument('--json', action='store_true', help='Print JSON instead of text')
+        command.add_argument('--output', help='Write JSON to this file')
+    exam = commands.choices['exam']
+    exam.add_argument('--count', type=int, default=10, help='Number of questions (default: 10)')
+    exam.add_argument('--seed', type=int, help='Random seed, for a reproducible exam')
+    args = parser.parse_args()
+
+    metrics = Instrumentation.from_args("quiz_bank", args)
+    with metrics.session():
+        if not any(LESSON_FILENAME_PATTERN.match(name) for name in os.listdir('.')):
+            print("❌ No lesson files found - run from the course root")
+            metrics.set_status("no_lessons")
+            return 1
+        bank = QuizBank(path=args.bank, metrics=metrics, workers=args.workers)
+        try:
+            result = bank.update()
+            if args.command in (None, 'update'):
+                print(f"📝 Quiz bank {bank.path}: {result['parsed']} lessons extracted, "
+                      f"{result['unchanged']} unchanged, {result['removed']} removed")
+                for unit, lessons, questions, unanswered in bank.stats():
+                    note = f", {unanswered} without answer key" if unanswered else ""
+                    print(f"   Unit {unit:02d}: {questions} questions in {lessons} lessons{note}")
+                return 0
+
+            questions = bank.query(unit=args.unit, topic=args.topic, lesson=args.lesson,
+                                   answered_only=args.command == 'exam', search=args.search)
+        finally:
+            bank.close()
+
+        if args.command == 'exam':
+            if len(questions) < args.count:
+                print(f"⚠️  Only {len(questions)} answered questions match; using all of them", file=sys.stderr)
+            questions = random.Random(args.seed).sample(questions, min(args.count, len(questions)))
+        metrics.count("questions_selected", len(questions))
+
+        data = [question_to_dict(question) for question in questions]
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            print(f"✅ Wrote {len(questions)} questions to {args.output}")
+        elif args.json:
+            print(json.dumps(data, indent=2, ensure_ascii=False))
+        else:
+            for question in questions:
+                print(format_question(question))
+                print()
+            print(f"{len(questions)} questions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
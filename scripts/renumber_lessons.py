@@ -9,6 +9,9 @@ SAFETY FEATURES:
 - Creates backup copies of all files before renumbering
 - Dry-run mode to preview changes
 - Comprehensive validation and error handling
+- Snapshot of all lessons and images; rollback restores exactly that state
+- Locks the affected units, so concurrent operations on them wait or fail fast
+- "# Lesson N" headings are rewritten together with the filenames
 - Rollback capability if errors occur
 - Detailed logging of all operations
 
@@ -19,6 +22,7 @@ Examples:
     python renumber_lessons.py 3 --dry-run          # Preview changes only
     python renumber_lessons.py 3                    # Execute with default backup
     python renumber_lessons.py 3 --backup-dir=backup_2025_01_07  # Custom backup directory
+    python renumber_lessons.py 3 --unit 2           # Only renumber Unit 2
 """
 
 import os
@@ -29,22 +33,37 @@ import argparse
 from pathlib import Path
 from datetime import datetime
 
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from automation_log import ToolLogStream
+from snapshots import SnapshotStore
+from lesson_headings import sync_heading
+from course_locks import CourseLock, LockError, unit_scope, add_lock_arguments
+
 
 class LessonRenumberingTool:
-    def __init__(self, insertion_point, dry_run=False, backup_dir=None):
+    def __init__(self, insertion_point, dry_run=False, backup_dir=None, metrics=None, lock_timeout=None,
+                 unit=None):
         self.insertion_point = insertion_point
+        self.unit = unit  # None: every unit
         self.dry_run = dry_run
         self.backup_dir = backup_dir or f"backup_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}"
         self.current_dir = Path.cwd()
         self.backup_path = self.current_dir / self.backup_dir
-        self.operations_log = []
+        self.operations_count = 0
         self.errors = []
+        self.metrics = metrics or Instrumentation("renumber_lessons")
+        self.snapshot_id = None
+        self.lock_timeout = lock_timeout
+        self.lock = None
+        self.locked_units = None
+        self.log_stream = ToolLogStream("renumber_lessons")
         
     def log(self, message, level="INFO"):
         """Log a message with timestamp and level."""
         timestamp = datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {level}: {message}"
-        self.operations_log.append(log_entry)
+        self.operations_count += 1
+        self.log_stream.emit(level, message)
         print(log_entry)
         
     def error(self, message):
@@ -61,7 +80,9 @@ class LessonRenumberingTool:
         
         lesson_files = []
         for file in self.current_dir.iterdir():
-            if file.is_file() and lesson_pattern.match(file.name):
+            self.metrics.count("files_scanned")
+            self.metrics.count("regex_evaluations")
+            if lesson_pattern.match(file.name) and file.is_file():
                 lesson_files.append(file.name)
         
         return sorted(lesson_files)  # Sort to ensure consistent order
@@ -83,6 +104,10 @@ class LessonRenumberingTool:
             return unit_number, lesson_number
         return None, None
     
+    def is_affected(self, unit_number, lesson_number):
+        """Return True if the insertion shifts this lesson."""
+        return lesson_number >= self.insertion_point and (self.unit is None or unit_number == self.unit)
+    
     def determine_insertion_unit(self, all_files):
         """
         Determine which unit the insertion point refers to based on existing files.
@@ -114,7 +139,7 @@ class LessonRenumberingTool:
         files_to_be_affected = []
         for filename in all_files:
             unit_number, lesson_number = self.parse_lesson_number(filename)
-            if unit_number is not None and lesson_number >= self.insertion_point:
+            if unit_number is not None and self.is_affected(unit_number, lesson_number):
                 files_to_be_affected.append((filename, unit_number, lesson_number))
         
         if files_to_be_affected:
@@ -123,7 +148,7 @@ class LessonRenumberingTool:
             self.log("")
             self.log("IMPORTANT WORKFLOW REMINDER:")
             self.log("1. ✓ This script creates the empty slot (CURRENT STEP)")
-            self.log("2. → Next: Manually create your new lesson file")
+            self.log("2. → Next: Manually create your new lesson file (new_lesson.py does all three steps)")
             self.log("3. → Finally: Run generate_course_outline.py")
             self.log("")
             self.log("⚠️  DO NOT create the lesson file before running this script!")
@@ -179,6 +204,7 @@ class LessonRenumberingTool:
                 backup_file_path = self.backup_path / filename
                 
                 shutil.copy2(source_path, backup_file_path)
+                self.metrics.count("bytes_copied", backup_file_path.stat().st_size)
                 self.log(f"Backed up: {filename}")
                 backup_count += 1
             
@@ -196,6 +222,9 @@ class LessonRenumberingTool:
         
         for old_filename, unit_number, current_lesson_number in files_to_rename:
             new_lesson_number = current_lesson_number + 1
+            if new_lesson_number > 99:
+                self.error(f"Conflict: {old_filename} cannot move past lesson 99 (filenames have two digits)")
+                return False
             new_filename = self.create_new_filename(unit_number, new_lesson_number, old_filename)
             
             # Check for duplicate new filenames
@@ -223,50 +252,50 @@ class LessonRenumberingTool:
         # Get all current lesson files for comparison
         all_current_files = self.get_lesson_files()
         
+        # Each file is read at most once, and only if its name is similar to another lesson's
+        contents = {}
+        
+        def read_content(filename):
+            if filename not in contents:
+                with open(self.current_dir / filename, 'r', encoding='utf-8') as f:
+                    contents[filename] = f.read()
+            return contents[filename]
+        
         for old_filename, unit_number, current_lesson_number in files_to_rename:
-            try:
-                # Read the content of the file being renamed
-                old_file_path = self.current_dir / old_filename
-                if not old_file_path.exists():
+            if not (self.current_dir / old_filename).exists():
+                continue
+            
+            # Extract the descriptive part of the filename for comparison
+            old_desc = self.extract_lesson_description(old_filename)
+            
+            # Check against all other files for potential duplicates
+            for other_filename in all_current_files:
+                if other_filename == old_filename:
                     continue
-                    
-                with open(old_file_path, 'r', encoding='utf-8') as f:
-                    old_content = f.read()
                 
-                # Extract the descriptive part of the filename for comparison
-                old_desc = self.extract_lesson_description(old_filename)
+                other_desc = self.extract_lesson_description(other_filename)
+                
+                # Check filename similarity
+                similarity = SequenceMatcher(None, old_desc.lower(), other_desc.lower()).ratio()
                 
-                # Check against all other files for potential duplicates
-                for other_filename in all_current_files:
-                    if other_filename == old_filename:
+                if similarity > 0.8:  # 80% similarity threshold
+                    # Also check content similarity if filenames are very similar
+                    try:
+                        old_content = read_content(old_filename)
+                        other_content = read_content(other_filename)
+                    except Exception as e:
+                        self.log(f"Warning: Could not read {old_filename} or {other_filename} for content comparison: {e}")
                         continue
                     
-                    other_desc = self.extract_lesson_description(other_filename)
-                    
-                    # Check filename similarity
-                    similarity = SequenceMatcher(None, old_desc.lower(), other_desc.lower()).ratio()
+                    self.metrics.count("content_comparisons")
+                    content_similarity = SequenceMatcher(None, old_content, other_content).ratio()
                     
-                    if similarity > 0.8:  # 80% similarity threshold
-                        # Also check content similarity if filenames are very similar
-                        try:
-                            other_file_path = self.current_dir / other_filename
-                            with open(other_file_path, 'r', encoding='utf-8') as f:
-                                other_content = f.read()
-                            
-                            content_similarity = SequenceMatcher(None, old_content, other_content).ratio()
-                            
-                            if content_similarity > 0.5:  # 50% content similarity
-                                self.error(f"DUPLICATE DETECTED: '{old_filename}' appears to be very similar to '{other_filename}'")
-                                self.error(f"  - Filename similarity: {similarity:.1%}")
-                                self.error(f"  - Content similarity: {content_similarity:.1%}")
-                                self.error("  - This suggests duplicate lessons that should be consolidated")
-                                return False
-                                
-                        except Exception as e:
-                            self.log(f"Warning: Could not read {other_filename} for content comparison: {e}")
-            
-            except Exception as e:
-                self.log(f"Warning: Could not read {old_filename} for duplicate checking: {e}")
+                    if content_similarity > 0.5:  # 50% content similarity
+                        self.error(f"DUPLICATE DETECTED: '{old_filename}' appears to be very similar to '{other_filename}'")
+                        self.error(f"  - Filename similarity: {similarity:.1%}")
+                        self.error(f"  - Content similarity: {content_similarity:.1%}")
+                        self.error("  - This suggests duplicate lessons that should be consolidated")
+                        return False
         
         return True
     
@@ -278,6 +307,16 @@ class LessonRenumberingTool:
             return match.group(1)
         return filename
     
+    def sync_lesson_heading(self, path, lesson_number):
+        """Rewrite the lesson's "# Lesson N" heading to match its new number."""
+        old_number, changed = sync_heading(path, lesson_number, dry_run=self.dry_run)
+        if old_number is None:
+            self.log(f"Warning: No '# Lesson N' heading found in {path.name}", "WARNING")
+        elif changed:
+            self.metrics.count("headings_updated")
+            prefix = "DRY-RUN: Would update" if self.dry_run else "✓ Updated"
+            self.log(f"{prefix} heading in '{path.name}': Lesson {old_number} → Lesson {lesson_number}")
+    
     def execute_renaming(self, files_to_rename):
         """Execute the file renaming operations."""
         if self.dry_run:
@@ -286,6 +325,7 @@ class LessonRenumberingTool:
                 new_lesson_number = current_lesson_number + 1
                 new_filename = self.create_new_filename(unit_number, new_lesson_number, old_filename)
                 self.log(f"DRY-RUN: Would rename '{old_filename}' → '{new_filename}'")
+                self.sync_lesson_heading(self.current_dir / old_filename, new_lesson_number)
             return True, len(files_to_rename)
         
         renamed_count = 0
@@ -300,7 +340,9 @@ class LessonRenumberingTool:
                 new_path = self.current_dir / new_filename
                 
                 old_path.rename(new_path)
+                self.metrics.count("renames")
                 self.log(f"✓ Renamed '{old_filename}' → '{new_filename}'")
+                self.sync_lesson_heading(new_path, new_lesson_number)
                 renamed_count += 1
                 
             except Exception as e:
@@ -314,8 +356,53 @@ class LessonRenumberingTool:
         
         return True, renamed_count
     
+    def lock_units(self, units):
+        """Lock the units being renumbered against concurrent course operations."""
+        self.locked_units = units
+        if self.dry_run:
+            return True
+        try:
+            self.lock = CourseLock([unit_scope(unit) for unit in units], "renumber_lessons",
+                                   self.current_dir, self.lock_timeout).acquire()
+        except LockError as e:
+            self.error(f"Cannot renumber while another operation is running: {e}")
+            return False
+        self.log(f"Locked units: {', '.join(f'{unit:02d}' for unit in units)}")
+        return True
+    
+    def release_lock(self):
+        """Release the unit locks, if held."""
+        if self.lock is not None:
+            self.lock.release()
+            self.lock = None
+    
+    def create_snapshot(self):
+        """Snapshot all lessons and images so a rollback can restore the exact prior state."""
+        if self.dry_run:
+            self.log("DRY-RUN: Would create a course snapshot")
+            return True
+        
+        try:
+            self.snapshot_id = SnapshotStore(self.current_dir).create(
+                label=f"renumber_lessons {self.insertion_point:02d}")
+            self.log(f"Created snapshot: {self.snapshot_id}")
+            return True
+        except OSError as e:
+            self.error(f"Failed to create snapshot: {e}")
+            return False
+    
     def rollback_changes(self):
-        """Rollback changes by restoring from backup."""
+        """Rollback changes by restoring the snapshot (or, without one, the backup)."""
+        if self.snapshot_id:
+            self.log(f"Restoring snapshot {self.snapshot_id}...")
+            try:
+                SnapshotStore(self.current_dir).restore(self.snapshot_id, log=self.log,
+                                                        units=self.locked_units)
+                return True
+            except OSError as e:
+                self.error(f"Snapshot restore failed: {e}")
+                return False
+        
         if not self.backup_path.exists():
             self.error("No backup directory found for rollback")
             return False
@@ -345,7 +432,18 @@ class LessonRenumberingTool:
             return False
     
     def run(self):
-        """Main execution method."""
+        """Main execution method, timed and recorded by the instrumentation layer."""
+        with self.metrics.session():
+            try:
+                success = self._run_steps()
+            finally:
+                self.release_lock()
+            self.metrics.set_status("success" if success else "failed")
+        self.log_stream.finish(success)
+        return success
+    
+    def _run_steps(self):
+        """Run the renumbering steps."""
         self.log("=" * 60)
         self.log("LESSON RENUMBERING TOOL - ENHANCED SAFETY VERSION")
         self.log("=" * 60)
@@ -353,12 +451,14 @@ class LessonRenumberingTool:
         if self.dry_run:
             self.log("*** DRY-RUN MODE - NO FILES WILL BE MODIFIED ***")
         
-        self.log(f"Insertion point: Lesson {self.insertion_point:02d}")
+        unit_label = f"Unit {self.unit:02d}, " if self.unit is not None else ""
+        self.log(f"Insertion point: {unit_label}Lesson {self.insertion_point:02d}")
         self.log(f"Working directory: {self.current_dir}")
         self.log(f"Backup directory: {self.backup_path}")
         
         # Step 1: Get all lesson files
-        all_files = self.get_lesson_files()
+        with self.metrics.phase("scan"):
+            all_files = self.get_lesson_files()
         if not all_files:
             self.error("No lesson files found matching the pattern NN-NN-*.md")
             return False
@@ -379,7 +479,7 @@ class LessonRenumberingTool:
                 self.error(f"Could not parse lesson number from: {filename}")
                 continue
             
-            if lesson_number >= self.insertion_point:
+            if self.is_affected(unit_number, lesson_number):
                 files_to_rename.append((filename, unit_number, lesson_number))
             else:
                 files_not_affected.append(filename)
@@ -394,8 +494,22 @@ class LessonRenumberingTool:
         self.log(f"Files to be renumbered: {len(files_to_rename)}")
         self.log(f"Files not affected: {len(files_not_affected)}")
         
+        # Step 2.5: Lock the affected units; their lessons must not change while waiting
+        units = sorted({unit for _, unit, _ in files_to_rename})
+        with self.metrics.phase("lock"):
+            if not self.lock_units(units):
+                return False
+        if not self.dry_run:
+            before = {f for f in all_files if self.parse_lesson_number(f)[0] in units}
+            after = {f for f in self.get_lesson_files() if self.parse_lesson_number(f)[0] in units}
+            if before != after:
+                self.error("Lessons in the affected units changed while waiting for the lock. Run again.")
+                return False
+        
         # Step 3: Validate renaming plan
-        if not self.validate_renaming_plan(files_to_rename):
+        with self.metrics.phase("validate"):
+            plan_valid = self.validate_renaming_plan(files_to_rename)
+        if not plan_valid:
             self.error("Renaming plan validation failed. Aborting.")
             return False
         
@@ -403,12 +517,15 @@ class LessonRenumberingTool:
         
         # Step 4: Create backups
         all_affected_files = [f[0] for f in files_to_rename]
-        if not self.create_backup(all_affected_files):
+        with self.metrics.phase("backup"):
+            backup_ok = self.create_backup(all_affected_files) and self.create_snapshot()
+        if not backup_ok:
             self.error("Backup creation failed. Aborting for safety.")
             return False
         
         # Step 5: Execute renaming
-        success, renamed_count = self.execute_renaming(files_to_rename)
+        with self.metrics.phase("rename"):
+            success, renamed_count = self.execute_renaming(files_to_rename)
         
         if success:
             if self.dry_run:
@@ -421,7 +538,9 @@ class LessonRenumberingTool:
             self.error("Renaming operation failed")
             if not self.dry_run:
                 self.log("Attempting automatic rollback...")
-                if self.rollback_changes():
+                with self.metrics.phase("rollback"):
+                    rolled_back = self.rollback_changes()
+                if rolled_back:
                     self.log("Rollback completed successfully")
                 else:
                     self.error("Rollback failed - manual restoration may be required")
@@ -430,7 +549,7 @@ class LessonRenumberingTool:
         self.log("=" * 60)
         self.log("OPERATION SUMMARY")
         self.log("=" * 60)
-        self.log(f"Total operations logged: {len(self.operations_log)}")
+        self.log(f"Total operations logged: {self.operations_count}")
         self.log(f"Errors encountered: {len(self.errors)}")
         
         if self.errors:
@@ -456,12 +575,16 @@ Examples:
     
     parser.add_argument('insertion_point', type=int, 
                         help='The lesson number where new lesson will be inserted (1-99)')
+    parser.add_argument('--unit', type=int, default=None,
+                        help='Only renumber lessons of this unit (default: every unit)')
     parser.add_argument('--dry-run', action='store_true',
                         help='Preview changes without modifying files')
     parser.add_argument('--force', action='store_true',
                         help='Skip confirmation prompt and execute automatically')
     parser.add_argument('--backup-dir', type=str,
                         help='Custom backup directory name (default: backup_YYYY_MM_DD_HH_MM_SS)')
+    add_instrumentation_arguments(parser)
+    add_lock_arguments(parser)
     
     args = parser.parse_args()
     
@@ -474,12 +597,16 @@ Examples:
     tool = LessonRenumberingTool(
         insertion_point=args.insertion_point,
         dry_run=args.dry_run,
-        backup_dir=args.backup_dir
+        backup_dir=args.backup_dir,
+        metrics=Instrumentation.from_args("renumber_lessons", args),
+        lock_timeout=args.lock_timeout,
+        unit=args.unit
     )
     
     # Get user confirmation unless in dry-run mode or force mode
     if not args.dry_run and not args.force:
-        print(f"\nThis will renumber all lessons from {args.insertion_point:02d} onwards.")
+        scope = f"Unit {args.unit} lessons" if args.unit else "all lessons"
+        print(f"\nThis will renumber {scope} from {args.insertion_point:02d} onwards.")
         print("Backup copies will be created automatically.")
         print("Files will be renamed in descending order to prevent overwriting.")
         
@@ -3,30 +3,84 @@
 Lesson Rollback Script
 
 This script helps manually rollback lesson renumbering operations
-by restoring files from a backup directory.
+by restoring a snapshot (see snapshots.py) or files from a backup directory.
+
+Snapshot restores only rewrite lessons and images whose content differs and
+remove files created after the snapshot, leaving the tree exactly as it was.
 
 Usage:
-    python rollback_lessons.py <backup_directory>
+    python rollback_lessons.py <snapshot_id | backup_directory> [--yes] [--dry-run]
     
 Example:
+    python rollback_lessons.py snapshot_2025_01_07_14_30_45 --yes
     python rollback_lessons.py backup_2025_01_07_14_30_45
 """
 
 import os
 import sys
 import shutil
+import argparse
 from pathlib import Path
 from datetime import datetime
 
+from instrumentation import Instrumentation
+from automation_log import ToolLogStream
+from snapshots import SnapshotStore
+from course_locks import CourseLock, LockError, COURSE_SCOPE, add_lock_arguments
+
+
+log_stream = ToolLogStream("rollback_lessons")
+
 
 def log(message):
     """Log a message with timestamp."""
     timestamp = datetime.now().strftime("%H:%M:%S")
+    log_stream.emit("ERROR" if message.startswith("ERROR") else "INFO", message)
     print(f"[{timestamp}] {message}")
 
 
-def rollback_from_backup(backup_dir_name):
+def rollback_from_snapshot(snapshot_id, assume_yes=False, dry_run=False, metrics=None):
+    """Rollback lessons and images to a snapshot by applying only the differences."""
+    metrics = metrics or Instrumentation("rollback_lessons")
+    store = SnapshotStore()
+    
+    log(f"Starting snapshot rollback to {snapshot_id}...")
+    log(f"Working directory: {store.course_path}")
+    
+    with metrics.phase("diff"):
+        changes = store.diff(snapshot_id)
+    restore_count = len(changes['modified']) + len(changes['missing'])
+    remove_count = len(changes['created'])
+    
+    if restore_count == 0 and remove_count == 0:
+        log("Tree already matches the snapshot - nothing to do")
+        return True
+    
+    if not assume_yes and not dry_run:
+        print(f"\nThis will restore {restore_count} files and remove {remove_count} files "
+              f"created since the snapshot.")
+        response = input("Continue with rollback? (y/N): ").lower().strip()
+        if response not in ('y', 'yes'):
+            log("Rollback cancelled by user")
+            return False
+    
+    try:
+        with metrics.phase("restore"):
+            store.restore(snapshot_id, dry_run=dry_run, log=log)
+    except OSError as e:
+        log(f"ERROR: Snapshot restore failed: {e}")
+        return False
+    
+    metrics.count("files_restored", restore_count)
+    metrics.count("files_removed", remove_count)
+    log("-" * 50)
+    log(f"Rollback {'preview' if dry_run else 'completed'}: {restore_count} restored, {remove_count} removed")
+    return True
+
+
+def rollback_from_backup(backup_dir_name, metrics=None, assume_yes=False):
     """Rollback lesson files from backup directory."""
+    metrics = metrics or Instrumentation("rollback_lessons")
     current_dir = Path.cwd()
     backup_path = current_dir / backup_dir_name
     
@@ -44,7 +98,9 @@ def rollback_from_backup(backup_dir_name):
         return False
     
     # Get all markdown files in backup
-    backup_files = list(backup_path.glob("*.md"))
+    with metrics.phase("scan"):
+        backup_files = list(backup_path.glob("*.md"))
+    metrics.count("files_scanned", len(backup_files))
     
     if not backup_files:
         log("ERROR: No markdown files found in backup directory")
@@ -53,14 +109,15 @@ def rollback_from_backup(backup_dir_name):
     log(f"Found {len(backup_files)} backup files")
     
     # Confirm with user
-    print(f"\nThis will restore {len(backup_files)} lesson files from backup.")
-    print("Any existing files with the same names will be overwritten.")
-    
-    response = input("Continue with rollback? (y/N): ").lower().strip()
-    
-    if response not in ('y', 'yes'):
-        log("Rollback cancelled by user")
-        return False
+    if not assume_yes:
+        print(f"\nThis will restore {len(backup_files)} lesson files from backup.")
+        print("Any existing files with the same names will be overwritten.")
+        
+        response = input("Continue with rollback? (y/N): ").lower().strip()
+        
+        if response not in ('y', 'yes'):
+            log("Rollback cancelled by user")
+            return False
     
     # Perform rollback
     restored_count = 0
@@ -74,9 +131,11 @@ def rollback_from_backup(backup_dir_name):
             if target_path.exists():
                 target_path.unlink()
                 log(f"Removed existing: {backup_file.name}")
-            
+
             # Restore from backup
-            shutil.copy2(backup_file, target_path)
+            with metrics.phase("restore"):
+                shutil.copy2(backup_file, target_path)
+            metrics.count("bytes_copied", target_path.stat().st_size)
             log(f"Restored: {backup_file.name}")
             restored_count += 1
             
@@ -101,9 +160,28 @@ def rollback_from_backup(backup_dir_name):
 
 def main():
     """Main entry point."""
-    if len(sys.argv) != 2:
-        print("Usage: python rollback_lessons.py <backup_directory>")
-        print("Example: python rollback_lessons.py backup_2025_01_07_14_30_45")
+    parser = argparse.ArgumentParser(description="Rollback lessons from a snapshot or backup directory")
+    parser.add_argument('target', nargs='?', help='Snapshot id or backup directory name')
+    parser.add_argument('--yes', '-y', action='store_true', help='Skip the confirmation prompt (for automation)')
+    parser.add_argument('--dry-run', action='store_true', help='Preview a snapshot rollback without modifying files')
+    add_lock_arguments(parser)
+    args = parser.parse_args()
+    
+    store = SnapshotStore()
+    
+    if not args.target:
+        print("Usage: python rollback_lessons.py <snapshot_id | backup_directory> [--yes]")
+        print("Example: python rollback_lessons.py snapshot_2025_01_07_14_30_45 --yes")
+        print("\nAvailable snapshots:")
+        
+        snapshots = store.list_snapshots()
+        if snapshots:
+            for snapshot in snapshots:
+                label = f"  ({snapshot['label']})" if snapshot['label'] else ""
+                print(f"  - {snapshot['id']}{label}")
+        else:
+            print("  (No snapshots found)")
+        
         print("\nAvailable backup directories:")
         
         # List available backup directories
@@ -119,8 +197,25 @@ def main():
         
         sys.exit(1)
     
-    backup_dir = sys.argv[1]
-    success = rollback_from_backup(backup_dir)
+    # A rollback restores every unit, so the whole course is locked
+    lock = CourseLock([] if args.dry_run else [COURSE_SCOPE], "rollback_lessons", timeout=args.lock_timeout)
+    try:
+        lock.acquire()
+    except LockError as e:
+        log(f"ERROR: Cannot roll back while another operation is running: {e}")
+        sys.exit(1)
+    
+    metrics = Instrumentation("rollback_lessons")
+    try:
+        with metrics.session():
+            if store.exists(args.target):
+                success = rollback_from_snapshot(args.target, args.yes, args.dry_run, metrics)
+            else:
+                success = rollback_from_backup(args.target, metrics, assume_yes=args.yes)
+            metrics.set_status("success" if success else "failed")
+    finally:
+        lock.release()
+    log_stream.finish(success)
     sys.exit(0 if success else 1)
 
 
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Safe Execution Wrapper
+
+Cross-platform version of safe_execute.bat: snapshot, run the command through
+the automation log, then run the mandatory validation (README update).
+
+The snapshot no longer commits the working tree to the current branch with
+'git add .'. Instead, only the paths the wrapped tool declares it touches
+(TOOL_PATHS, or --paths) are written into a commit on a dedicated ref,
+refs/course-snapshots/<id>, built from a copy of the index:
+
+    copy .git/index → temporary index          (keeps git's stat cache)
+    git add -A -- <declared paths>             (hashes only changed files there)
+    git write-tree / commit-tree / update-ref
+
+The branch, the real index and the working tree are left untouched, and
+unchanged images are never re-read. If the declared paths match HEAD, HEAD
+itself is the snapshot and nothing is written.
+
+Usage:
+    python scripts/safe_execute.py -- python scripts/renumber_lessons.py 5
+    python scripts/safe_execute.py --paths images -- python scripts/sort-images-flat.py
+    python scripts/safe_execute.py --list
+    python scripts/safe_execute.py --restore 20250107_143045 [--dry-run]
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from automation_log import run_command, tool_name_from_command
+from git_changes import GitChangeError, _git
+
+
+SNAPSHOT_REF_PREFIX = "refs/course-snapshots/"
+DEFAULT_KEEP = 20
+# Snapshots are tool commits: they must not fail on machines without a git identity
+FALLBACK_IDENTITY = {'GIT_AUTHOR_NAME': 'safe_execute', 'GIT_AUTHOR_EMAIL': 'safe_execute@localhost',
+                     'GIT_COMMITTER_NAME': 'safe_execute', 'GIT_COMMITTER_EMAIL': 'safe_execute@localhost'}
+
+LESSON_PATHS = [":(glob)[0-9][0-9]-[0-9][0-9]-*.md"]
+IMAGE_PATHS = ["images"]
+DOC_PATHS = ["README.md", "ASSETS_NEEDED.md"]
+COURSE_PATHS = LESSON_PATHS + IMAGE_PATHS + DOC_PATHS
+
+# Paths each tool may modify (the validation step's DOC_PATHS are always added)
+TOOL_PATHS = {
+    'renumber_lessons': COURSE_PATHS,
+    'close_lesson_gaps': COURSE_PATHS,
+    'new_lesson': COURSE_PATHS,
+    'rollback_lessons': COURSE_PATHS,
+    'course_workflow': COURSE_PATHS,
+    'lesson_compliance': LESSON_PATHS,
+    'lesson_headings': LESSON_PATHS,
+    'fix-image-references': LESSON_PATHS,
+    'update-image-syntax': LESSON_PATHS,
+    'sort-images-flat': IMAGE_PATHS,
+    'sort_images': IMAGE_PATHS,
+    'rename-image-files': LESSON_PATHS + IMAGE_PATHS,
+    'migrate-to-flat': LESSON_PATHS + IMAGE_PATHS,
+    'generate_course_outline': DOC_PATHS + ["course_outline.txt"],
+}
+
+
+def declared_paths(command):
+    """Return the pathspecs a command may modify (all course content if the tool is unknown)."""
+    tool = tool_name_from_command(command)
+    if tool == 'course':
+        # python scripts/course.py <subcommand> ...: look up the subcommand's script
+        from course import COMMANDS
+
+        script = next((COMMANDS[part][0] for part in command if part in COMMANDS), None)
+        tool = Path(script).stem if script else None
+    paths = list(TOOL_PATHS.get(tool, COURSE_PATHS))
+    return paths + [path for path in DOC_PATHS if path not in paths]
+
+
+class GitSnapshots:
+    def __init__(self, course_path=None):
+        """
+        Snapshots of selected paths as commits on refs/course-snapshots/.
+
+        Args:
+            course_path (str, optional): Repository root (default: current directory)
+
+        Raises:
+            GitChangeError: If the directory is not a git work tree
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.git_dir = Path(_git(['rev-parse', '--absolute-git-dir'], self.course_path).strip())
+
+    def _git(self, args, env=None):
+        if env is None:
+            return _git(args, self.course_path)
+        result = subprocess.run(['git'] + args, cwd=str(self.course_path), capture_output=True,
+                                text=True, encoding='utf-8', errors='replace', env=dict(os.environ, **env))
+        if result.returncode != 0:
+            raise GitChangeError(result.stderr.strip() or f"git {' '.join(args)} failed")
+        return result.stdout
+
+    def head(self):
+        """Return the HEAD commit, or None on an unborn branch."""
+        try:
+            return self._git(['rev-parse', '--verify', '-q', 'HEAD']).strip() or None
+        except GitChangeError:
+            return None
+
+    def _tree(self, paths, head):
+        """Write the current content of paths (tracked or not) as a tree built in a copy of the index."""
+        fd, index_file = tempfile.mkstemp(dir=self.git_dir, prefix='snapshot-index-')
+        os.close(fd)
+        try:
+            env = {'GIT_INDEX_FILE': index_file}
+            real_index = self.git_dir / "index"
+            if real_index.exists():
+                shutil.copyfile(real_index, index_file)
+            else:
+                os.unlink(index_file)
+                if head:
+                    self._git(['read-tree', head], env)
+            # git add fails on a pathspec that matches nothing (a course without ASSETS_NEEDED.md)
+            paths = [path for path in paths
+                     if self._git(['ls-files', '-c', '-o', '--exclude-standard', '--', path], env).strip()]
+            if paths:
+                self._git(['add', '-A', '--'] + paths, env)
+            return self._git(['write-tree'], env).strip()
+        finally:
+            Path(index_file).unlink(missing_ok=True)
+
+    def create(self, paths, message):
+        """
+        Snapshot the current content of paths.
+
+        Returns:
+            tuple: (snapshot id or None, commit) - id is None when the paths match HEAD
+                   and HEAD is the snapshot
+
+        Raises:
+            GitChangeError
+        """
+        head = self.head()
+        tree = self._tree(paths, head)
+        if head and tree == self._git(['rev-parse', f'{head}^{{tree}}']).strip():
+            return None, head
+        snapshot_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        body = message + "\n\nPaths: " + " ".join(paths)
+        try:
+            self._git(['var', 'GIT_COMMITTER_IDENT'])
+            identity = None
+        except GitChangeError:
+            identity = FALLBACK_IDENTITY
+        commit = self._git(['commit-tree', tree] + (['-p', head] if head else []) + ['-m', body], identity).strip()
+        self._git(['update-ref', SNAPSHOT_REF_PREFIX + snapshot_id, commit])
+        return snapshot_id, commit
+
+    def list(self):
+        """Return [(snapshot id, commit, subject)], newest first."""
+        output = self._git(['for-each-ref', '--sort=-refname', '--format=%(refname)%00%(objectname)%00%(subject)',
+                            SNAPSHOT_REF_PREFIX])
+        snapshots = []
+        for line in output.splitlines():
+            ref, commit, subject = line.split('\0')
+            snapshots.append((ref[len(SNAPSHOT_REF_PREFIX):], commit, subject))
+        return snapshots
+
+    def paths(self, snapshot_id):
+        """Return the paths recorded in a snapshot."""
+        body = self._git(['log', '-1', '--format=%B', SNAPSHOT_REF_PREFIX + snapshot_id])
+        for line in body.splitlines():
+            if line.startswith("Paths: "):
+                return line[len("Paths: "):].split(" ")
+        return COURSE_PATHS
+
+    def restore(self, snapshot_id, dry_run=False):
+        """
+        Restore the snapshot's paths in the working tree. The current content, untracked
+        files included, is compared with the snapshot the same way create() builds it, so
+        files created since - a renumbered lesson's new name - are removed. Ignored files
+        are left alone. Returns the changed paths.
+        """
+        ref = SNAPSHOT_REF_PREFIX + snapshot_id
+        paths = self.paths(snapshot_id)
+        current = self._tree(paths, self.head())
+        output = self._git(['diff', '--name-status', '--no-renames', '-z', ref, current, '--'] + paths)
+        fields = output.split('\0')
+        status = dict(zip(fields[1::2], fields[0::2]))
+        if not dry_run and status:
+            for name, change in status.items():
+                if change == 'A':
+                    (self.course_path / name).unlink(missing_ok=True)
+            restored = [name for name, change in status.items() if change != 'A']
+            if restored:
+                # Exact names through a file: no pathspec matching, no command-line length limit
+                fd, pathspec_file = tempfile.mkstemp(dir=self.git_dir, prefix='snapshot-restore-')
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        f.write('\0'.join(restored))
+                    self._git(['restore', f'--source={ref}', '--worktree', f'--pathspec-from-file={pathspec_file}',
+                               '--pathspec-file-nul'], {'GIT_LITERAL_PATHSPECS': '1'})
+                finally:
+                    Path(pathspec_file).unlink(missing_ok=True)
+        return sorted(status)
+
+    def prune(self, keep=DEFAULT_KEEP):
+        """Delete all but the newest `keep` snapshot refs. Returns the number deleted."""
+        old = self.list()[keep:]
+        for snapshot_id, _, _ in old:
+            self._git(['update-ref', '-d', SNAPSHOT_REF_PREFIX + snapshot_id])
+        return len(old)
+
+
+def validate(metrics):
+    """Run the mandatory validation (README update) in this process. Returns its exit code."""
+    from course import run_command as run_course_command
+
+    with metrics.phase("validate"):
+        return run_course_command('outline', ['--update-readme'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a course tool with a git snapshot, logging and validation",
+                                     usage="%(prog)s [options] -- <command> [arguments...]")
+    parser.add_argument('--paths', nargs='+', metavar='PATHSPEC',
+                        help='Paths the command may modify (default: declared for the tool)')
+    parser.add_argument('--no-snapshot', action='store_true', help='Run without a snapshot')
+    parser.add_argument('--no-validate', action='store_true', help='Skip the README validation step')
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                        help=f'Snapshot refs to keep (default: {DEFAULT_KEEP})')
+    parser.add_argument('--log-dir', default=None, help='Automation log directory')
+    parser.add_argument('--list', action='store_true', help='List snapshots')
+    parser.add_argument('--restore', metavar='ID', help='Restore the paths of a snapshot')
+    parser.add_argument('--dry-run', action='store_true', help='With --restore: only list what would change')
+    add_instrumentation_arguments(parser)
+    parser.add_argument('command', nargs=argparse.REMAINDER, help='Command to run (after --)')
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+
+    if args.list or args.restore:
+        try:
+            snapshots = GitSnapshots()
+            if args.list:
+                for snapshot_id, commit, subject in snapshots.list():
+                    print(f"{snapshot_id}  {commit[:10]}  {subject}")
+                return 0
+            changed = snapshots.restore(args.restore, args.dry_run)
+        except GitChangeError as e:
+            print(f"❌ {e}")
+            return 1
+        verb = "Would restore" if args.dry_run else "Restored"
+        print(f"{verb} {len(changed)} paths from snapshot {args.restore}")
+        for path in changed:
+            print(f"  {path}")
+        return 0
+
+    if not command:
+        parser.print_usage()
+        print("Example: python scripts/safe_execute.py -- python scripts/renumber_lessons.py 5")
+        return 2
+
+    command_line = subprocess.list2cmdline(command)
+    metrics = Instrumentation.from_args("safe_execute", args)
+    with metrics.session():
+        print(f"Command: {command_line}")
+        print("\n[STEP 1/3] Creating safety snapshot...")
+        if args.no_snapshot:
+            print("⚠️  Snapshot skipped (--no-snapshot)")
+        else:
+            paths = args.paths or declared_paths(command)
+            try:
+                with metrics.phase("snapshot"):
+                    snapshots = GitSnapshots()
+                    snapshot_id, commit = snapshots.create(paths, f"Pre-execution snapshot - Before: {command_line}")
+                    snapshots.prune(args.keep)
+            except GitChangeError as e:
+                print(f"[FATAL] Failed to create safety snapshot: {e}. Aborting execution.")
+                metrics.set_status("snapshot_failed")
+                return 1
+            if snapshot_id:
+                print(f"✓ Snapshot {snapshot_id} ({commit[:10]}) of: {' '.join(paths)}")
+                print(f"  Undo with: python scripts/safe_execute.py --restore {snapshot_id}")
+            else:
+                print(f"✓ {' '.join(paths)} match HEAD ({commit[:10]}) - no snapshot needed")
+
+        print("\n[STEP 2/3] Executing command...")
+        with metrics.phase("execute"):
+            run_id, exit_code, _ = run_command(command, args.log_dir)
+        if exit_code != 0:
+            print(f"[ERROR] Command failed with exit code {exit_code}")
+            print(f"Query the log for details: python scripts/automation_log.py show {run_id}")
+            metrics.set_status("command_failed")
+            return exit_code
+        print("✓ Command executed successfully.")
+
+        validation_code = 0
+        if not args.no_validate:
+            print("\n[STEP 3/3] Running mandatory validation check...")
+            validation_code = validate(metrics)
+            if validation_code != 0:
+                print(f"[WARNING] Validation check failed with exit code {validation_code}")
+                metrics.set_status("validation_warning")
+            else:
+                print("✓ Validation completed successfully.")
+
+        timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in metrics.phases.items())
+        status = "SUCCESS ✓" if validation_code == 0 else "PRIMARY SUCCESS, VALIDATION WARNING ⚠"
+        print(f"\nStatus: {status} ({timings}; logged as run {run_id})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
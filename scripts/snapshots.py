@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Course Snapshots - Fast Manifest-Based Snapshot and Restore
+
+Records a manifest of (path, hash) for every lesson file (UU-LL-*.md) and
+course image (images/*.png, or images/<shard>/*.png in a sharded layout). File
+contents are kept once in a content-addressed object store, so a snapshot only
+copies files whose content is new. Restoring is a diff-and-apply: only paths
+whose hash differs are rewritten, files created after the snapshot are removed,
+and the tree ends up exactly as it was.
+
+Listing reads a small summary index (index.json: id, date, label and file
+count per snapshot) instead of every manifest; manifests it does not know yet,
+such as one written by a concurrent tool, are read once and added. Creating a
+snapshot prunes the store to the newest DEFAULT_KEEP snapshots.
+
+SAFETY FEATURES:
+- Unchanged files are detected from (size, mtime) without re-hashing
+- Restored files are staged first, then moved into place with os.replace
+- Dry-run mode to preview a restore
+- Non-interactive --yes mode for automation
+
+Usage:
+    python snapshots.py create [--label TEXT] [--keep N]
+    python snapshots.py list
+    python snapshots.py diff <snapshot_id>
+    python snapshots.py restore <snapshot_id> [--yes] [--dry-run]
+    python snapshots.py prune [--keep N]
+
+Examples:
+    python snapshots.py create --label "before unit 3 renumber"
+    python snapshots.py restore snapshot_2025_01_07_14_30_45 --yes
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+from course_model import LESSON_FILENAME_PATTERN, IMAGE_FILENAME_PATTERN, iter_image_files
+from course_locks import CourseLock, LockError, COURSE_SCOPE, add_lock_arguments
+
+
+SNAPSHOT_DIR = ".course_snapshots"
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+DEFAULT_KEEP = 10
+# Objects used this recently are never pruned: a concurrent snapshot may be about to reference them
+OBJECT_GRACE_SECONDS = 3600
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tracked_paths(course_path):
+    """
+    Return the course-relative paths covered by snapshots.
+
+    Args:
+        course_path (Path): Course root
+
+    Returns:
+        list: Lesson filenames and 'images/<name>.png' paths
+    """
+    paths = []
+    for entry in os.scandir(course_path):
+        if entry.is_file() and LESSON_FILENAME_PATTERN.match(entry.name):
+            paths.append(entry.name)
+    images_dir = course_path / "images"
+    if images_dir.is_dir():
+        paths.extend(f"images/{rel_path}" for rel_path, _ in iter_image_files(images_dir))
+    return sorted(paths)
+
+
+def snapshot_order(snapshot_id):
+    """Sort key of a snapshot id: its timestamp, then the number of ids taken in that second."""
+    parts = snapshot_id.split('_')
+    # snapshot_YYYY_MM_DD_HH_MM_SS, then _2, _3, ... for ids created in the same second
+    return '_'.join(parts[:7]), int(parts[7]) if len(parts) > 7 and parts[7].isdigit() else 1
+
+
+def path_unit(rel_path):
+    """Return the unit number of a tracked path (lesson or image), or None."""
+    name = rel_path.split('/')[-1]
+    match = LESSON_FILENAME_PATTERN.match(name) or IMAGE_FILENAME_PATTERN.match(name)
+    return int(match.group(1)) if match else None
+
+
+class SnapshotStore:
+    def __init__(self, course_path=None, store_dir=None):
+        """
+        Initialize the snapshot store.
+
+        Args:
+            course_path (str, optional): Course root (default: current directory)
+            store_dir (str, optional): Store location (default: <course>/.course_snapshots)
+        """
+        self.course_path = Path(course_path) if course_path else Path.cwd()
+        self.store_path = Path(store_dir) if store_dir else self.course_path / SNAPSHOT_DIR
+        self.objects_path = self.store_path / "objects"
+
+    def _object_path(self, file_hash):
+        return self.objects_path / file_hash[:2] / file_hash
+
+    def _manifest_path(self, snapshot_id):
+        return self.store_path / f"{snapshot_id}.json"
+
+    def _summaries(self, added=None):
+        """
+        Return {id: summary} from the summary index, brought in line with the manifests
+        on disk (only manifests missing from the index are read).
+
+        Args:
+            added (dict, optional): Summaries of just-written manifests, to record without reading them
+        """
+        index_path = self.store_path / INDEX_FILE
+        summaries = {}
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                summaries = data['snapshots']
+        except (OSError, ValueError, KeyError):
+            summaries = {}
+
+        on_disk = {path.stem for path in self.store_path.glob("snapshot_*.json")}
+        changed = bool(added)
+        summaries.update(added or {})
+        for snapshot_id in set(summaries) - on_disk:
+            del summaries[snapshot_id]
+            changed = True
+        for snapshot_id in on_disk - set(summaries):
+            try:
+                manifest = self.load(snapshot_id)
+            except (OSError, ValueError):
+                continue  # Reserved by a snapshot still being written
+            summaries[snapshot_id] = {
+                'id': manifest['id'],
+                'created': manifest['created'],
+                'label': manifest.get('label', ''),
+                'files': len(manifest['files'])
+            }
+            changed = True
+
+        if changed:
+            temp_path = index_path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'snapshots': summaries}, f, indent=1, sort_keys=True)
+            os.replace(temp_path, index_path)
+        return summaries
+
+    def list_snapshots(self):
+        """Return snapshot summaries (id, created, label, file count), newest first."""
+        if not self.store_path.exists():
+            return []
+        return sorted(self._summaries().values(), key=lambda s: snapshot_order(s['id']), reverse=True)
+
+    def latest(self):
+        """Return the newest snapshot id, or None."""
+        snapshots = self.list_snapshots()
+        return snapshots[0]['id'] if snapshots else None
+
+    def exists(self, snapshot_id):
+        """True if a snapshot with this id exists."""
+        return self._manifest_path(snapshot_id).exists()
+
+    def load(self, snapshot_id):
+        """Load a snapshot manifest."""
+        with open(self._manifest_path(snapshot_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def scan(self, reference=None):
+        """
+        Hash the current tree, reusing hashes from a reference manifest when
+        (size, mtime) are unchanged.
+
+        Args:
+            reference (dict, optional): {path: entry} from a previous manifest
+
+        Returns:
+            dict: {path: {'hash', 'size', 'mtime_ns'}}
+        """
+        reference = reference or {}
+        entries = {}
+        for rel_path in tracked_paths(self.course_path):
+            stat = (self.course_path / rel_path).stat()
+            known = reference.get(rel_path)
+            if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                file_hash = known['hash']
+            else:
+                file_hash = hash_file(self.course_path / rel_path)
+            entries[rel_path] = {'hash': file_hash, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        return entries
+
+    def create(self, label="", keep=DEFAULT_KEEP):
+        """
+        Create a snapshot of all lessons and images, then prune old ones.
+
+        Args:
+            label (str): Free-text description (e.g., the operation about to run)
+            keep (int, optional): Snapshots to keep afterwards (None: do not prune)
+
+        Returns:
+            str: The new snapshot id
+        """
+        latest = self.latest()
+        reference = self.load(latest)['files'] if latest else {}
+        files = self.scan(reference)
+
+        for rel_path, entry in files.items():
+            object_path = self._object_path(entry['hash'])
+            try:
+                os.utime(object_path)  # Mark as in use, so a concurrent prune keeps it
+            except FileNotFoundError:
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = object_path.with_suffix(f'.{os.getpid()}.tmp')
+                shutil.copyfile(self.course_path / rel_path, temp_path)
+                os.replace(temp_path, object_path)
+
+        # Reserve the id by creating its manifest exclusively (another tool may snapshot concurrently)
+        base_id = f"snapshot_{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}"
+        # Continue after the ids of this second still present: reusing a pruned one would sort it first
+        suffix = max((snapshot_order(path.stem)[1] for path in self.store_path.glob(f"{base_id}*.json")),
+                     default=0) + 1
+        snapshot_id = base_id if suffix == 1 else f"{base_id}_{suffix}"
+        suffix += 1
+        while True:
+            try:
+                open(self._manifest_path(snapshot_id), 'x').close()
+                break
+            except FileExistsError:
+                snapshot_id = f"{base_id}_{suffix}"
+                suffix += 1
+
+        manifest = {
+            'id': snapshot_id,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'label': label,
+            'files': files
+        }
+        temp_manifest = self._manifest_path(snapshot_id).with_suffix(f'.{os.getpid()}.tmp')
+        with open(temp_manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(temp_manifest, self._manifest_path(snapshot_id))
+
+        summaries = self._summaries({snapshot_id: {'id': snapshot_id, 'created': manifest['created'],
+                                                   'label': label, 'files': len(files)}})
+        if keep is not None and len(summaries) > keep:
+            self.prune(keep)
+        return snapshot_id
+
+    def diff(self, snapshot_id, units=None):
+        """
+        Compare the current tree with a snapshot.
+
+        Args:
+            snapshot_id (str): Snapshot to compare with
+            units (iterable, optional): Only compare lessons and images of these unit numbers
+
+        Returns:
+            dict: {'modified': [...], 'missing': [...], 'created': [...]} course-relative paths
+        """
+        files = self.load(snapshot_id)['files']
+        current = self.scan(files)
+        if units is not None:
+            units = {int(unit) for unit in units}
+            files = {path: entry for path, entry in files.items() if path_unit(path) in units}
+            current = {path: entry for path, entry in current.items() if path_unit(path) in units}
+        return {
+            'modified': sorted(p for p in files if p in current and current[p]['hash'] != files[p]['hash']),
+            'missing': sorted(p for p in files if p not in current),
+            'created': sorted(p for p in current if p not in files),
+        }
+
+    def restore(self, snapshot_id, dry_run=False, log=print, units=None):
+        """
+        Restore the tree to a snapshot, touching only paths that differ.
+
+        Args:
+            snapshot_id (str): Snapshot to restore
+            dry_run (bool): Only report what would change
+            log (callable): Message sink
+            units (iterable, optional): Only restore lessons and images of these unit numbers,
+                                        leaving other units (possibly changed concurrently) alone
+
+        Returns:
+            dict: The applied diff
+        """
+        files = self.load(snapshot_id)['files']
+        changes = self.diff(snapshot_id, units)
+        to_write = changes['modified'] + changes['missing']
+
+        if dry_run:
+            for rel_path in to_write:
+                log(f"DRY-RUN: Would restore: {rel_path}")
+            for rel_path in changes['created']:
+                log(f"DRY-RUN: Would remove: {rel_path}")
+            return changes
+
+        # Stage every restored file next to its target first, so the tree is
+        # only touched once all content is known to be available
+        staged = []
+        try:
+            for rel_path in to_write:
+                entry = files[rel_path]
+                target = self.course_path / rel_path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = target.with_name(target.name + ".restore.tmp")
+                shutil.copyfile(self._object_path(entry['hash']), temp_path)
+                staged.append((temp_path, target, entry))
+        except OSError:
+            for temp_path, _, _ in staged:
+                temp_path.unlink(missing_ok=True)
+            raise
+
+        for temp_path, target, entry in staged:
+            os.replace(temp_path, target)
+            os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+            log(f"Restored: {target.relative_to(self.course_path).as_posix()}")
+
+        for rel_path in changes['created']:
+            (self.course_path / rel_path).unlink()
+            log(f"Removed: {rel_path}")
+
+        return changes
+
+    def prune(self, keep=DEFAULT_KEEP):
+        """
+        Delete all but the newest snapshots and any objects no longer referenced
+        (except recently used ones).
+
+        Returns:
+            tuple: (snapshots_removed, objects_removed)
+        """
+        snapshots = self.list_snapshots()
+        removed = 0
+        for snapshot in snapshots[keep:]:
+            self._manifest_path(snapshot['id']).unlink(missing_ok=True)
+            removed += 1
+        if removed:
+            self._summaries()
+
+        referenced = set()
+        for snapshot in snapshots[:keep]:
+            try:
+                referenced.update(entry['hash'] for entry in self.load(snapshot['id'])['files'].values())
+            except FileNotFoundError:
+                continue  # Pruned concurrently
+
+        objects_removed = 0
+        cutoff = datetime.now().timestamp() - OBJECT_GRACE_SECONDS
+        if self.objects_path.exists():
+            for object_path in self.objects_path.glob("*/*"):
+                if object_path.name in referenced or object_path.suffix == '.tmp':
+                    continue
+                try:
+                    if object_path.stat().st_mtime < cutoff:
+                        object_path.unlink()
+                        objects_removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed, objects_removed
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Snapshot and restore course lessons and images",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python snapshots.py create --label "before renumber"
+  python snapshots.py list
+  python snapshots.py restore snapshot_2025_01_07_14_30_45 --dry-run
+  python snapshots.py restore snapshot_2025_01_07_14_30_45 --yes
+        """
+    )
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    create_parser = subparsers.add_parser('create', help='Create a snapshot')
+    create_parser.add_argument('--label', type=str, default='', help='Description of the snapshot')
+    create_parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                               help=f'Snapshots to keep afterwards (default: {DEFAULT_KEEP})')
+
+    subparsers.add_parser('list', help='List snapshots')
+
+    diff_parser = subparsers.add_parser('diff', help='Show what changed since a snapshot')
+    diff_parser.add_argument('snapshot_id')
+
+    restore_parser = subparsers.add_parser('restore', help='Restore a snapshot')
+    restore_parser.add_argument('snapshot_id')
+    restore_parser.add_argument('--yes', '-y', action='store_true', help='Skip the confirmation prompt')
+    restore_parser.add_argument('--dry-run', action='store_true', help='Preview without modifying files')
+    add_lock_arguments(restore_parser)
+
+    prune_parser = subparsers.add_parser('prune', help='Delete old snapshots')
+    prune_parser.add_argument('--keep', type=int, default=DEFAULT_KEEP,
+                              help=f'Snapshots to keep (default: {DEFAULT_KEEP})')
+
+    args = parser.parse_args()
+    store = SnapshotStore()
+
+    if args.action == 'create':
+        snapshot_id = store.create(args.label, args.keep)
+        print(f"✓ Created {snapshot_id} ({len(store.load(snapshot_id)['files'])} files)")
+        return 0
+
+    if args.action == 'list':
+        snapshots = store.list_snapshots()
+        if not snapshots:
+            print("(No snapshots found)")
+        for snapshot in snapshots:
+            label = f"  {snapshot['label']}" if snapshot['label'] else ""
+            print(f"  - {snapshot['id']}  {snapshot['files']} files{label}")
+        return 0
+
+    if args.action == 'prune':
+        removed, objects_removed = store.prune(args.keep)
+        print(f"✓ Removed {removed} snapshots and {objects_removed} unreferenced objects")
+        return 0
+
+    if not store.exists(args.snapshot_id):
+        print(f"ERROR: Snapshot '{args.snapshot_id}' not found")
+        return 1
+
+    if args.action == 'diff':
+        changes = store.diff(args.snapshot_id)
+        for kind in ('modified', 'missing', 'created'):
+            for rel_path in changes[kind]:
+                print(f"  {kind:<8} {rel_path}")
+        if not any(changes.values()):
+            print("✓ Tree matches the snapshot")
+        return 0
+
+    if not args.yes and not args.dry_run:
+        changes = store.diff(args.snapshot_id)
+        print(f"\nThis will restore {len(changes['modified']) + len(changes['missing'])} files "
+              f"and remove {len(changes['created'])} files created since {args.snapshot_id}.")
+        response = input("Continue with restore? (y/N): ").lower().strip()
+        if response not in ('y', 'yes'):
+            print("Restore cancelled by user")
+            return 1
+
+    lock = CourseLock([] if args.dry_run else [COURSE_SCOPE], "snapshots restore", timeout=args.lock_timeout)
+    try:
+        lock.acquire()
+    except LockError as e:
+        print(f"ERROR: Cannot restore while another operation is running: {e}")
+        return 1
+    try:
+        changes = store.restore(args.snapshot_id, dry_run=args.dry_run)
+    finally:
+        lock.release()
+    total = sum(len(paths) for paths in changes.values())
+    print(f"✓ {'Would apply' if args.dry_run else 'Applied'} {total} changes from {args.snapshot_id}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
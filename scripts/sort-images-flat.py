@@ -4,6 +4,9 @@ Ultra-Simple Image Sorting for GoldSim Course
 
 Moves UULL-named images from SnagIt to single global images folder.
 No lesson folders needed - everything is flat!
+Target names are checked against the image index first, so a capture never
+overwrites a different image that already has its name. Captures over the byte
+or pixel budget are recompressed or downscaled on the way in (see image_budget.py).
 
 Structure:
   goldsim-water-management-course/
@@ -15,14 +18,21 @@ Structure:
 Usage:
     python sort-images-flat.py
     python sort-images-flat.py --dry-run
+    python sort-images-flat.py --max-image-bytes 800KB --max-image-pixels 1920x1080
 """
 
 import os
 import re
-import shutil
 import argparse
 from pathlib import Path
 from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from course_locks import CourseLock, LockError, scopes_for, add_lock_arguments
+from image_index import ImageIndex, CONFLICT, DUPLICATE
+from image_headers import read_image_header, format_size
+from image_budget import ImageBudget, SHRUNK, add_budget_arguments
 
 
 def main():
@@ -35,9 +45,33 @@ def main():
                        help="Course root directory")
     parser.add_argument("--dry-run", "-d", action="store_true",
                        help="Preview without moving files")
+    add_budget_arguments(parser)
+    add_instrumentation_arguments(parser)
+    add_lock_arguments(parser)
     
     args = parser.parse_args()
     
+    # Lock the units of the images about to be moved
+    source_dir = Path(args.source)
+    scopes = [] if args.dry_run or not source_dir.exists() else scopes_for(source_dir.glob("*.png"))
+    try:
+        lock = CourseLock(scopes, "sort_images_flat", args.course_root, args.lock_timeout).acquire()
+    except LockError as e:
+        print(f"❌ Cannot sort images while another operation is running: {e}")
+        return 1
+    
+    metrics = Instrumentation.from_args("sort_images_flat", args)
+    try:
+        with metrics.session():
+            result = sort_flat(args, metrics)
+            metrics.set_status("success" if result == 0 else "failed")
+    finally:
+        lock.release()
+    return result
+
+
+def sort_flat(args, metrics):
+    """Move UULL-named PNGs from the source directory into the global images folder."""
     source_dir = Path(args.source)
     course_root = Path(args.course_root)
     global_images_dir = course_root / "images"
@@ -60,8 +94,10 @@ def main():
         print(f"❌ SnagIt directory not found: {source_dir}")
         return 1
     
-    png_files = list(source_dir.glob("*.png"))
-    all_files = list(source_dir.iterdir())
+    with metrics.phase("scan"):
+        png_files = list(source_dir.glob("*.png"))
+        all_files = list(source_dir.iterdir())
+    metrics.count("files_scanned", len(all_files))
     
     print(f"\nFound {len(png_files)} PNG files")
     print(f"Found {len(all_files) - len(png_files)} other files (will be ignored)")
@@ -76,12 +112,14 @@ def main():
     
     processed = 0
     skipped = 0
+    batch = []
     
     for png_file in png_files:
         filename_base = png_file.stem
         print(f"\nProcessing: {png_file.name}")
         
         # Try full UULL pattern first
+        metrics.count("regex_evaluations")
         match = uull_pattern.match(filename_base)
         if match:
             unit, lesson, name, seq, desc = match.groups()
@@ -89,6 +127,7 @@ def main():
             print(f"  ✅ UULL: Unit {unit}, Lesson {lesson}")
         else:
             # Try simple pattern
+            metrics.count("regex_evaluations")
             match = simple_pattern.match(filename_base)
             if match:
                 unit, lesson, name = match.groups()
@@ -98,27 +137,67 @@ def main():
                 print(f"  ⏭️  Skipping: Not UULL format")
                 skipped += 1
                 continue
+        batch.append((png_file, new_name))
+    
+    # Check every target name against the image index before moving anything
+    index = ImageIndex(course_root)
+    with metrics.phase("check"):
+        checked = index.check_batch(batch)
+    collisions = [item for item in checked if item[2] in (CONFLICT, DUPLICATE)]
+    if collisions:
+        print(f"\n⚠️  {len(collisions)} name collisions (these files are left in the source folder):")
+        for png_file, new_name, status, existing in collisions:
+            if status == DUPLICATE:
+                print(f"   {png_file.name} → images/{new_name}: another file in this batch maps to the same name")
+            else:
+                print(f"   {png_file.name} → images/{new_name}: images/{existing} already exists with different content")
+        metrics.count("collisions", len(collisions))
+    
+    budget = ImageBudget.from_args(args, metrics)
+    to_move = [(png_file, new_name) for png_file, new_name, status, _ in checked
+               if status not in (CONFLICT, DUPLICATE)]
+    
+    # Move to global images folder (into its shard folder in a sharded layout),
+    # shrinking captures that are over budget in a worker pool
+    if args.dry_run:
+        for png_file, new_name in to_move:
+            target_path = index.location(new_name)
+            problems = budget.violations(read_image_header(png_file))
+            note = f" (over budget: {', '.join(problems)})" if problems else ""
+            print(f"    [DRY RUN] Would move {png_file.name} to: {target_path.relative_to(course_root).as_posix()}{note}")
+    else:
+        targets = [(png_file, new_name, index.place(new_name)) for png_file, new_name in to_move]
         
-        # Move to global images folder
-        target_path = global_images_dir / new_name
-        
-        if args.dry_run:
-            print(f"    [DRY RUN] Would move to: images/{new_name}")
-        else:
+        def ingest(item):
+            png_file, _, target_path = item
             try:
-                shutil.move(str(png_file), str(target_path))
-                print(f"    ✅ Moved to: images/{new_name}")
-                processed += 1
+                return budget.ingest(png_file, target_path), None
             except Exception as e:
-                print(f"    ❌ Failed: {e}")
+                return None, e
         
-        if not args.dry_run:
+        with metrics.phase("move"):
+            with ThreadPoolExecutor(max_workers=budget.workers) as pool:
+                outcomes = list(pool.map(ingest, targets))
+        
+        results = []
+        for (png_file, new_name, target_path), (result, error) in zip(targets, outcomes):
+            if error:
+                print(f"    ❌ Failed to move {png_file.name}: {error}")
+                continue
+            index.add(new_name)
+            metrics.count("images_moved")
+            note = f" (shrunk to {format_size(result.bytes_after)})" if result.outcome == SHRUNK else ""
+            print(f"    ✅ Moved {png_file.name} to: {target_path.relative_to(course_root).as_posix()}{note}")
+            results.append(result)
             processed += 1
+        budget.report(results)
+    index.save()
     
     # Summary
     print(f"\n📋 Summary:")
     print(f"   UULL files processed: {processed}")
     print(f"   Non-UULL files skipped: {skipped}")
+    print(f"   Name collisions skipped: {len(collisions)}")
     print(f"   Other files ignored: {len(all_files) - len(png_files)}")
     
     if args.dry_run:
@@ -17,22 +17,38 @@ Examples:
 Usage:
     python sort_images.py
     python sort_images.py --source "C:\\custom\\path" --dry-run
+    python sort_images.py --max-image-bytes 800KB --max-image-pixels 1920x1080
     python sort_images.py --help
+
+Captures over the byte or pixel budget are recompressed or downscaled as they
+are moved into raw/ (see image_budget.py), so heavy images never reach the repo.
 """
 
 import os
 import re
+import sys
 import shutil
 import argparse
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Instrumentation, add_instrumentation_arguments
+from course_locks import CourseLock, LockError, COURSE_SCOPE, add_lock_arguments
+from image_headers import HeaderCache, describe, format_size
+from image_budget import ImageBudget, SHRUNK, add_budget_arguments
 
 
 class ImageSorter:
-    def __init__(self, course_root: str, source_dir: str, dry_run: bool = False):
+    def __init__(self, course_root: str, source_dir: str, dry_run: bool = False,
+                 metrics: Optional[Instrumentation] = None, budget: Optional[ImageBudget] = None):
         self.course_root = Path(course_root)
         self.source_dir = Path(source_dir)
         self.dry_run = dry_run
+        self.metrics = metrics or Instrumentation("sort_images")
+        self.headers = HeaderCache(self.course_root)
+        self.budget = budget or ImageBudget(metrics=self.metrics)
+        self.ingested = []
         
         # UULL pattern regex
         self.full_pattern = re.compile(r'^(\d{2})\s+(\d{2})\s+([^-]+)-(\d+)-(.+)$')
@@ -44,6 +60,7 @@ class ImageSorter:
             raise FileNotFoundError(f"Source directory not found: {self.source_dir}")
         
         images = list(self.source_dir.glob("*.png"))
+        self.metrics.count("files_scanned", len(images))
         print(f"Found {len(images)} PNG images in {self.source_dir}")
         return images
     
@@ -52,6 +69,7 @@ class ImageSorter:
         filename = image_path.stem  # filename without extension
         
         # Try full pattern first: UU LL Name-sequence-description
+        self.metrics.count("regex_evaluations")
         match = self.full_pattern.match(filename)
         if match:
             return {
@@ -65,6 +83,7 @@ class ImageSorter:
             }
         
         # Try simple pattern: UU LL Name
+        self.metrics.count("regex_evaluations")
         match = self.simple_pattern.match(filename)
         if match:
             return {
@@ -121,8 +140,8 @@ class ImageSorter:
         
         if not self.dry_run:
             for dir_path in dirs.values():
-                dir_path.mkdir(parents=True, exist_ok=True)
                 if not dir_path.exists():
+                    dir_path.mkdir(parents=True, exist_ok=True)
                     print(f"    📁 Created: {dir_path}")
         
         return dirs
@@ -136,39 +155,60 @@ class ImageSorter:
         
         return f"{unit}-{lesson}-{sequence}-{description}.png"
     
-    def move_image(self, source_path: Path, image_info: Dict[str, str], lesson_dir: Path) -> bool:
-        """Move and organize a single image."""
+    def move_image(self, source_path: Path, image_info: Dict[str, str],
+                   dirs: Dict[str, Path]) -> Tuple[bool, List[str]]:
+        """Move and organize a single image. Returns (success, report lines).
+
+        Runs in a worker thread, so nothing is printed here: the caller prints
+        the report lines in order once the whole group has been moved.
+        """
+        lines = []
         try:
-            # Create directory structure
-            dirs = self.create_image_directories(lesson_dir)
-            
             # Generate new filename
             new_filename = self.generate_new_filename(image_info)
             
             raw_dest = dirs['raw'] / new_filename
             processed_dest = dirs['processed'] / new_filename
             
+            header = image_info.get('header')
             if self.dry_run:
-                print(f"    [DRY RUN] Would move: {image_info['original_name']}")
-                print(f"              to: raw/{new_filename}")
-                return True
+                problems = self.budget.violations(header)
+                lines.append(f"    [DRY RUN] Would move: {image_info['original_name']}")
+                lines.append(f"              to: raw/{new_filename}"
+                             + (f" (over budget: {', '.join(problems)})" if problems else ""))
+                return True, lines
             else:
-                # Move to raw directory
-                shutil.move(str(source_path), str(raw_dest))
-                print(f"    ✅ Moved to raw: {new_filename}")
+                # Move to raw directory, shrinking the capture if it is over budget
+                result = self.budget.ingest(source_path, raw_dest, header)
+                self.ingested.append(result)
+                if result.outcome == SHRUNK:
+                    lines.append(f"    ✅ Moved to raw: {new_filename} (shrunk {format_size(result.bytes_before)}"
+                                 f" → {format_size(result.bytes_after)})")
+                else:
+                    lines.append(f"    ✅ Moved to raw: {new_filename}" + (f" ({describe(header)})" if header else ""))
                 
                 # Copy to processed directory for editing
                 shutil.copy2(str(raw_dest), str(processed_dest))
-                print(f"    ✅ Copied to processed: {new_filename}")
+                self.metrics.count("images_moved")
+                self.metrics.count("bytes_copied", processed_dest.stat().st_size)
+                lines.append(f"    ✅ Copied to processed: {new_filename}")
                 
-                return True
+                return True, lines
                 
         except Exception as e:
-            print(f"    ❌ Failed to move {image_info['original_name']}: {e}")
-            return False
+            lines.append(f"    ❌ Failed to move {image_info['original_name']}: {e}")
+            return False, lines
     
     def sort_images(self) -> Tuple[int, int]:
         """Main sorting function. Returns (successful, failed) counts."""
+        with self.metrics.session():
+            successful, failed = self._sort_images()
+            if failed and not successful:
+                self.metrics.set_status("failed")
+        return successful, failed
+    
+    def _sort_images(self) -> Tuple[int, int]:
+        """Parse, group and move the captured images."""
         print("=" * 60)
         print("SORTING CAPTURED IMAGES INTO LESSON FOLDERS")
         print("=" * 60)
@@ -177,7 +217,8 @@ class ImageSorter:
             print("\n*** DRY RUN MODE - No files will be moved ***\n")
         
         # Find all images
-        images = self.find_images()
+        with self.metrics.phase("scan"):
+            images = self.find_images()
         if not images:
             print("No images found to process.")
             return 0, 0
@@ -185,12 +226,20 @@ class ImageSorter:
         # Parse and group images
         parsed_images = []
         unrecognized = []
+        invalid = []
         
         for image_path in images:
             print(f"Checking: {image_path.name}")
             image_info = self.parse_filename(image_path)
             
             if image_info:
+                # Header only - the capture is never decoded
+                with self.metrics.phase("read_headers"):
+                    image_info['header'] = self.headers.get(image_path)
+                if image_info['header'] is None or image_info['header'].format != 'png':
+                    invalid.append(image_path)
+                    print(f"  ⚠️  Skipping (not a readable PNG): {image_path.name}")
+                    continue
                 image_info['path'] = image_path
                 parsed_images.append(image_info)
                 
@@ -201,6 +250,10 @@ class ImageSorter:
                 unrecognized.append(image_path)
                 print(f"  ⏭️  Skipping (not UULL): {image_path.name}")
         
+        self.headers.save()
+        if invalid:
+            print(f"\n⚠️  {len(invalid)} UULL-named files are not readable PNGs (left in SnagIt folder)")
+        
         if not parsed_images and unrecognized:
             print("\n📋 No UULL-named images found to process")
             print(f"   Found {len(unrecognized)} non-UULL files (left in SnagIt folder)")
@@ -231,7 +284,8 @@ class ImageSorter:
             print(f"   Images: {len(images_in_group)}")
             
             # Find lesson directory
-            lesson_dir = self.find_lesson_directory(unit, lesson)
+            with self.metrics.phase("find_lesson"):
+                lesson_dir = self.find_lesson_directory(unit, lesson)
             if not lesson_dir:
                 print(f"   ⏭️  Skipping - lesson directory not found")
                 failed += len(images_in_group)
@@ -239,13 +293,28 @@ class ImageSorter:
             
             print(f"   Target: {lesson_dir.name}")
             
-            # Move each image in the group
-            for image_info in images_in_group:
-                if self.move_image(image_info['path'], image_info, lesson_dir):
+            try:
+                dirs = self.create_image_directories(lesson_dir)
+            except OSError as e:
+                print(f"   ❌ Could not create the image folders: {e}")
+                failed += len(images_in_group)
+                continue
+            
+            # Move the images of the group in a worker pool (over-budget captures are shrunk on the way)
+            with self.metrics.phase("move"):
+                with ThreadPoolExecutor(max_workers=self.budget.workers) as pool:
+                    moved = list(pool.map(lambda info: self.move_image(info['path'], info, dirs),
+                                          images_in_group))
+            for ok, lines in moved:
+                for line in lines:
+                    print(line)
+                if ok:
                     successful += 1
                 else:
                     failed += 1
         
+        self.budget.report(self.ingested)
+        
         # Report unrecognized images (informational only)
         if unrecognized:
             print(f"\n📋 Non-UULL files ignored: {len(unrecognized)}")
@@ -316,28 +385,42 @@ def main():
         help="Show what would be done without actually moving files"
     )
     
+    add_budget_arguments(parser)
+    add_instrumentation_arguments(parser)
+    add_lock_arguments(parser)
+    
     args = parser.parse_args()
     
+    # Images go into lesson folders of any unit, so the whole course is locked
+    lock = CourseLock([] if args.dry_run else [COURSE_SCOPE], "sort_images", args.course_root, args.lock_timeout)
+    try:
+        lock.acquire()
+    except LockError as e:
+        print(f"❌ Cannot sort images while another operation is running: {e}")
+        return 1
+    
     try:
+        metrics = Instrumentation.from_args("sort_images", args)
         sorter = ImageSorter(
             course_root=args.course_root,
             source_dir=args.source,
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            metrics=metrics,
+            budget=ImageBudget.from_args(args, metrics)
         )
         
         successful, failed = sorter.sort_images()
         
-        # Exit with appropriate code
-        # Success if any files were processed successfully, even if some failed
-        if successful > 0 or (successful == 0 and failed == 0):
-            exit(0)  # Success
-        else:
-            exit(1)  # Only exit with error if no successes and there were failures
+        # Success if any files were processed successfully, even if some failed;
+        # only an error if there were failures and no successes
+        return 0 if successful > 0 or failed == 0 else 1
             
     except Exception as e:
         print(f"❌ Error: {e}")
-        exit(1)
+        return 1
+    finally:
+        lock.release()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Link Checker Tests
+
+Runs check_urls against the offline StubServer - no network is used - and
+checks what a lesson author relies on:
+
+    status           a 200 is working, a 404 is broken
+    redirects        a redirect chain is followed to its final URL, and one
+                     longer than MAX_REDIRECTS is reported as an error
+    HEAD fallback    a server that refuses HEAD (405) is asked again with GET
+    cache            a working result is reused within the TTL and re-checked
+                     once it expires; broken results are never reused
+
+Usage:
+    python test_link_checker.py                          # unittest
+    python -m pytest scripts/test_link_checker.py        # Same, under pytest
+"""
+
+import sys
+import time
+import tempfile
+import unittest
+
+from instrumentation import Instrumentation
+from link_checker import LinkCache, StubServer, check_urls, MAX_REDIRECTS
+
+
+class LinkCheckerTests(unittest.TestCase):
+    def check(self, urls, responses=None, cache=None):
+        """Check URLs against a stub server; returns (results, [(method, url)] the stub received)."""
+        with StubServer(responses) as stub:
+            results = check_urls(urls, cache=cache, workers=4, host_delay=0, timeout=5,
+                                 stub_address=stub.address,
+                                 metrics=Instrumentation("link_checker", metrics_file=''))
+        return results, stub.requests
+
+    def test_working_link(self):
+        url = "https://example.com/ok"
+        results, requests = self.check([url])
+        self.assertTrue(results[url].ok)
+        self.assertEqual(results[url].status, 200)
+        self.assertEqual(results[url].final_url, url)
+        self.assertEqual(requests, [('HEAD', url)])
+
+    def test_broken_link(self):
+        url = "https://example.com/missing"
+        results, _ = self.check([url], {url: 404})
+        self.assertFalse(results[url].ok)
+        self.assertEqual(results[url].status, 404)
+        self.assertIsNone(results[url].error)
+
+    def test_redirect_chain(self):
+        start = "https://example.com/old"
+        responses = {
+            start: {'status': 301, 'location': "https://example.org/moved"},
+            "https://example.org/moved": {'status': 302, 'location': "/final"},  # Relative to the current host
+        }
+        results, requests = self.check([start], responses)
+        self.assertTrue(results[start].ok)
+        self.assertEqual(results[start].final_url, "https://example.org/final")
+        self.assertEqual([url for _, url in requests],
+                         [start, "https://example.org/moved", "https://example.org/final"])
+
+    def test_redirect_loop_is_an_error(self):
+        url = "https://example.com/loop"
+        results, requests = self.check([url], {url: {'status': 301, 'location': url}})
+        self.assertFalse(results[url].ok)
+        self.assertIn("redirects", results[url].error)
+        self.assertEqual(len(requests), MAX_REDIRECTS + 1)
+
+    def test_head_rejected_falls_back_to_get(self):
+        url = "https://example.com/no-head"
+        results, requests = self.check([url], {url: {'status': 200, 'head_status': 405}})
+        self.assertTrue(results[url].ok)
+        self.assertEqual(results[url].status, 200)
+        self.assertEqual(requests, [('HEAD', url), ('GET', url)])
+
+    def test_cache_ttl(self):
+        working, broken = "https://example.com/ok", "https://example.com/missing"
+        with tempfile.TemporaryDirectory() as course:
+            cache = LinkCache(course, ttl_hours=1)
+            _, requests = self.check([working, broken], {broken: 404}, cache)
+            self.assertEqual(len(requests), 2)
+            cache.save()
+
+            # Within the TTL only the broken link is re-checked (and the cache survives a reload)
+            cache = LinkCache(course, ttl_hours=1)
+            results, requests = self.check([working, broken], {broken: 404}, cache)
+            self.assertEqual(requests, [('HEAD', broken)])
+            self.assertTrue(results[working].ok)
+
+            # Once the working result is older than the TTL it is checked again
+            checked_at = cache.results[working].checked_at
+            self.assertIsNotNone(cache.get(working, now=checked_at + 3599))
+            self.assertIsNone(cache.get(working, now=checked_at + 3601))
+            cache.put(cache.results[working]._replace(checked_at=time.time() - 3601))
+            _, requests = self.check([working], cache=cache)
+            self.assertEqual(requests, [('HEAD', working)])
+            self.assertGreater(cache.results[working].checked_at, checked_at)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if unittest.main(exit=False).result.wasSuccessful() else 1)
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Renumbering Safety Harness - Property and Stress Tests
+
+Generates randomized course layouts in temporary directories - gaps in the
+numbering, lessons sharing a number, lessons without a "# Lesson N" heading,
+images for lessons that do not exist - and runs random sequences of
+LessonRenumberingTool and GapClosingTool operations on them. After every
+operation the tree is checked against an independent model of what the
+operation must do:
+
+    no lost files        the multiset of file contents is unchanged
+    no collisions        every lesson and image name is unique
+    lessons renumbered   numbers (and headings) are what the operation implies,
+                         the order of lessons within a unit is preserved
+    images follow        images of a renumbered lesson carry its new number
+                         (gap closing; renumbering leaves images alone)
+    safe refusal         an operation the model considers invalid fails and
+                         leaves the tree byte-for-byte unchanged
+
+Usage:
+    python test_renumber_safety.py                       # Property tests (unittest)
+    python -m pytest scripts/test_renumber_safety.py     # Same, under pytest
+    python test_renumber_safety.py --stress --lessons 800 --images 4000
+                                                         # Rename-path benchmark
+
+RENUMBER_SAFETY_SEEDS sets the number of random layouts per property test.
+"""
+
+import io
+import os
+import re
+import sys
+import random
+import hashlib
+import argparse
+import tempfile
+import unittest
+from pathlib import Path
+from contextlib import contextmanager, redirect_stdout
+from collections import Counter
+
+from instrumentation import Instrumentation
+from renumber_lessons import LessonRenumberingTool
+from close_lesson_gaps import GapClosingTool, CourseGapClosingTool
+from lesson_headings import sync_heading
+from lesson_parser import LessonIndex
+
+
+SEEDS_ENV_VAR = "RENUMBER_SAFETY_SEEDS"
+DEFAULT_SEEDS = 12
+MAX_LESSON_NUMBER = 99
+
+LESSON_NAME = re.compile(r'^(\d{2})-(\d{2})-(.+)\.md$')
+IMAGE_NAME = re.compile(r'^(\d{2})_(\d{2})_(.+)\.png$')
+HEADING = re.compile(r'^(#\s+Lesson\s+)(\d+)', re.IGNORECASE | re.MULTILINE)
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Screenshot names that recur across lessons, as in the real course
+COMMON_IMAGE_NAMES = ['Overview', 'Dashboard', 'Model', 'Results', 'Settings']
+
+
+def _word(rng):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(5, 9)))
+
+
+def generate_layout(rng, units=3, lessons=(3, 12), gap_rate=0.3, duplicate_rate=0.0,
+                    images_per_lesson=(0, 3), orphan_images=0, heading_rate=0.9, common_image_rate=0.3,
+                    max_number=98):
+    """
+    Generate a random course layout.
+
+    Args:
+        rng (random.Random): Source of randomness
+        units (int): Number of units
+        lessons (tuple): (min, max) lessons per unit
+        gap_rate (float): Chance that a lesson number is skipped before a lesson
+        duplicate_rate (float): Chance that a lesson reuses the previous lesson's number
+        images_per_lesson (tuple): (min, max) images per lesson
+        orphan_images (int): Images per unit named for lessons that do not exist
+        heading_rate (float): Chance that a lesson has a "# Lesson N" heading
+        common_image_rate (float): Chance that an image uses a name other lessons use too
+        max_number (int): Highest lesson number to generate
+
+    Returns:
+        dict: Course-relative path -> file content (bytes); slugs are unique in the course
+    """
+    files, slugs = {}, set()
+
+    def unique_slug():
+        while True:
+            slug = '-'.join(_word(rng) for _ in range(3))
+            if slug not in slugs:
+                slugs.add(slug)
+                return slug
+
+    for unit in sorted(rng.sample(range(1, 13), units)):
+        number, used = 0, set()
+        for _ in range(rng.randint(*lessons)):
+            if not (number and rng.random() < duplicate_rate):
+                number += 1
+                while rng.random() < gap_rate:
+                    number += 1
+            if number > max_number:
+                break
+            used.add(number)
+            slug = unique_slug()
+            body = '\n'.join(' '.join(_word(rng) for _ in range(8)) for _ in range(rng.randint(3, 12)))
+            heading = f"# Lesson {number}: {slug.replace('-', ' ').title()}\n\n" if rng.random() < heading_rate else ""
+            files[f"{unit:02d}-{number:02d}-{slug}.md"] = f"{heading}{body}\n".encode('utf-8')
+            for _ in range(rng.randint(*images_per_lesson)):
+                description = (rng.choice(COMMON_IMAGE_NAMES) if rng.random() < common_image_rate
+                               else _word(rng).title())
+                name = f"{unit:02d}_{number:02d}_{description}.png"
+                files[f"images/{name}"] = PNG_SIGNATURE + rng.randbytes(rng.randint(16, 64))
+        free = [n for n in range(1, max_number + 1) if n not in used]
+        for _ in range(orphan_images):
+            description = (rng.choice(COMMON_IMAGE_NAMES) if rng.random() < common_image_rate
+                           else _word(rng).title())
+            name = f"{unit:02d}_{rng.choice(free):02d}_{description}.png"
+            files[f"images/{name}"] = PNG_SIGNATURE + rng.randbytes(32)
+    return files
+
+
+def write_layout(root, files):
+    (root / "images").mkdir(exist_ok=True)
+    for rel_path, content in files.items():
+        (root / rel_path).write_bytes(content)
+
+
+def read_tree(root):
+    """Return the lessons and images of a course as {relative path: content}."""
+    files = {}
+    for entry in os.scandir(root):
+        if entry.is_file() and LESSON_NAME.match(entry.name):
+            files[entry.name] = Path(entry.path).read_bytes()
+    images = root / "images"
+    if images.is_dir():
+        for entry in os.scandir(images):
+            if entry.is_file() and IMAGE_NAME.match(entry.name):
+                files[f"images/{entry.name}"] = Path(entry.path).read_bytes()
+    return files
+
+
+def _digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _without_heading_number(content):
+    """Lesson content with the heading number blanked, to compare bodies across renumbering."""
+    return HEADING.sub(lambda m: m.group(1) + "#", content.decode('utf-8'), count=1)
+
+
+def _heading_number(content):
+    match = HEADING.search(content.decode('utf-8'))
+    return int(match.group(2)) if match else None
+
+
+def _lessons(files):
+    """{slug: (unit, number, name, content)} for the lessons of a tree."""
+    lessons = {}
+    for name, content in files.items():
+        match = LESSON_NAME.match(name)
+        if match:
+            lessons[match.group(3)] = (int(match.group(1)), int(match.group(2)), name, content)
+    return lessons
+
+
+@contextmanager
+def course_dir(files):
+    """A temporary course holding files, entered as the working directory (the tools use the cwd)."""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="renumber_safety_") as temp:
+        root = Path(temp)
+        write_layout(root, files)
+        os.chdir(root)
+        try:
+            yield root
+        finally:
+            os.chdir(previous)
+
+
+def run_tool(tool):
+    """Run a tool quietly. Returns (success, captured output)."""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        success = tool.run()
+    return success, output.getvalue()
+
+
+def renumber(insertion_point, metrics=None):
+    return run_tool(LessonRenumberingTool(insertion_point, backup_dir="backup_renumber",
+                                          metrics=metrics or Instrumentation("renumber_lessons", metrics_file='')))
+
+
+def close_gaps(unit, metrics=None):
+    return run_tool(GapClosingTool(f"{unit:02d}", backup_dir="backup_gaps",
+                                   metrics=metrics or Instrumentation("close_lesson_gaps", metrics_file='')))
+
+
+def renumber_is_valid(before, insertion_point):
+    """The model's view: renumbering must refuse to push a lesson past 99."""
+    return all(number + 1 <= MAX_LESSON_NUMBER
+               for _, number, _, _ in _lessons(before).values() if number >= insertion_point)
+
+
+def _gap_targets(lessons, unit):
+    """{old number: set of possible new numbers} of a unit's lessons after gap closing."""
+    slugs = sorted((slug for slug, lesson in lessons.items() if lesson[0] == unit), key=lambda slug: lessons[slug][1])
+    targets = {}
+    for new_number, slug in enumerate(slugs, 1):
+        targets.setdefault(lessons[slug][1], set()).add(new_number)
+    return targets
+
+
+def gap_closing_may_conflict(before, unit):
+    """
+    The model's view: gap closing may refuse when a moving image would land on the
+    name of an image that stays (an orphan, or one whose lesson keeps its number).
+    """
+    targets = _gap_targets(_lessons(before), unit)
+    moving, staying = [], set()
+    for name in before:
+        match = IMAGE_NAME.match(name[len('images/'):]) if name.startswith('images/') else None
+        if not match or int(match.group(1)) != unit:
+            continue
+        number = int(match.group(2))
+        if targets.get(number, {number}) == {number}:
+            staying.add(name.casefold())
+        else:
+            moving.append((number, match.group(3)))
+    return any(f"images/{unit:02d}_{new_number:02d}_{suffix}.png".casefold() in staying
+               for number, suffix in moving for new_number in targets[number] - {number})
+
+
+class RenumberSafetyCase(unittest.TestCase):
+    """Invariant checks shared by the property and stress tests."""
+
+    def assert_nothing_lost(self, before, after):
+        self.assertEqual(Counter(map(_digest, (c for n, c in before.items() if n.startswith('images/')))),
+                         Counter(map(_digest, (c for n, c in after.items() if n.startswith('images/')))),
+                         "images were lost or overwritten")
+        self.assertEqual(Counter(map(_without_heading_number, (c for n, c in before.items() if LESSON_NAME.match(n)))),
+                         Counter(map(_without_heading_number, (c for n, c in after.items() if LESSON_NAME.match(n)))),
+                         "lessons were lost or changed beyond their heading number")
+        folded = Counter(name.casefold() for name in after)
+        self.assertFalse([name for name, count in folded.items() if count > 1], "names collide")
+
+    def assert_renumbered(self, before, after, insertion_point):
+        self.assert_nothing_lost(before, after)
+        old, new = _lessons(before), _lessons(after)
+        self.assertEqual(set(old), set(new), "lesson slugs changed")
+        for slug, (unit, number, _, content) in old.items():
+            expected = number + 1 if number >= insertion_point else number
+            new_unit, new_number, name, new_content = new[slug]
+            self.assertEqual((new_unit, new_number), (unit, expected), f"{name} has the wrong number")
+            if _heading_number(content) is not None:
+                self.assertEqual(_heading_number(new_content), new_number if expected != number
+                                 else _heading_number(content), f"{name} heading not synced")
+        self.assertEqual({n: c for n, c in before.items() if n.startswith('images/')},
+                         {n: c for n, c in after.items() if n.startswith('images/')},
+                         "renumbering changed images")
+
+    def assert_gaps_closed(self, before, after, unit):
+        self.assert_nothing_lost(before, after)
+        old, new = _lessons(before), _lessons(after)
+        self.assertEqual(set(old), set(new), "lesson slugs changed")
+        unit_slugs = sorted((slug for slug, lesson in old.items() if lesson[0] == unit),
+                            key=lambda slug: old[slug][1])
+        self.assertEqual(sorted(new[slug][1] for slug in unit_slugs), list(range(1, len(unit_slugs) + 1)),
+                         f"unit {unit:02d} is not numbered 1..n")
+        for first, second in zip(unit_slugs, unit_slugs[1:]):
+            if old[first][1] < old[second][1]:
+                self.assertLess(new[first][1], new[second][1], f"unit {unit:02d} lessons changed order")
+        for slug, (old_unit, number, name, content) in old.items():
+            if old_unit != unit:
+                self.assertEqual(new[slug][2:], (name, content), f"{name} (another unit) changed")
+            elif _heading_number(content) is not None and number != new[slug][1]:
+                self.assertEqual(_heading_number(new[slug][3]), new[slug][1], f"{new[slug][2]} heading not synced")
+
+        # Images follow their lesson: the new number is that of a lesson that had the old number
+        targets = _gap_targets(old, unit)
+        after_images = {_digest(c): n for n, c in after.items() if n.startswith('images/')}
+        for name, content in before.items():
+            match = IMAGE_NAME.match(name[len('images/'):]) if name.startswith('images/') else None
+            if not match:
+                continue
+            image_unit, number, suffix = int(match.group(1)), int(match.group(2)), match.group(3)
+            new_name = after_images[_digest(content)][len('images/'):]
+            if image_unit != unit or number not in targets:
+                self.assertEqual(new_name, name[len('images/'):], f"{name} moved although its lesson did not")
+                continue
+            new_match = IMAGE_NAME.match(new_name)
+            self.assertEqual(new_match.group(3), suffix, f"{name} lost its description")
+            self.assertIn(int(new_match.group(2)), targets[number], f"{name} did not follow its lesson")
+
+    def apply(self, operation, argument, before, root):
+        """Run one operation and check it against the model. Returns the new tree."""
+        if operation == 'renumber':
+            success, output = renumber(argument)
+        else:
+            success, output = close_gaps(argument)
+        after = read_tree(root)
+        if operation == 'renumber' and not renumber_is_valid(before, argument):
+            self.assertFalse(success, f"renumber {argument} should refuse lessons past {MAX_LESSON_NUMBER}")
+            self.assertEqual(before, after, "a refused renumber changed files")
+            return after
+        if operation == 'close' and not success and gap_closing_may_conflict(before, argument):
+            self.assertIn("Conflict", output)
+            self.assertEqual(before, after, "a refused gap closing changed files")
+            return after
+        self.assertTrue(success, f"{operation} {argument} failed:\n{output[-2000:]}")
+        if operation == 'renumber':
+            self.assert_renumbered(before, after, argument)
+        else:
+            self.assert_gaps_closed(before, after, argument)
+        return after
+
+
+def _seeds():
+    return range(int(os.environ.get(SEEDS_ENV_VAR, DEFAULT_SEEDS)))
+
+
+class RenumberPropertyTests(RenumberSafetyCase):
+    def run_sequence(self, rng, files, steps):
+        with course_dir(files) as root:
+            tree = read_tree(root)
+            units = sorted({int(name[:2]) for name in tree if LESSON_NAME.match(name)})
+            for _ in range(steps):
+                if rng.random() < 0.5:
+                    operation, argument = 'renumber', rng.randint(1, 12)
+                else:
+                    operation, argument = 'close', rng.choice(units)
+                tree = self.apply(operation, argument, tree, root)
+
+    def test_gap_closing_with_gaps_and_orphans(self):
+        for seed in _seeds():
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                files = generate_layout(rng, units=rng.randint(1, 4), gap_rate=0.4, orphan_images=2)
+                with course_dir(files) as root:
+                    tree = read_tree(root)
+                    for unit in sorted({int(name[:2]) for name in tree if LESSON_NAME.match(name)}):
+                        tree = self.apply('close', unit, tree, root)
+
+    def test_gap_closing_with_duplicate_numbers(self):
+        for seed in _seeds():
+            with self.subTest(seed=seed):
+                rng = random.Random(1000 + seed)
+                files = generate_layout(rng, units=2, gap_rate=0.3, duplicate_rate=0.3,
+                                        images_per_lesson=(1, 3))
+                with course_dir(files) as root:
+                    tree = read_tree(root)
+                    for unit in sorted({int(name[:2]) for name in tree if LESSON_NAME.match(name)}):
+                        tree = self.apply('close', unit, tree, root)
+
+    def test_renumber_then_close_sequences(self):
+        for seed in _seeds():
+            with self.subTest(seed=seed):
+                rng = random.Random(2000 + seed)
+                files = generate_layout(rng, units=rng.randint(1, 3), gap_rate=0.2, duplicate_rate=0.1)
+                self.run_sequence(rng, files, steps=6)
+
+    def test_gap_closing_refuses_to_overwrite_orphan_images(self):
+        files = {"01-01-first-lesson.md": b"# Lesson 1: First\n\nbody\n",
+                 "01-03-third-lesson.md": b"# Lesson 3: Third\n\nbody\n",
+                 "images/01_03_Overview.png": PNG_SIGNATURE + b"lesson three",
+                 "images/01_02_Overview.png": PNG_SIGNATURE + b"orphan"}
+        with course_dir(files) as root:
+            before = read_tree(root)
+            self.assertTrue(gap_closing_may_conflict(before, 1))
+            success, output = close_gaps(1)
+            self.assertFalse(success, "gap closing should refuse to overwrite 01_02_Overview.png")
+            self.assertIn("Conflict", output)
+            self.assertEqual(before, read_tree(root), "a refused gap closing changed files")
+
+    def test_gap_closing_all_replans_under_the_locks(self):
+        files = {"01-01-first-lesson.md": b"# Lesson 1: First\n\nbody\n",
+                 "01-03-third-lesson.md": b"# Lesson 3: Third\n\nbody\n",
+                 "images/01_03_Overview.png": PNG_SIGNATURE + b"lesson three"}
+
+        class RacedTool(CourseGapClosingTool):
+            def lock_units(self):
+                # Another operation closes the gap while this one waits for the locks
+                os.rename("01-03-third-lesson.md", "01-02-third-lesson.md")
+                os.rename("images/01_03_Overview.png", "images/01_02_Overview.png")
+                return super().lock_units()
+
+        with course_dir(files) as root:
+            tool = RacedTool(backup_dir="backup_gaps", metrics=Instrumentation("close_lesson_gaps", metrics_file=''))
+            success, output = run_tool(tool)
+            self.assertFalse(success, "a stale plan was executed")
+            self.assertIn("changed while waiting", output)
+            self.assertEqual(sorted(read_tree(root)), ["01-01-first-lesson.md", "01-02-third-lesson.md",
+                                                       "images/01_02_Overview.png"])
+
+    def test_heading_sync_skips_code_blocks(self):
+        example = b"```markdown\n# Lesson 3: Example\n```\n"
+        files = {"01-02-fenced-example.md": b"Intro\n\n" + example + b"\n# Lesson 2: Fenced\n\nbody\n",
+                 "01-03-example-only.md": b"~~~\n# Lesson 7: Example\n~~~\n\nbody\n"}
+        with course_dir(files) as root:
+            self.assertEqual(sync_heading(root / "01-02-fenced-example.md", 5), (2, True))
+            self.assertEqual(sync_heading(root / "01-03-example-only.md", 5), (None, False))
+            after = read_tree(root)
+            self.assertIn(example + b"\n# Lesson 5: Fenced", after["01-02-fenced-example.md"])
+            self.assertEqual(after["01-03-example-only.md"], files["01-03-example-only.md"])
+            # The fixer and the lesson index agree on which heading is the lesson's
+            index = LessonIndex(root)
+            self.assertEqual(index.get("01-02-fenced-example.md").lesson_number, 5)
+            self.assertIsNone(index.get("01-03-example-only.md").lesson_number)
+
+    def test_renumber_refuses_to_pass_lesson_99(self):
+        rng = random.Random(3000)
+        files = generate_layout(rng, units=1, lessons=(4, 4), gap_rate=0.0, max_number=99)
+        slug = next(iter(_lessons(files)))
+        unit = _lessons(files)[slug][0]
+        files[f"{unit:02d}-99-{slug}-last.md"] = b"# Lesson 99: Last\n\nbody\n"
+        with course_dir(files) as root:
+            self.apply('renumber', 2, read_tree(root), root)
+
+
+def stress(args):
+    """Generate a large course and time renumbering and gap closing on it."""
+    rng = random.Random(args.seed)
+    units = min(12, max(1, args.lessons // 60 + 1))
+    per_unit = max(1, args.lessons // units)
+    files = generate_layout(rng, units=units, lessons=(per_unit, per_unit), gap_rate=0.1,
+                            images_per_lesson=(0, max(0, 2 * args.images // max(1, args.lessons))),
+                            max_number=98)
+    lessons = sum(1 for name in files if LESSON_NAME.match(name))
+    print(f"Stress layout: {lessons} lessons, {len(files) - lessons} images in {units} units (seed {args.seed})")
+
+    metrics = Instrumentation("renumber_stress", metrics_file=args.metrics_file)
+    checks = RenumberSafetyCase()
+    with metrics.session(), course_dir(files) as root:
+        tree = read_tree(root)
+        metrics.count("lessons", lessons)
+        metrics.count("images", len(files) - lessons)
+        unit_list = sorted({int(name[:2]) for name in tree if LESSON_NAME.match(name)})
+        # Gap closing first: renumbering leaves images behind, which gap closing would then refuse to overwrite
+        operations = [('close', unit) for unit in unit_list] + [('renumber', 1)]
+        for operation, argument in operations:
+            tool_metrics = Instrumentation(operation, metrics_file='')
+            with metrics.phase(operation):
+                if operation == 'renumber':
+                    success, output = renumber(argument, tool_metrics)
+                else:
+                    success, output = close_gaps(argument, tool_metrics)
+            if not success:
+                print(output[-2000:])
+                metrics.set_status("failed")
+                return 1
+            after = read_tree(root)
+            if operation == 'renumber':
+                checks.assert_renumbered(tree, after, argument)
+            else:
+                checks.assert_gaps_closed(tree, after, argument)
+            tree = after
+            phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in tool_metrics.phases.items())
+            print(f"  {operation} {argument}: {tool_metrics.counters.get('renames', 0)} renames ({phases})")
+    print("\n".join(metrics.summary_lines()))
+    print("✓ All invariants held")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Property and stress tests for lesson renumbering and gap closing")
+    parser.add_argument('--stress', action='store_true', help='Run the stress benchmark instead of the property tests')
+    parser.add_argument('--lessons', type=int, default=600, help='Stress: number of lessons (default: 600)')
+    parser.add_argument('--images', type=int, default=3000, help='Stress: number of images (default: 3000)')
+    parser.add_argument('--seed', type=int, default=0, help='Stress: layout seed (default: 0)')
+    parser.add_argument('--metrics-file', default=None, help='Stress: metrics file for the timings')
+    args, remaining = parser.parse_known_args()
+    if args.stress:
+        return stress(args)
+    return 0 if unittest.main(argv=[sys.argv[0]] + remaining, exit=False).result.wasSuccessful() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Snapshot Restore Tests
+
+Takes a GitSnapshots snapshot of a generated course in a temporary git
+repository, renumbers a unit, and restores the snapshot. The restored tree
+must be byte-for-byte the tree that was snapshotted: renumbered lessons are
+back under their old names and the new names they were moved to - untracked
+files git's own restore would leave behind - are gone, so no lesson is left
+twice.
+
+Usage:
+    python test_safe_execute.py                          # unittest
+    python -m pytest scripts/test_safe_execute.py        # Same, under pytest
+"""
+
+import sys
+import random
+import subprocess
+import unittest
+
+from instrumentation import Instrumentation
+from renumber_lessons import LessonRenumberingTool
+from safe_execute import GitSnapshots, declared_paths
+from test_renumber_safety import LESSON_NAME, course_dir, generate_layout, read_tree, run_tool, _lessons
+
+
+GIT_IDENTITY = ['-c', 'user.name=test', '-c', 'user.email=test@localhost']
+
+
+def git(*args):
+    subprocess.run(['git'] + GIT_IDENTITY + list(args), check=True, capture_output=True)
+
+
+class SnapshotRestoreTests(unittest.TestCase):
+    def renumber_and_restore(self, seed, commit_share):
+        """Snapshot, renumber one unit, restore; returns (before, renumbered, restored, changed)."""
+        rng = random.Random(seed)
+        files = generate_layout(rng, units=2, lessons=(4, 8), max_number=90)
+        with course_dir(files) as root:
+            git('init', '-q')
+            # Part of the course committed, the rest untracked: a course matching HEAD needs no snapshot
+            committed = [name for name in sorted(files) if rng.random() < commit_share]
+            if committed:
+                git('add', '--', *committed)
+                git('commit', '-q', '-m', 'course')
+            before = read_tree(root)
+            # Make room before the second lesson of the first unit, so later lessons move
+            unit = min(lesson[0] for lesson in _lessons(before).values())
+            numbers = sorted(number for lesson_unit, number, _, _ in _lessons(before).values() if lesson_unit == unit)
+            insertion_point = numbers[1]
+
+            command = ['python', 'scripts/renumber_lessons.py', str(insertion_point), '--unit', str(unit)]
+            snapshots = GitSnapshots(root)
+            snapshot_id, _ = snapshots.create(declared_paths(command), 'before renumber')
+            self.assertIsNotNone(snapshot_id)
+
+            success, output = run_tool(LessonRenumberingTool(
+                insertion_point, unit=unit, backup_dir="backup_renumber",
+                metrics=Instrumentation("renumber_lessons", metrics_file='')))
+            self.assertTrue(success, output)
+            renumbered = read_tree(root)
+
+            planned = snapshots.restore(snapshot_id, dry_run=True)
+            self.assertEqual(read_tree(root), renumbered, "dry run changed the tree")
+            changed = snapshots.restore(snapshot_id)
+            self.assertEqual(planned, changed)
+            return before, renumbered, read_tree(root), changed
+
+    def test_renumber_then_restore(self):
+        for seed in range(6):
+            for commit_share in (0.0, 0.5):
+                with self.subTest(seed=seed, committed=commit_share):
+                    before, renumbered, restored, changed = self.renumber_and_restore(seed, commit_share)
+                    self.assertNotEqual(before, renumbered, "renumbering moved nothing")
+                    self.assertEqual(restored, before)
+                    self.assertEqual(len(_lessons(restored)),
+                                     sum(1 for name in restored if LESSON_NAME.match(name)), "duplicate lessons")
+                    moved = set(renumbered) - set(before)
+                    self.assertTrue(moved and moved <= set(changed), "new lesson names not reported")
+
+
+if __name__ == "__main__":
+    sys.exit(0 if unittest.main(exit=False).result.wasSuccessful() else 1)
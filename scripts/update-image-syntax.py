@@ -5,9 +5,16 @@ Update image references in lesson files to use UU_LL_Name.png syntax
 
 import os
 import re
+import sys
 import glob
+import argparse
 from pathlib import Path
 
+from instrumentation import Instrumentation
+from git_changes import add_since_argument, load_changes
+from lesson_parser import LessonIndex
+from course_locks import CourseLock, LockError, scopes_for, add_lock_arguments
+
 def convert_filename_to_underscore(filename):
     """Convert various filename formats to UU_LL_Name.png format"""
     # Remove .png extension for processing
@@ -54,10 +61,27 @@ def convert_filename_to_underscore(filename):
     # If no words found, return original filename
     return filename
 
-def update_lesson_file(filepath):
+def needs_update(summary):
+    """True if any images/ reference in a parsed lesson is not in UU_LL_Name.png format"""
+    for _, _, target, _ in summary.images:
+        if target.startswith('images/'):
+            name = target[len('images/'):]
+            if convert_filename_to_underscore(name) != name:
+                return True
+    return False
+
+def update_lesson_file(filepath, metrics=None, index=None):
     """Update all image references in a lesson file"""
     print(f"Processing: {os.path.basename(filepath)}")
     
+    if index is not None:
+        summary = index.get(filepath)
+        if metrics:
+            metrics.count("image_refs", sum(1 for image in summary.images if image[2].startswith('images/')))
+        if not needs_update(summary):
+            print(f"  📌 No changes needed")
+            return False
+    
     with open(filepath, 'r', encoding='utf-8') as f:
         content = f.read()
     
@@ -67,6 +91,8 @@ def update_lesson_file(filepath):
     image_pattern = r'!\[([^\]]*)\]\(images/([^)]+)\)'
     
     def replace_image_ref(match):
+        if metrics and index is None:
+            metrics.count("image_refs")
         alt_text = match.group(1)
         old_filename = match.group(2)
         
@@ -93,14 +119,42 @@ def update_lesson_file(filepath):
 
 def main():
     """Update all lesson files"""
+    parser = argparse.ArgumentParser(description="Update image references to UU_LL_Name.png syntax")
+    add_since_argument(parser)
+    add_lock_arguments(parser)
+    args = parser.parse_args()
+
+    changes = load_changes(args.since)
+    if changes is False:
+        return 1
+
+    metrics = Instrumentation("update_image_syntax")
+    with metrics.session():
+        try:
+            update_all(metrics, changes, args.lock_timeout)
+        except LockError as e:
+            print(f"❌ Cannot update lessons while another operation is running: {e}")
+            metrics.set_status("failed")
+            return 1
+    return 0
+
+def update_all(metrics, changes=None, lock_timeout=None):
+    """Update image references in every lesson file (or only changed ones) in the current directory"""
     print("=" * 60)
     print("UPDATING IMAGE SYNTAX TO UU_LL_Name.png FORMAT")
     print("=" * 60)
     
     # Find all migrated lesson files (UU-LL-*.md format at root level)
     lesson_pattern = "[0-9][0-9]-[0-9][0-9]-*.md"
-    lesson_files = glob.glob(lesson_pattern)
-    
+    with metrics.phase("scan"):
+        lesson_files = glob.glob(lesson_pattern)
+        if changes:
+            lesson_files = changes.filter_lessons(lesson_files)
+    metrics.count("files_scanned", len(lesson_files))
+    
+    if not lesson_files and changes:
+        print(f"✅ No lesson files changed since {changes.since}")
+        return
     if not lesson_files:
         print("❌ No lesson files found matching UU-LL-*.md pattern")
         return
@@ -108,9 +162,15 @@ def main():
     print(f"Found {len(lesson_files)} lesson files to update\n")
     
     updated_count = 0
-    for filepath in sorted(lesson_files):
-        if update_lesson_file(filepath):
-            updated_count += 1
+    index = LessonIndex()
+    with CourseLock(scopes_for(lesson_files), "update_image_syntax", timeout=lock_timeout):
+        with metrics.phase("update"):
+            for filepath in sorted(lesson_files):
+                if update_lesson_file(filepath, metrics, index):
+                    updated_count += 1
+    index.save()
+    metrics.count("files_parsed", index.files_parsed)
+    metrics.count("files_updated", updated_count)
     
     print(f"\n✅ Processing complete!")
     print(f"📊 Updated {updated_count} of {len(lesson_files)} files")
@@ -120,4 +180,4 @@ def main():
     print("  - Reference: ![Title](images/04_01_WaterDemandConcepts.png)")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())